@@ -23,6 +23,17 @@ class AllowGetOnlyIsAdminStockWorker(BasePermission):
         )
 
 
+class IsAdminStockManager(BasePermission):
+    """
+    Custom permission to only allow admins and stock managers, for every method.
+    """
+
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+        return request.user.is_superuser or request.user.role == "stock_manager"
+
+
 class IsBakery(BasePermission):
     """
     Custom permission to only allow users with the role 'bakery' to access the view.
@@ -2,6 +2,7 @@ import os
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bakery_management.settings")
@@ -17,6 +18,14 @@ app.conf.beat_schedule = {
         "task": "notification.tasks.send_low_stock_notifications",
         "schedule": crontab(minute="*/1"),
     },
+    "purge-abandoned-guest-carts-daily": {
+        "task": "cart.tasks.purge_abandoned_guest_carts",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "purge-document-cache-daily": {
+        "task": "orders.tasks.purge_document_cache",
+        "schedule": crontab(hour=3, minute=30),
+    },
 }
 
 # Set timezone if required
@@ -24,3 +33,11 @@ app.conf.timezone = "UTC"  # Adjust this to your timezone, e.g., 'Asia/Kolkata'
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+
+@worker_process_init.connect
+def warm_up_documents(**kwargs):
+    """Compile the PDF templates and load fonts before the first job."""
+    from orders.documents import warm_up
+
+    warm_up()
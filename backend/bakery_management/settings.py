@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -71,6 +72,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "cart.middleware.GuestCartMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "account.middleware.APILoggingMiddleware",
@@ -330,6 +332,78 @@ SESSION_COOKIE_SECURE = True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_AGE = 3600
 SESSION_COOKIE_SAMESITE = "None"
+
+# Guest carts (see cart/guest.py). GUEST_CART_STORE is
+# "cart.guest.SignedCookieGuestCartStore" or "cart.guest.SessionGuestCartStore".
+GUEST_CART_STORE = os.getenv(
+    "GUEST_CART_STORE", "cart.guest.SignedCookieGuestCartStore"
+)
+GUEST_CART_COOKIE_NAME = "guest_cart"
+GUEST_CART_MAX_AGE = int(os.getenv("GUEST_CART_MAX_AGE", 14 * 24 * 3600))
+
+# Digits of the daily order number in Order.order_id (YYYYMMDD + number).
+ORDER_ID_WIDTH = int(os.getenv("ORDER_ID_WIDTH", 3))
+
+# Seconds an invoice download waits for its PDF to be rendered (see
+# orders/invoices.py) before answering 202 with the pending status.
+INVOICE_PDF_WAIT_TIMEOUT = float(os.getenv("INVOICE_PDF_WAIT_TIMEOUT", 10))
+INVOICE_PDF_POLL_INTERVAL = 0.25
+
+# PDF documents (see orders/documents.py): templates compiled when a worker
+# starts, and where rendered PDFs are cached (and for how many seconds).
+DOCUMENT_TEMPLATES = ["invoice.html", "orders.html", "recipe.html"]
+DOCUMENT_CACHE_DIR = "documents"
+DOCUMENT_CACHE_MAX_AGE = int(os.getenv("DOCUMENT_CACHE_MAX_AGE", 30 * 24 * 3600))
+
+# Processes shared by a web process to compose barcode label sheet pages (see
+# product/labels.py); 0 or 1 composes them in the request.
+BARCODE_SHEET_WORKERS = int(os.getenv("BARCODE_SHEET_WORKERS", 2))
+
+# Invoice ZIP exports (see orders/exports.py): invoices read per batch, and
+# the ledger size kept in memory before spooling to disk. Each batch waits up
+# to INVOICE_PDF_WAIT_TIMEOUT seconds for its missing PDFs.
+INVOICE_EXPORT_BATCH_SIZE = 100
+INVOICE_EXPORT_LEDGER_MEMORY = 1024 * 1024
 GROQ_API = os.getenv("GROQ_API")
 SITE_URL = "https://bakery.rexett.com"
 # SITE_URL = "http://127.0.0.1:8000"
+
+# Catalog read cache (see product/cache.py). CATALOG_CACHE_BACKEND is one of
+# "file" (shared by the processes of one host, the default), "redis" (needed
+# once web and Celery workers run on several hosts) or "locmem". locmem is per
+# process and would never see the changes Celery tasks make, so with it the
+# catalog cache, its ETags and configuration snapshots (dashboard/config.py)
+# are all bypassed.
+CATALOG_CACHE_BACKEND = os.getenv("CATALOG_CACHE_BACKEND", "file")
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", 300))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 1000))
+
+CATALOG_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "catalog",
+        "OPTIONS": {"MAX_ENTRIES": CATALOG_CACHE_MAX_ENTRIES},
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv(
+            "CATALOG_CACHE_LOCATION",
+            os.path.join(tempfile.gettempdir(), "bakery-catalog-cache"),
+        ),
+        "OPTIONS": {"MAX_ENTRIES": CATALOG_CACHE_MAX_ENTRIES},
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CATALOG_CACHE_LOCATION", "redis://localhost:6379/1"),
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "catalog": {
+        **CATALOG_CACHE_BACKENDS[CATALOG_CACHE_BACKEND],
+        "TIMEOUT": CATALOG_CACHE_TIMEOUT,
+    },
+}
@@ -0,0 +1,182 @@
+"""
+Guest carts.
+
+A guest cart is a ``Cart`` row without a user, found through a guest key
+that ``settings.GUEST_CART_STORE`` keeps for the browser:
+
+- ``SignedCookieGuestCartStore`` (the default) issues a random key in its own
+  signed cookie, so anonymous visitors never need a session row.
+- ``SessionGuestCartStore`` uses the Django session key, as carts used to.
+
+Guest carts are only created when something asks for one (``create=True``);
+``GuestCartMiddleware`` writes the key cookie once the response is ready.
+When a guest signs in, ``merge_guest_cart`` folds the guest cart into the
+user's cart the first time a cart is looked up for them (or on
+``user_logged_in``) and forgets the key. ``purge_guest_carts`` deletes guest
+carts untouched for ``GUEST_CART_MAX_AGE`` seconds.
+"""
+
+import secrets
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from cart.models import Cart
+from cart.operations import ADD, apply_operations
+
+
+def get_http_request(request):
+    """The Django request behind a DRF request, where per-request state lives."""
+    return getattr(request, "_request", request)
+
+
+class SessionGuestCartStore:
+    """Guest carts keyed on the Django session."""
+
+    def get_key(self, request, create=False):
+        session = request.session
+        if not session.session_key and create:
+            session.save()
+        return session.session_key
+
+    def forget(self, request):
+        pass
+
+    def update_response(self, request, response):
+        pass
+
+
+class SignedCookieGuestCartStore:
+    """Guest carts keyed on a random key kept in a signed cookie."""
+
+    salt = "cart.guest"
+
+    def get_key(self, request, create=False):
+        request = get_http_request(request)
+        if hasattr(request, "guest_cart_key"):
+            key = request.guest_cart_key
+        else:
+            key = request.get_signed_cookie(
+                settings.GUEST_CART_COOKIE_NAME,
+                default=None,
+                salt=self.salt,
+                max_age=settings.GUEST_CART_MAX_AGE,
+            )
+        if key is None and create:
+            key = secrets.token_urlsafe(24)
+            request.guest_cart_issued = True
+        request.guest_cart_key = key
+        return key
+
+    def forget(self, request):
+        request = get_http_request(request)
+        request.guest_cart_key = None
+        request.guest_cart_issued = False
+
+    def update_response(self, request, response):
+        if not hasattr(request, "guest_cart_key"):
+            return
+        name = settings.GUEST_CART_COOKIE_NAME
+        if request.guest_cart_key is None:
+            if name in request.COOKIES:
+                response.delete_cookie(name, samesite=settings.SESSION_COOKIE_SAMESITE)
+        elif getattr(request, "guest_cart_issued", False):
+            response.set_signed_cookie(
+                name,
+                request.guest_cart_key,
+                salt=self.salt,
+                max_age=settings.GUEST_CART_MAX_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+
+
+@lru_cache(maxsize=None)
+def get_guest_cart_store():
+    return import_string(settings.GUEST_CART_STORE)()
+
+
+def get_guest_cart(request, create=False):
+    """The guest cart of ``request``, created when ``create`` is set."""
+    key = get_guest_cart_store().get_key(request, create=create)
+    if key is None:
+        return None
+    if create:
+        cart, _ = Cart.objects.get_or_create(session_id=key, user=None)
+        return cart
+    return Cart.objects.filter(session_id=key, user=None).first()
+
+
+def merge_guest_cart(request, user):
+    """
+    Move the guest cart of ``request`` to ``user``: adopt it when the user has
+    no cart, else add its items to the user's cart and delete it.
+    """
+    store = get_guest_cart_store()
+    key = store.get_key(request)
+    if key is None:
+        return None
+    store.forget(request)
+
+    with transaction.atomic():
+        guest_cart = (
+            Cart.objects.select_for_update().filter(session_id=key, user=None).first()
+        )
+        if guest_cart is None:
+            return None
+        cart = Cart.objects.filter(user=user).first()
+        if cart is None:
+            guest_cart.user = user
+            guest_cart.session_id = None
+            guest_cart.save()
+            return guest_cart
+
+        operations = [
+            {"action": ADD, "product_variant": variant_id, "quantity": quantity}
+            for variant_id, quantity in guest_cart.items.values_list(
+                "product_variant_id", "quantity"
+            )
+        ]
+        if operations:
+            apply_operations(cart, operations)
+        guest_cart.delete()
+    return cart
+
+
+def get_request_cart(request, create=False):
+    """
+    The cart of ``request``: the user's (with any guest cart merged into it)
+    or the guest cart. Returns ``None`` when there is none and ``create`` is
+    not set.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return get_guest_cart(request, create=create)
+    cart = merge_guest_cart(request, user)
+    if cart is not None:
+        return cart
+    if create:
+        cart, _ = Cart.objects.get_or_create(user=user)
+        return cart
+    return Cart.objects.filter(user=user).first()
+
+
+def purge_guest_carts(max_age=None):
+    """
+    Delete guest carts (and their items) neither changed nor added to for
+    ``max_age`` seconds. Returns the number of carts deleted.
+    """
+    if max_age is None:
+        max_age = settings.GUEST_CART_MAX_AGE
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    _, deleted = (
+        Cart.objects.filter(user=None, updated_at__lt=cutoff)
+        .exclude(items__updated_at__gte=cutoff)
+        .delete()
+    )
+    return deleted.get(Cart._meta.label, 0)
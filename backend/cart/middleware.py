@@ -0,0 +1,13 @@
+from cart.guest import get_guest_cart_store
+
+
+class GuestCartMiddleware:
+    """Let the guest cart store persist the guest key on the response."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        get_guest_cart_store().update_response(request, response)
+        return response
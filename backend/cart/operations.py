@@ -0,0 +1,101 @@
+"""
+Bulk cart item operations.
+
+``apply_operations`` folds a list of ``add``/``set``/``remove`` operations
+into the final quantity of each variant in memory, then writes the
+difference with one ``bulk_create``, one ``bulk_update`` and one delete.
+Duplicate items for a variant (older carts may have them) are merged into
+the first one.
+"""
+
+from django.utils import timezone
+
+from cart.models import CartItem
+
+ADD = "add"
+SET = "set"
+REMOVE = "remove"
+ACTIONS = [ADD, SET, REMOVE]
+
+
+def apply_operations(cart, operations):
+    """
+    Apply ``operations`` (dicts with ``action``, ``product_variant`` and
+    ``quantity``) to ``cart``. Call it in a transaction holding the cart's
+    row lock. Returns the number of items created, updated and deleted.
+    """
+    variant_ids = {operation["product_variant"] for operation in operations}
+    existing = {}
+    duplicates = []
+    merged = set()
+    for item in CartItem.objects.filter(
+        cart=cart, product_variant_id__in=variant_ids
+    ).order_by("pk"):
+        if item.product_variant_id in existing:
+            existing[item.product_variant_id].quantity += item.quantity
+            duplicates.append(item)
+            merged.add(item.product_variant_id)
+        else:
+            existing[item.product_variant_id] = item
+
+    quantities = {variant_id: item.quantity for variant_id, item in existing.items()}
+    for operation in operations:
+        variant_id = operation["product_variant"]
+        if operation["action"] == ADD:
+            quantities[variant_id] = (
+                quantities.get(variant_id, 0) + operation["quantity"]
+            )
+        elif operation["action"] == SET:
+            quantities[variant_id] = operation["quantity"]
+        else:
+            quantities[variant_id] = 0
+
+    now = timezone.now()
+    to_create, to_update = [], []
+    to_delete = [item.pk for item in duplicates]
+    for variant_id, quantity in quantities.items():
+        item = existing.get(variant_id)
+        if item is None:
+            if quantity > 0:
+                to_create.append(
+                    CartItem(
+                        cart=cart, product_variant_id=variant_id, quantity=quantity
+                    )
+                )
+        elif quantity <= 0:
+            to_delete.append(item.pk)
+        elif item.quantity != quantity or variant_id in merged:
+            item.quantity = quantity
+            item.updated_at = now
+            to_update.append(item)
+
+    CartItem.objects.bulk_create(to_create)
+    CartItem.objects.bulk_update(to_update, ["quantity", "updated_at"])
+    if to_delete:
+        CartItem.objects.filter(pk__in=to_delete).delete()
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "deleted": len(to_delete),
+    }
+
+
+def remove_free_items(cart_id, coupon):
+    """
+    Take back the units a ``buy_x_get_y`` coupon added to a cart's "get"
+    items, deleting items left without any.
+    """
+    now = timezone.now()
+    to_update, to_delete = [], []
+    for item in CartItem.objects.filter(
+        cart_id=cart_id, product_variant__in=coupon.customer_get_products.all()
+    ):
+        if item.quantity > coupon.customer_gets_quantity:
+            item.quantity -= coupon.customer_gets_quantity
+            item.updated_at = now
+            to_update.append(item)
+        else:
+            to_delete.append(item.pk)
+    CartItem.objects.bulk_update(to_update, ["quantity", "updated_at"])
+    if to_delete:
+        CartItem.objects.filter(pk__in=to_delete).delete()
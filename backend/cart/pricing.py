@@ -0,0 +1,313 @@
+"""
+Cart pricing.
+
+``price_cart`` loads a cart's items (with their variants and inventories)
+and its coupon once, computes every amount in memory and returns an
+immutable ``CartPrice``. The cart serializer, ``Cart.calculate_vat`` and
+checkout all read that one breakdown, so pricing a cart costs a fixed number
+of queries however many items it holds. ``price_lines`` prices unsaved lines
+the same way for quotes.
+
+A line is charged its bulk price tier (see ``product.price_tiers``) when one
+ends at its quantity; otherwise each unit is charged the sale price while the
+sale is active, else the regular price. Bulk tiers only apply without a
+coupon.
+
+Coupons are applied once per cart, reading their product and state sets
+from ``coupon.compiled``:
+
+- ``amount_off_order``: a fixed amount or a percentage off the cart total.
+- ``amount_off_product``: a fixed amount or a percentage off the unit price of
+  every eligible item.
+- ``buy_x_get_y``: when the cart holds one of the coupon's buy products, each
+  of its get products is discounted: ``customer_gets_quantity`` units for
+  free, a fixed amount off each unit or a percentage off the item.
+- ``free_shipping``: the shipping cost becomes the coupon's rate (or zero)
+  when the user's primary address is in one of the coupon's states.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+
+from bakery.models import BakeryAddress
+from cart.models import CartItem
+from coupon.compiled import get_compiled_coupon
+from coupon.models import Coupon
+from dashboard import config as admin_config
+from dashboard.models import ZipCodeConfig
+from product.price_tiers import resolve_tier_price
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+
+@dataclass(frozen=True)
+class ItemPrice:
+    item_id: int
+    product_variant_id: int
+    quantity: int
+    unit_price: Decimal
+    price: Decimal
+    discounted_price: Decimal
+
+
+@dataclass(frozen=True)
+class CartPrice:
+    cart_id: int
+    coupon_code: str | None
+    items: tuple[ItemPrice, ...]
+    total_price: Decimal
+    discounted_price: Decimal
+    shipping_cost: Decimal
+    vat_percentage: Decimal
+    vat_amount: Decimal
+    total_with_vat: Decimal
+
+    @property
+    def discount_amount(self):
+        return self.total_price - self.discounted_price
+
+    def item(self, item_id):
+        for item in self.items:
+            if item.item_id == item_id:
+                return item
+        return None
+
+
+def items_prefetch():
+    """The ``items`` prefetch that pricing and the cart serializers read."""
+    return Prefetch(
+        "items",
+        queryset=CartItem.objects.select_related(
+            "product_variant__inventory_items", "product_variant__product"
+        )
+        .prefetch_related("product_variant__product__images")
+        .order_by("pk"),
+    )
+
+
+def prefetch_items(cart):
+    """
+    Load ``cart``'s items once onto the instance. Only do this once the items
+    are final for the request: later changes are not seen by the instance.
+    """
+    prefetch_related_objects([cart], items_prefetch())
+    return cart
+
+
+def load_items(cart):
+    if "items" in getattr(cart, "_prefetched_objects_cache", {}):
+        return list(cart.items.all())
+    return list(
+        cart.items.select_related("product_variant__inventory_items").order_by("pk")
+    )
+
+
+def get_inventory(item):
+    return getattr(item.product_variant, "inventory_items", None)
+
+
+def base_unit_price(inventory):
+    """``inventory``'s sale price while the sale is active, else its regular price."""
+    if inventory is None:
+        return ZERO
+    if inventory.sale_active and inventory.sale_price is not None:
+        return Decimal(inventory.sale_price)
+    return Decimal(inventory.regular_price)
+
+
+def price_item(inventory, quantity, bulk_pricing=True):
+    """
+    The price of ``quantity`` units of ``inventory``: its bulk price tier's
+    when ``bulk_pricing`` is set and a tier ends at ``quantity``, else
+    ``quantity`` times its sale or regular price.
+    """
+    if inventory is None:
+        return ZERO
+    if bulk_pricing:
+        tier_price = resolve_tier_price(inventory.price_tiers, int(quantity))
+        if tier_price is not None:
+            return tier_price.quantize(CENT)
+    return (base_unit_price(inventory) * quantity).quantize(CENT)
+
+
+def percentage_of(amount, percentage):
+    return (Decimal(amount) * Decimal(percentage) / 100).quantize(CENT)
+
+
+def product_discounts(coupon, items, units):
+    """The discount on each line for an ``amount_off_product`` coupon."""
+    eligible = get_compiled_coupon(coupon).eligible_products(coupon)
+    discounts = {}
+    for index, item in enumerate(items):
+        if eligible is not None and item.product_variant_id not in eligible:
+            continue
+        price = units[index]
+        if coupon.discount_types == Coupon.DiscountType.AMOUNT:
+            discount = min(Decimal(coupon.discount_value), price)
+        else:
+            discount = min(percentage_of(price, coupon.discount_value), price)
+        discounts[index] = discount * item.quantity
+    return discounts
+
+
+def buy_x_get_y_discounts(coupon, items, units, prices):
+    """The discount on each "get" line for a ``buy_x_get_y`` coupon."""
+    compiled = get_compiled_coupon(coupon)
+    if compiled.buy_products.isdisjoint(item.product_variant_id for item in items):
+        return {}
+    get_products = compiled.get_products
+
+    discounts = {}
+    for index, item in enumerate(items):
+        if item.product_variant_id not in get_products:
+            continue
+        if coupon.customer_gets_types == Coupon.CustomerGetsType.FREE:
+            free_quantity = min(coupon.customer_gets_quantity, item.quantity)
+            discount = units[index] * free_quantity
+        elif coupon.customer_gets_types == Coupon.CustomerGetsType.AMOUNT_OFF_EACH:
+            discount = Decimal(coupon.customer_gets_discount_value) * item.quantity
+        elif coupon.customer_gets_types == Coupon.CustomerGetsType.PERCENTAGE:
+            discount = percentage_of(prices[index], coupon.customer_gets_discount_value)
+        else:
+            continue
+        discounts[index] = min(Decimal(discount).quantize(CENT), prices[index])
+    return discounts
+
+
+def get_primary_address(user_id):
+    if user_id is None:
+        return None
+    return (
+        BakeryAddress.objects.filter(bakery__user_id=user_id, primary=True)
+        .only("state")
+        .last()
+    )
+
+
+def free_shipping_cost(coupon, address, shipping_cost):
+    """``shipping_cost`` after a ``free_shipping`` coupon shipping to ``address``."""
+    if not address:
+        return shipping_cost
+    if coupon.shipping_scope == Coupon.ShippingScope.SPECIFIC_STATES:
+        if address.state not in get_compiled_coupon(coupon).states:
+            return shipping_cost
+    if coupon.exclude_shipping_rate:
+        return ZERO
+    if coupon.shipping_rate is not None:
+        return Decimal(coupon.shipping_rate)
+    return shipping_cost
+
+
+def configured_vat_percentage():
+    configuration = admin_config.get_admin_configuration()
+    return configuration.vat_amount if configuration else settings.VAT_PERCENTAGE
+
+
+def zip_shipping_cost(zip_code, total_price):
+    """
+    The delivery cost configured for ``zip_code``; free from the zip code's
+    minimum order amount on, and when no zip code or configuration applies.
+    """
+    if not zip_code:
+        return ZERO
+    zip_config = ZipCodeConfig.objects.filter(zip_code=zip_code).first()
+    if not zip_config:
+        return ZERO
+    if total_price >= Decimal(zip_config.min_order_amount):
+        return ZERO
+    return Decimal(zip_config.delivery_cost)
+
+
+def price_lines(
+    items,
+    coupon=None,
+    user_id=None,
+    vat_percentage=0,
+    shipping_cost=0,
+    cart_id=None,
+    address=None,
+):
+    """
+    Price ``items`` (cart items, saved or not, with their variants and
+    inventories loaded) under ``coupon``, with ``vat_percentage`` VAT on the
+    discounted total plus ``shipping_cost``. A ``free_shipping`` coupon reads
+    ``address``, or the primary address of ``user_id`` when it is not given.
+    """
+    shipping_cost = Decimal(shipping_cost or 0)
+    inventories = [get_inventory(item) for item in items]
+    prices = [
+        price_item(inventory, item.quantity, coupon is None)
+        for item, inventory in zip(items, inventories)
+    ]
+    units = [
+        (price / item.quantity).quantize(CENT) if item.quantity else price
+        for item, price in zip(items, prices)
+    ]
+    total_price = sum(prices, ZERO)
+
+    discounts = {}
+    order_discount = ZERO
+    if coupon is not None:
+        if coupon.coupon_type == Coupon.CouponType.AMOUNT_OFF_ORDER:
+            if coupon.discount_types == Coupon.DiscountType.AMOUNT:
+                order_discount = Decimal(coupon.discount_value)
+            elif coupon.discount_types == Coupon.DiscountType.PERCENTAGE:
+                order_discount = percentage_of(total_price, coupon.discount_value)
+        elif coupon.coupon_type == Coupon.CouponType.AMOUNT_OFF_PRODUCT:
+            discounts = product_discounts(coupon, items, units)
+        elif coupon.coupon_type == Coupon.CouponType.BUY_X_GET_Y:
+            discounts = buy_x_get_y_discounts(coupon, items, units, prices)
+        elif coupon.coupon_type == Coupon.CouponType.FREE_SHIPPING:
+            if address is None:
+                address = get_primary_address(user_id)
+            shipping_cost = free_shipping_cost(coupon, address, shipping_cost)
+
+    item_prices = tuple(
+        ItemPrice(
+            item_id=item.pk,
+            product_variant_id=item.product_variant_id,
+            quantity=item.quantity,
+            unit_price=units[index],
+            price=prices[index],
+            discounted_price=max(prices[index] - discounts.get(index, ZERO), ZERO),
+        )
+        for index, item in enumerate(items)
+    )
+    discounted_price = max(
+        sum((item.discounted_price for item in item_prices), ZERO) - order_discount,
+        ZERO,
+    )
+    vat_percentage = Decimal(vat_percentage or 0)
+    vat_amount = percentage_of(discounted_price, vat_percentage)
+    return CartPrice(
+        cart_id=cart_id,
+        coupon_code=coupon.code if coupon else None,
+        items=item_prices,
+        total_price=total_price,
+        discounted_price=discounted_price,
+        shipping_cost=shipping_cost,
+        vat_percentage=vat_percentage,
+        vat_amount=vat_amount,
+        total_with_vat=discounted_price + vat_amount + shipping_cost,
+    )
+
+
+def price_cart(cart, vat_percentage=0, shipping_cost=None):
+    """
+    Price ``cart`` with its applied coupon, ``vat_percentage`` VAT on the
+    discounted total and ``shipping_cost`` (default: the cart's own).
+    """
+    if shipping_cost is None:
+        shipping_cost = cart.shipping_cost
+    return price_lines(
+        load_items(cart),
+        coupon=cart.applied_coupon,
+        user_id=cart.user_id,
+        vat_percentage=vat_percentage,
+        shipping_cost=shipping_cost,
+        cart_id=cart.pk,
+    )
@@ -3,14 +3,47 @@ from rest_framework import serializers
 from bakery.models import BakeryAddress
 from bakery.serializers import BakeryAddressSerializer
 from cart.models import Cart, CartItem
+from cart.operations import ACTIONS, ADD, SET
+from cart.pricing import price_cart
 from product.models import ProductVariant
 from product.serializers import ProductVariantSerializer
 
+MAX_QUOTE_LINES = 500
+MAX_CART_OPERATIONS = 500
+
+
+def get_cart_price(context, cart_id, get_cart):
+    """
+    The ``CartPrice`` of ``cart_id``, computed once per serializer tree and
+    shared through its ``context``; callers that already priced the cart pass
+    it in as ``context["pricing"]``.
+    """
+    pricing = context.get("pricing")
+    if pricing is None or pricing.cart_id != cart_id:
+        pricing = context["pricing"] = price_cart(get_cart())
+    return pricing
+
+
+class CartPriceField(serializers.DecimalField):
+    """A read-only amount of a cart's (or a cart item's) price breakdown."""
+
+    def __init__(self, amount, **kwargs):
+        self.amount = amount
+        kwargs.update(max_digits=10, decimal_places=2, read_only=True, source="*")
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        if isinstance(instance, CartItem):
+            pricing = get_cart_price(
+                self.context, instance.cart_id, lambda: instance.cart
+            ).item(instance.pk)
+        else:
+            pricing = get_cart_price(self.context, instance.pk, lambda: instance)
+        return super().to_representation(getattr(pricing, self.amount))
+
 
 class CartItemSerializer(serializers.ModelSerializer):
-    item_price = serializers.DecimalField(
-        max_digits=10, decimal_places=2, read_only=True
-    )
+    item_price = CartPriceField("price")
     product_variant = ProductVariantSerializer()
 
     class Meta:
@@ -20,12 +53,8 @@ class CartItemSerializer(serializers.ModelSerializer):
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
-    total_price = serializers.DecimalField(
-        max_digits=10, decimal_places=2, read_only=True
-    )
-    discounted_price = serializers.DecimalField(
-        max_digits=10, decimal_places=2, read_only=True
-    )
+    total_price = CartPriceField("total_price")
+    discounted_price = CartPriceField("discounted_price")
     applied_coupon_name = serializers.SerializerMethodField()
     discounted_amount = serializers.SerializerMethodField()
     delivery_address = serializers.SerializerMethodField()
@@ -63,8 +92,9 @@ class CartSerializer(serializers.ModelSerializer):
 
     def get_discounted_amount(self, obj):
         # Calculate discounted amount as total_price - discounted_price
-        if obj.total_price and obj.discounted_price:
-            return obj.total_price - obj.discounted_price
+        pricing = get_cart_price(self.context, obj.pk, lambda: obj)
+        if pricing.total_price and pricing.discounted_price:
+            return pricing.discount_amount
         return None
 
     def get_applied_coupon_name(self, obj):
@@ -88,3 +118,68 @@ class CartItemInputSerializer(serializers.Serializer):
                 f"Product variant with ID {value} does not exist."
             )
         return value
+
+
+class QuoteLineSerializer(serializers.Serializer):
+    product_variant = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CartQuoteSerializer(serializers.Serializer):
+    items = QuoteLineSerializer(
+        many=True, allow_empty=False, max_length=MAX_QUOTE_LINES
+    )
+    coupon_code = serializers.CharField(required=False, allow_blank=True)
+    delivery_address = serializers.IntegerField(required=False)
+    zip_code = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, data):
+        if data.get("delivery_address") and data.get("zip_code"):
+            raise serializers.ValidationError(
+                "Provide either a delivery address or a zip code, not both."
+            )
+        return data
+
+
+class ItemPriceSerializer(serializers.Serializer):
+    product_variant = serializers.IntegerField(source="product_variant_id")
+    quantity = serializers.IntegerField()
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discounted_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class CartQuoteResultSerializer(serializers.Serializer):
+    items = ItemPriceSerializer(many=True)
+    coupon_code = serializers.CharField()
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discounted_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    shipping_cost = serializers.DecimalField(max_digits=10, decimal_places=2)
+    vat_percentage = serializers.DecimalField(max_digits=5, decimal_places=2)
+    vat_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total_with_vat = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class CartItemOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=ACTIONS, default=ADD)
+    product_variant = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data):
+        if data["action"] == ADD and not data.get("quantity"):
+            raise serializers.ValidationError(
+                {"quantity": "A positive quantity is required to add an item."}
+            )
+        if data["action"] == SET and data.get("quantity") is None:
+            raise serializers.ValidationError(
+                {"quantity": "A quantity is required to set an item."}
+            )
+        return data
+
+
+class CartBulkUpdateSerializer(serializers.Serializer):
+    operations = CartItemOperationSerializer(
+        many=True, allow_empty=False, max_length=MAX_CART_OPERATIONS
+    )
+    delivery_address = serializers.IntegerField(required=False)
@@ -0,0 +1,13 @@
+from importlib import import_module
+
+from celery import shared_task
+from django.conf import settings
+
+from cart.guest import purge_guest_carts
+
+
+@shared_task
+def purge_abandoned_guest_carts():
+    """Delete abandoned guest carts and expired sessions."""
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+    return purge_guest_carts()
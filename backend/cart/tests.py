@@ -1,9 +1,23 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from account.models import CustomUser as User
-from cart.models import Cart
+from bakery.models import Bakery, BakeryAddress
+from cart.guest import purge_guest_carts
+from cart.models import Cart, CartItem
+from cart.pricing import price_cart
+from coupon.models import Coupon
+from dashboard.models import AdminConfiguration, ZipCodeConfig
+from product.models import Inventory, Product, ProductVariant
 
 
 class CartAPITestCase(APITestCase):
@@ -54,6 +68,437 @@ class CartAPITestCase(APITestCase):
         self.assertIn("user", response.data)
 
 
+class CartPricingTestCase(APITestCase):
+    fixtures = ["cart/fixtures/cart_data.json"]
+
+    def setUp(self):
+        self.cart = Cart.objects.get(pk=1)
+
+    def create_coupon(self, **fields):
+        return Coupon.objects.create(
+            code=f"CODE{Coupon.objects.count()}",
+            start_date=date(2024, 1, 1),
+            start_time=time(0, 0),
+            end_date=date(2099, 1, 1),
+            end_time=time(0, 0),
+            **fields,
+        )
+
+    def test_price_cart_without_coupon(self):
+        pricing = price_cart(self.cart, vat_percentage=10, shipping_cost=5)
+        self.assertEqual(pricing.total_price, Decimal("500.00"))
+        self.assertEqual(pricing.discounted_price, Decimal("500.00"))
+        self.assertEqual(pricing.vat_amount, Decimal("50.00"))
+        self.assertEqual(pricing.total_with_vat, Decimal("555.00"))
+        self.assertEqual(
+            [item.price for item in pricing.items],
+            [Decimal("200.00"), Decimal("300.00")],
+        )
+
+    def test_bulk_rules_apply_without_coupon(self):
+        inventory = Inventory.objects.get(pk=1)
+        inventory.bulking_price_rules = [
+            {"quantity_from": 1, "quantity_to": 2, "price": "150.00"}
+        ]
+        inventory.save()
+        pricing = price_cart(self.cart)
+        self.assertEqual(pricing.item(1).price, Decimal("150.00"))
+        self.assertEqual(pricing.item(2).price, Decimal("300.00"))
+        self.assertEqual(pricing.total_price, Decimal("450.00"))
+
+        self.cart.applied_coupon = self.create_coupon(
+            coupon_type=Coupon.CouponType.AMOUNT_OFF_ORDER,
+            discount_types=Coupon.DiscountType.PERCENTAGE,
+            discount_value=10,
+        )
+        pricing = price_cart(self.cart)
+        self.assertEqual(pricing.total_price, Decimal("500.00"))
+        self.assertEqual(pricing.discounted_price, Decimal("450.00"))
+        self.assertEqual(pricing.discount_amount, Decimal("50.00"))
+
+    def test_amount_off_product_coupon(self):
+        self.cart.applied_coupon = self.create_coupon(
+            coupon_type=Coupon.CouponType.AMOUNT_OFF_PRODUCT,
+            applies_to=Coupon.CouponApplyType.ALL_PRODUCTS,
+            discount_types=Coupon.DiscountType.AMOUNT,
+            discount_value=30,
+        )
+        pricing = price_cart(self.cart)
+        self.assertEqual(pricing.item(2).discounted_price, Decimal("210.00"))
+        self.assertEqual(pricing.discounted_price, Decimal("350.00"))
+
+    def test_buy_x_get_y_coupon_discounts_each_get_item_once(self):
+        coupon = self.create_coupon(
+            coupon_type=Coupon.CouponType.BUY_X_GET_Y,
+            customer_gets_types=Coupon.CustomerGetsType.FREE,
+            customer_gets_quantity=1,
+        )
+        coupon.buy_products.add(1)
+        coupon.customer_get_products.add(1)
+        self.cart.applied_coupon = coupon
+        pricing = price_cart(self.cart)
+        self.assertEqual(pricing.discount_amount, Decimal("200.00"))
+
+    def test_cart_view_query_count_does_not_grow_with_items(self):
+        self.client.force_authenticate(User.objects.get(pk=1))
+        url = reverse("cart-create")
+        self.client.post(url, format="json")
+        with CaptureQueriesContext(connection) as few_items:
+            response = self.client.post(url, format="json")
+        self.assertEqual(response.data["total_price"], "500.00")
+
+        product = Product.objects.get(pk=1)
+        for number in range(5):
+            variant = ProductVariant.objects.create(product=product)
+            Inventory.objects.create(
+                product_variant=variant,
+                sku=f"PRICING-{number}",
+                regular_price=10,
+                weight=1,
+                unit="kg",
+            )
+            CartItem.objects.create(cart=self.cart, product_variant=variant, quantity=1)
+        with CaptureQueriesContext(connection) as many_items:
+            response = self.client.post(url, format="json")
+        self.assertEqual(response.data["total_price"], "550.00")
+        self.assertEqual(len(response.data["items"]), 7)
+        self.assertEqual(len(many_items), len(few_items))
+
+
+class CartQuoteTestCase(APITestCase):
+    fixtures = ["cart/fixtures/cart_data.json"]
+
+    def setUp(self):
+        self.url = reverse("cart-quote")
+        AdminConfiguration.objects.create(vat_amount=10)
+        ZipCodeConfig.objects.create(
+            zip_code="12345",
+            city="Stockholm",
+            delivery_threshold=0,
+            delivery_cost=50,
+            min_order_amount=1000,
+        )
+        inventory = Inventory.objects.get(pk=1)
+        inventory.bulking_price_rules = [
+            {"quantity_from": 1, "quantity_to": 10, "price": "900.00"}
+        ]
+        inventory.save()
+
+    def create_variants(self, count):
+        product = Product.objects.get(pk=1)
+        variants = []
+        for number in range(count):
+            variant = ProductVariant.objects.create(product=product)
+            Inventory.objects.create(
+                product_variant=variant,
+                sku=f"QUOTE-{number}",
+                regular_price=10,
+                weight=1,
+                unit="kg",
+            )
+            variants.append(variant)
+        return variants
+
+    def test_quote_applies_tiers_vat_and_shipping_without_writes(self):
+        carts, items = Cart.objects.count(), CartItem.objects.count()
+        response = self.client.post(
+            self.url,
+            {
+                "items": [
+                    {"product_variant": 1, "quantity": 10},
+                    {"product_variant": 1, "quantity": 2},
+                ],
+                "zip_code": "12345",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [line["unit_price"] for line in response.data["items"]],
+            ["90.00", "100.00"],
+        )
+        self.assertEqual(response.data["total_price"], "1100.00")
+        self.assertEqual(response.data["shipping_cost"], "0.00")
+        self.assertEqual(response.data["vat_amount"], "110.00")
+        self.assertEqual(response.data["total_with_vat"], "1210.00")
+        self.assertEqual(
+            (Cart.objects.count(), CartItem.objects.count()), (carts, items)
+        )
+
+        response = self.client.post(
+            self.url,
+            {"items": [{"product_variant": 1, "quantity": 2}], "zip_code": "12345"},
+            format="json",
+        )
+        self.assertEqual(response.data["shipping_cost"], "50.00")
+        self.assertEqual(response.data["total_with_vat"], "270.00")
+
+    def test_quote_with_coupon(self):
+        coupon = Coupon.objects.create(
+            code="TENOFF",
+            coupon_type=Coupon.CouponType.AMOUNT_OFF_ORDER,
+            discount_types=Coupon.DiscountType.PERCENTAGE,
+            discount_value=10,
+            start_date=date(2024, 1, 1),
+            start_time=time(0, 0),
+            end_date=date(2099, 1, 1),
+            end_time=time(0, 0),
+        )
+        lines = [{"product_variant": 1, "quantity": 10}]
+        response = self.client.post(
+            self.url, {"items": lines, "coupon_code": coupon.code}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Bulk tiers do not combine with coupons.
+        self.assertEqual(response.data["total_price"], "1000.00")
+        self.assertEqual(response.data["discounted_price"], "900.00")
+        self.assertEqual(response.data["coupon_code"], "TENOFF")
+
+        Coupon.objects.filter(pk=coupon.pk).update(is_active=False)
+        response = self.client.post(
+            self.url, {"items": lines, "coupon_code": coupon.code}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_lines(self):
+        response = self.client.post(
+            self.url,
+            {"items": [{"product_variant": 999, "quantity": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {"items": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_quote_delivery_address_must_belong_to_the_user(self):
+        user = User.objects.get(pk=1)
+        bakery = Bakery.objects.create(user=user, name="Quote Bakery", contact_no="1")
+        address = BakeryAddress.objects.create(
+            bakery=bakery,
+            address="Main street 1",
+            city="Stockholm",
+            state=BakeryAddress.SwedenStatesChoices.STOCKHOLM,
+            zipcode=12345,
+        )
+        payload = {
+            "items": [{"product_variant": 1, "quantity": 2}],
+            "delivery_address": address.pk,
+        }
+
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user)
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["shipping_cost"], "50.00")
+
+    def test_quote_query_count_does_not_grow_with_lines(self):
+        variants = self.create_variants(20)
+
+        def quote(count):
+            lines = [
+                {"product_variant": variant.pk, "quantity": 3}
+                for variant in variants[:count]
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    self.url, {"items": lines, "zip_code": "12345"}, format="json"
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.assertEqual(quote(2), quote(20))
+
+
+class CartBulkItemTestCase(APITestCase):
+    fixtures = ["cart/fixtures/cart_data.json"]
+
+    def setUp(self):
+        self.url = reverse("cart-items-bulk")
+        self.cart = Cart.objects.get(pk=1)
+        self.client.force_authenticate(User.objects.get(pk=1))
+        AdminConfiguration.objects.create(vat_amount=10)
+        product = Product.objects.get(pk=1)
+        self.variants = []
+        for number in range(50):
+            variant = ProductVariant.objects.create(product=product)
+            Inventory.objects.create(
+                product_variant=variant,
+                sku=f"BULK-{number}",
+                regular_price=10,
+                weight=1,
+                unit="kg",
+            )
+            self.variants.append(variant)
+
+    def patch(self, operations):
+        return self.client.patch(self.url, {"operations": operations}, format="json")
+
+    def test_operations_are_applied_once(self):
+        first, second = self.variants[:2]
+        response = self.patch(
+            [
+                {"product_variant": 1, "quantity": 1},
+                {"product_variant": first.pk, "quantity": 2},
+                {"product_variant": first.pk, "quantity": 3},
+                {"product_variant": second.pk, "action": "set", "quantity": 4},
+                {"product_variant": second.pk, "action": "remove"},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["changes"], {"created": 1, "updated": 1, "deleted": 1}
+        )
+        quantities = dict(self.cart.items.values_list("product_variant_id", "quantity"))
+        # The fixture's two items for variant 1 are merged.
+        self.assertEqual(quantities, {1: 6, first.pk: 5})
+        self.assertEqual(response.data["cart"]["total_price"], "650.00")
+        self.assertEqual(response.data["cart"]["total_with_vat"], "715.00")
+
+        response = self.patch(
+            [{"product_variant": first.pk, "action": "set", "quantity": 0}]
+        )
+        self.assertEqual(response.data["changes"]["deleted"], 1)
+        self.assertFalse(self.cart.items.filter(product_variant=first).exists())
+
+    def test_invalid_operations_write_nothing(self):
+        response = self.patch(
+            [
+                {"product_variant": self.variants[0].pk, "quantity": 1},
+                {"product_variant": 999, "quantity": 1},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.patch([{"product_variant": 1, "action": "set"}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.cart.items.count(), 2)
+
+    def test_query_count_does_not_grow_with_operations(self):
+        def reorder(variants):
+            operations = [
+                {"product_variant": variant.pk, "quantity": 2} for variant in variants
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.patch(operations)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.assertEqual(reorder(self.variants[:5]), reorder(self.variants[5:]))
+        self.assertEqual(self.cart.items.count(), 52)
+
+
+class GuestCartTestCase(APITestCase):
+    fixtures = ["cart/fixtures/cart_data.json"]
+
+    def add_item(self, product_variant, quantity):
+        return self.client.post(
+            reverse("cart-item-create"),
+            {"product_variant": product_variant, "quantity": quantity},
+            format="json",
+        )
+
+    def guest_cart(self):
+        return Cart.objects.get(user=None, session_id__isnull=False)
+
+    def test_guest_cart_needs_no_session(self):
+        self.add_item(1, 2)
+        self.add_item(1, 1)
+        self.assertIn(settings.GUEST_CART_COOKIE_NAME, self.client.cookies)
+        self.assertFalse(Session.objects.exists())
+        self.assertEqual(self.guest_cart().items.get().quantity, 3)
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add_item(1, 2)
+        self.client.cookies[settings.GUEST_CART_COOKIE_NAME] = "forged"
+        response = self.client.get(reverse("cart-item-create"))
+        self.assertEqual(response.data, [])
+
+    def test_guest_cart_is_merged_into_user_cart(self):
+        variant = ProductVariant.objects.create(product_id=1)
+        self.add_item(1, 2)
+        self.add_item(variant.pk, 1)
+        guest_cart = self.guest_cart()
+
+        self.client.force_authenticate(User.objects.get(pk=1))
+        response = self.client.get(reverse("cart-item-create"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Cart.objects.filter(pk=guest_cart.pk).exists())
+        quantities = dict(
+            Cart.objects.get(pk=1).items.values_list("product_variant_id", "quantity")
+        )
+        self.assertEqual(quantities, {1: 7, variant.pk: 1})
+        self.assertEqual(self.client.cookies[settings.GUEST_CART_COOKIE_NAME].value, "")
+
+    def test_guest_cart_is_adopted_by_user_without_cart(self):
+        self.add_item(1, 2)
+        guest_cart = self.guest_cart()
+        user = User.objects.create_user(email="guest@example.com", password="pass")
+
+        self.client.force_authenticate(user)
+        self.client.get(reverse("cart-item-create"))
+        guest_cart.refresh_from_db()
+        self.assertEqual((guest_cart.user, guest_cart.session_id), (user, None))
+
+    def test_abandoned_guest_carts_are_purged(self):
+        self.add_item(1, 2)
+        abandoned = self.guest_cart()
+        active = Cart.objects.create(session_id="active")
+        old = timezone.now() - timedelta(seconds=settings.GUEST_CART_MAX_AGE + 60)
+        Cart.objects.filter(pk__in=[abandoned.pk, 1]).update(updated_at=old)
+        CartItem.objects.filter(cart=abandoned).update(updated_at=old)
+
+        self.assertEqual(purge_guest_carts(), 1)
+        self.assertFalse(Cart.objects.filter(pk=abandoned.pk).exists())
+        self.assertEqual(Cart.objects.filter(pk__in=[active.pk, 1]).count(), 2)
+
+
+class CartCouponChangeTestCase(APITestCase):
+    fixtures = ["cart/fixtures/cart_data.json"]
+
+    def setUp(self):
+        self.coupon = Coupon.objects.create(
+            code="BUY1GET2",
+            coupon_type=Coupon.CouponType.BUY_X_GET_Y,
+            customer_gets_types=Coupon.CustomerGetsType.FREE,
+            customer_gets_quantity=2,
+            start_date=date(2024, 1, 1),
+            start_time=time(0, 0),
+            end_date=date(2099, 1, 1),
+            end_time=time(0, 0),
+        )
+        self.coupon.customer_get_products.add(1)
+
+    def test_saving_a_loaded_cart_does_not_refetch_it(self):
+        cart = Cart.objects.get(pk=1)
+        with CaptureQueriesContext(connection) as queries:
+            cart.save()
+        selects = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith("SELECT") and '"cart_cart"' in query["sql"]
+        ]
+        self.assertEqual(selects, [])
+
+    def test_removing_buy_x_get_y_coupon_takes_back_free_items(self):
+        cart = Cart.objects.get(pk=1)
+        cart.applied_coupon = self.coupon
+        cart.save()
+        self.assertEqual(sum(cart.items.values_list("quantity", flat=True)), 5)
+
+        cart.applied_coupon = None
+        cart.save()
+        # The fixture holds two items for variant 1 (2 and 3 units).
+        self.assertEqual(list(cart.items.values_list("quantity", flat=True)), [1])
+
+    def test_unloaded_original_coupon_is_read_from_the_row(self):
+        Cart.objects.filter(pk=1).update(applied_coupon=self.coupon)
+        cart = Cart.objects.only("pk").get(pk=1)
+        cart.applied_coupon = None
+        cart.save()
+        self.assertEqual(list(cart.items.values_list("quantity", flat=True)), [1])
+
+
 # class CartItemAPITestCase(APITestCase):
 #     fixtures = ["cart/fixtures/cart_data.json"]
 
@@ -1,10 +1,18 @@
 from django.urls import path
 
-from cart.views import CartAPIView, CartItemAPIView, ReOrderCartItemAPIView
+from cart.views import (
+    CartAPIView,
+    CartBulkItemAPIView,
+    CartItemAPIView,
+    CartQuoteAPIView,
+    ReOrderCartItemAPIView,
+)
 
 urlpatterns = [
     path("", CartAPIView.as_view(), name="cart-create"),
     path("item/", CartItemAPIView.as_view(), name="cart-item-create"),
     path("item/<int:pk>/", CartItemAPIView.as_view(), name="cart-item"),
+    path("items/", CartBulkItemAPIView.as_view(), name="cart-items-bulk"),
     path("re-order/", ReOrderCartItemAPIView.as_view(), name="re-order"),
+    path("quote/", CartQuoteAPIView.as_view(), name="cart-quote"),
 ]
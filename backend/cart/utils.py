@@ -1,5 +1,7 @@
 from enum import Enum
 
+from product.price_tiers import resolve_tier_price
+
 
 class USState(Enum):
     ALABAMA = "AL"
@@ -59,37 +61,16 @@ def apply_bulk_price(cart):
     Update cart item prices based on bulk price rules.
     """
     if cart and cart.pk:
-        if not cart.cart_items.exists():  # Ensure the cart has items
-            return
-
-        for item in cart.cart_items.all():  # Iterate over the items directly
-            if (
-                not item.product_variant or not item.product_variant.inventory_items
-            ):  # Skip items without inventory
+        items = cart.cart_items.select_related("product_variant__inventory_items")
+        for item in items:
+            inventory = getattr(item.product_variant, "inventory_items", None)
+            if inventory is None:  # Skip items without inventory
                 continue
 
-            inventory = item.product_variant.inventory_items
-            bulk_price_rules = inventory.bulking_price_rules
-
-            if bulk_price_rules:
-                sorted_rules = sorted(
-                    bulk_price_rules, key=lambda x: x.get("quantity_from", 0)
-                )
-                applied_price = None
-
-                for rule in sorted_rules:
-                    quantity_from = rule.get("quantity_from", 0)
-                    quantity_to = rule.get("quantity_to", float("inf"))
-                    price = rule.get("price")
-
-                    if quantity_from <= item.quantity <= quantity_to:
-
-                        applied_price = price
-                        break
-
-                if applied_price:
-                    try:
-                        item.price = applied_price
-                        item.save()
-                    except Exception as e:
-                        print(f"Error saving item {item.id}: {e}")
+            applied_price = resolve_tier_price(inventory.price_tiers, item.quantity)
+            if applied_price:
+                try:
+                    item.price = applied_price
+                    item.save()
+                except Exception as e:
+                    print(f"Error saving item {item.id}: {e}")
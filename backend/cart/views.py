@@ -1,16 +1,29 @@
-from decimal import Decimal
-
-from django.conf import settings
-from django.db.models import Q
+from django.db import transaction
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from bakery.models import BakeryAddress
+from cart.guest import get_request_cart
 from cart.models import Cart, CartItem
-from cart.serializers import CartItemInputSerializer, CartItemSerializer, CartSerializer
-from dashboard.models import AdminConfiguration, ZipCodeConfig
+from cart.operations import REMOVE, apply_operations
+from cart.pricing import (
+    configured_vat_percentage,
+    prefetch_items,
+    price_cart,
+    price_lines,
+    zip_shipping_cost,
+)
+from cart.serializers import (
+    CartBulkUpdateSerializer,
+    CartItemInputSerializer,
+    CartItemSerializer,
+    CartQuoteResultSerializer,
+    CartQuoteSerializer,
+    CartSerializer,
+)
+from coupon.utils import get_usable_coupon
 from product.models import ProductVariant
 
 
@@ -19,8 +32,8 @@ class CartAPIView(APIView):
     API view for managing shopping carts.
 
     Methods:
-    - POST: Get or create cart for current user/session
-        - Merges session cart with user cart on login
+    - POST: Get or create cart for current user or guest
+        - Merges the guest cart into the user cart on login
         - Calculates shipping costs based on delivery address
         - Applies VAT based on configuration
 
@@ -49,7 +62,7 @@ class CartAPIView(APIView):
 
     def post(self, request):
         """
-        Get or create cart for current user/session.
+        Get or create cart for current user or guest.
 
         Args:
             request: HTTP request object with optional delivery_address
@@ -65,84 +78,30 @@ class CartAPIView(APIView):
             400: Bad Request if cart creation fails
         """
         # try:
-        configuration = AdminConfiguration.objects.all().last()
-
-        user = request.user if request.user.is_authenticated else None
-        session_id = request.session.session_key
-        if not session_id:
-            request.session.save()
-            session_id = request.session.session_key
-
-        if user:
-            try:
-                cart = Cart.objects.filter(user=user).last()
-                if not cart:
-                    cart = Cart.objects.create(user=user)
-            except Cart.DoesNotExist:
-                cart = Cart.objects.filter(session_id=session_id).last()
-                if cart:
-                    cart.user = user
-                    cart.save()
-                else:
-                    cart = Cart.objects.create(user=user)
-            session_cart = Cart.objects.filter(session_id=session_id).last()
-            if session_cart:
-                # Merge session cart items into user cart
-                for item in session_cart.items.all():
-                    # Check if the product already exists in the user's cart
-                    user_cart_item = CartItem.objects.filter(
-                        cart=cart, product_variant=item.product_variant
-                    ).first()
-
-                    if user_cart_item:
-                        # Update quantity if the item already exists
-                        user_cart_item.quantity += item.quantity if item.quantity else 1
-                        user_cart_item.save()
-                    else:
-                        # Create a new cart item if it doesn't exist
-                        CartItem.objects.create(
-                            cart=cart,
-                            product_variant=item.product_variant,
-                            quantity=item.quantity,
-                        )
-
-                session_cart.delete()
-        else:
-            # Anonymous user
-            if session_id:
-                cart_queryset = Cart.objects.filter(session_id=session_id)
-                if cart_queryset.exists():
-                    cart = cart_queryset.last()
-                else:
-                    cart = Cart.objects.create(session_id=session_id)
+        cart = get_request_cart(request, create=True)
 
         # Retrieve VAT configuration
-        vat_amount = (
-            configuration.vat_amount if configuration else settings.VAT_PERCENTAGE
-        )
+        vat_amount = configured_vat_percentage()
 
-        shipping_cost = Decimal("0.00")
-        free_delivery_threshold = Decimal("0.00")
+        zip_code = None
         shipping_address = request.data.get("delivery_address")
         if shipping_address:
             address = BakeryAddress.objects.filter(id=shipping_address).first()
-            if address and address.zipcode:
-                zip_config = ZipCodeConfig.objects.filter(
-                    zip_code=address.zipcode
-                ).first()
-                if zip_config:
-                    free_delivery_threshold = Decimal(zip_config.min_order_amount)
-                    shipping_cost = Decimal(zip_config.delivery_cost)
+            zip_code = address.zipcode if address else None
 
-        if cart.total_price >= free_delivery_threshold:
-            shipping_cost = Decimal("0.00")
+        prefetch_items(cart)
+        shipping_cost = zip_shipping_cost(zip_code, price_cart(cart).total_price)
 
         cart.shipping_cost = shipping_cost
         cart.save()
 
-        cart.calculate_vat(vat_percentage=int(vat_amount), shipping_cost=shipping_cost)
+        pricing = cart.calculate_vat(
+            vat_percentage=int(vat_amount), shipping_cost=shipping_cost
+        )
 
-        serializer = CartSerializer(cart, context=self.get_serializer_context(request))
+        context = self.get_serializer_context(request)
+        context["pricing"] = pricing
+        serializer = CartSerializer(cart, context=context)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
         # except Exception as e:
@@ -162,7 +121,7 @@ class CartItemAPIView(APIView):
     Features:
     - Validates product availability
     - Enforces maximum quantity limits (10 per item)
-    - Handles both user and session carts
+    - Handles both user and guest carts
 
     Authentication:
     - Optional JWT authentication
@@ -187,9 +146,6 @@ class CartItemAPIView(APIView):
             404: Not Found if product variant doesn't exist
         """
 
-        user = request.user if request.user.is_authenticated else None
-        session_id = request.session.session_key
-
         product_variant_id = request.data.get("product_variant")
         quantity = request.data.get("quantity", 1)
         if not product_variant_id:
@@ -207,19 +163,7 @@ class CartItemAPIView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        if user:
-            cart, created = Cart.objects.get_or_create(user=user)
-            if session_id:
-                cart.session_id = session_id
-                # cart.save()
-        else:
-
-            try:
-                cart, created = Cart.objects.get_or_create(
-                    session_id=session_id, user=None
-                )
-            except Exception:
-                Cart.objects.filter(session_id=session_id).distinct()
+        cart = get_request_cart(request, create=True)
 
         cart_item = CartItem.objects.filter(
             cart=cart, product_variant=product_variant.id
@@ -278,18 +222,20 @@ class CartItemAPIView(APIView):
             Response: List of cart items with details
         """
         try:
-            user = request.user
-            session_id = request.session.session_key
-
-            try:
-                cart = Cart.objects.filter(
-                    Q(session_id=session_id)
-                    | Q(user=user if user.is_authenticated else None)
-                ).last()
-            except Cart.DoesNotExist:
+            cart = get_request_cart(request)
+            if cart is None:
                 return Response([], status=status.HTTP_200_OK)
 
-            cart_item = CartItem.objects.filter(cart=cart).order_by("-created_at")
+            cart_item = (
+                CartItem.objects.filter(cart=cart)
+                .select_related(
+                    "cart",
+                    "product_variant__inventory_items",
+                    "product_variant__product",
+                )
+                .prefetch_related("product_variant__product__images")
+                .order_by("-created_at")
+            )
         except CartItem.DoesNotExist:
             return Response([], status=status.HTTP_200_OK)
 
@@ -394,9 +340,6 @@ class ReOrderCartItemAPIView(APIView):
         Raises:
             400: Bad Request if any item is invalid
         """
-        user = request.user if request.user.is_authenticated else None
-        session_id = request.session.session_key or request.session.create()
-
         data = request.data
         serializer = CartItemInputSerializer(data=data, many=True)
         if not serializer.is_valid():
@@ -404,11 +347,7 @@ class ReOrderCartItemAPIView(APIView):
 
         validated_data = serializer.validated_data
 
-        if user:
-            cart, created = Cart.objects.get_or_create(user=user)
-            cart.session_id = session_id
-        else:
-            cart, created = Cart.objects.get_or_create(session_id=session_id, user=None)
+        cart = get_request_cart(request, create=True)
 
         response_data = []
         for item in validated_data:
@@ -455,3 +394,218 @@ class ReOrderCartItemAPIView(APIView):
             response_data.append(CartItemSerializer(cart_item).data)
 
         return Response(response_data, status=status.HTTP_200_OK)
+
+
+class CartQuoteAPIView(APIView):
+    """
+    API view for pricing a list of product variants without a cart.
+
+    Methods:
+    - POST: Quote up to 500 (product_variant, quantity) lines
+        - Applies bulk price tiers, active sale prices and an optional coupon
+        - Adds VAT from the admin configuration
+        - Adds shipping for the delivery address (or zip code) from its
+          zip code configuration
+
+    Features:
+    - Stateless: nothing is written to the cart
+    - Variants, inventories and coupon data are loaded in bulk, so a quote
+      costs a fixed number of queries however many lines it has
+
+    Authentication:
+    - Optional JWT authentication
+    - Coupons for specific customers and saved delivery addresses require an
+      authenticated user
+    """
+
+    @swagger_auto_schema(request_body=CartQuoteSerializer)
+    def post(self, request):
+        """
+        Price the requested lines.
+
+        Args:
+            request: HTTP request object containing:
+                - items: list of product_variant/quantity pairs
+                - coupon_code: optional coupon to apply
+                - delivery_address or zip_code: optional, for shipping
+
+        Returns:
+            Response: Per-line prices and the totals with VAT and shipping
+
+        Raises:
+            400: Bad Request if the lines, coupon or address are invalid
+        """
+        serializer = CartQuoteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        user = request.user if request.user.is_authenticated else None
+
+        variant_ids = {line["product_variant"] for line in data["items"]}
+        variants = ProductVariant.objects.select_related("inventory_items").in_bulk(
+            variant_ids
+        )
+        unavailable = sorted(
+            pk
+            for pk in variant_ids
+            if getattr(variants.get(pk), "inventory_items", None) is None
+        )
+        if unavailable:
+            return Response(
+                {"error": f"Product variants not available: {unavailable}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lines = [
+            CartItem(
+                product_variant=variants[line["product_variant"]],
+                quantity=line["quantity"],
+            )
+            for line in data["items"]
+        ]
+
+        zip_code = data.get("zip_code")
+        if data.get("delivery_address"):
+            # Guests have no addresses: never look one up without an owner.
+            address = None
+            if user is not None:
+                address = BakeryAddress.objects.filter(
+                    id=data["delivery_address"], bakery__user=user
+                ).first()
+            if not address:
+                return Response(
+                    {"error": "Delivery address not found."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            zip_code = address.zipcode
+
+        coupon = None
+        if data.get("coupon_code"):
+            coupon = get_usable_coupon(data["coupon_code"], user)
+            if coupon is None:
+                return Response(
+                    {"error": "Invalid or expired coupon code."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        total_price = price_lines(lines).total_price
+        if (
+            coupon
+            and coupon.minimum_purchase_amount
+            and total_price < coupon.minimum_purchase_value
+        ):
+            return Response(
+                {
+                    "error": f"Minimum purchase amount of "
+                    f"{coupon.minimum_purchase_value} not met."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        pricing = price_lines(
+            lines,
+            coupon=coupon,
+            user_id=user.pk if user else None,
+            vat_percentage=int(configured_vat_percentage()),
+            shipping_cost=zip_shipping_cost(zip_code, total_price),
+        )
+        return Response(
+            CartQuoteResultSerializer(pricing).data, status=status.HTTP_200_OK
+        )
+
+
+class CartBulkItemAPIView(APIView):
+    """
+    API view for changing many cart items in one request.
+
+    Methods:
+    - PATCH: Apply add/set/remove operations for many product variants
+        - add: increase the quantity (creating the item)
+        - set: replace the quantity; 0 removes the item
+        - remove: delete the item
+
+    Features:
+    - Runs in one transaction holding the cart's row lock
+    - Writes with one bulk insert, update and delete
+    - Recalculates coupon effects, shipping and VAT once at the end, so the
+      query count does not depend on the number of operations
+
+    Authentication:
+    - Optional JWT authentication
+    - Works with both authenticated and anonymous users
+    """
+
+    @swagger_auto_schema(request_body=CartBulkUpdateSerializer)
+    def patch(self, request):
+        """
+        Apply item operations to the current cart.
+
+        Args:
+            request: HTTP request object containing:
+                - operations: list of action/product_variant/quantity
+                - delivery_address: optional address ID for shipping
+
+        Returns:
+            Response: The operation counts and the recalculated cart
+
+        Raises:
+            400: Bad Request if an operation, variant or address is invalid
+        """
+        serializer = CartBulkUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        operations = data["operations"]
+
+        variant_ids = {
+            operation["product_variant"]
+            for operation in operations
+            if operation["action"] != REMOVE
+        }
+        available = set(
+            ProductVariant.objects.filter(
+                pk__in=variant_ids, inventory_items__isnull=False
+            ).values_list("pk", flat=True)
+        )
+        unavailable = sorted(variant_ids - available)
+        if unavailable:
+            return Response(
+                {"error": f"Product variants not available: {unavailable}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        zip_code = None
+        if data.get("delivery_address"):
+            address = (
+                request.user.is_authenticated
+                and BakeryAddress.objects.filter(
+                    id=data["delivery_address"], bakery__user=request.user
+                ).first()
+            )
+            if not address:
+                return Response(
+                    {"error": "Delivery address not found."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            zip_code = address.zipcode
+
+        with transaction.atomic():
+            cart = get_request_cart(request, create=True)
+            cart = (
+                Cart.objects.select_for_update(of=("self",))
+                .select_related("applied_coupon")
+                .get(pk=cart.pk)
+            )
+            changes = apply_operations(cart, operations)
+
+            prefetch_items(cart)
+            shipping_cost = zip_shipping_cost(zip_code, price_cart(cart).total_price)
+            pricing = cart.calculate_vat(
+                vat_percentage=int(configured_vat_percentage()),
+                shipping_cost=shipping_cost,
+            )
+
+        context = {"request": request, "pricing": pricing}
+        return Response(
+            {"changes": changes, "cart": CartSerializer(cart, context=context).data},
+            status=status.HTTP_200_OK,
+        )
@@ -0,0 +1,131 @@
+"""
+Compiled coupons.
+
+Checking a cart against a coupon needs its product sets (``buy_products``,
+``customer_get_products``, ``specific_products``), its states and its time
+window. ``get_compiled_coupon`` loads them once into a frozen
+``CompiledCoupon`` and keeps it per process, tagged with the coupon's
+``updated_at``. The version therefore comes with the coupon row the caller
+already loaded and is the same in every process. The signals in
+``coupon.signals`` move ``updated_at`` when one of the coupon's relations
+changes (saving the coupon moves it anyway), so evaluating a cart is set
+arithmetic in memory instead of a query per relation.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from coupon.models import Coupon, State
+from product.models import ProductVariant
+
+compiled_coupons = {}
+
+
+@dataclass(frozen=True)
+class CompiledCoupon:
+    coupon_id: int
+    version: datetime | None
+    starts_at: datetime
+    ends_at: datetime
+    specific_products: frozenset
+    buy_products: frozenset
+    get_products: frozenset
+    states: frozenset
+
+    def is_current(self, now=None):
+        return self.starts_at <= (now or timezone.now()) <= self.ends_at
+
+    def eligible_products(self, coupon):
+        """The variants an ``amount_off_product`` coupon applies to (``None``: all)."""
+        if coupon.applies_to == Coupon.CouponApplyType.SPECIFIC_PRODUCTS:
+            return self.specific_products
+        return None
+
+
+def combine(day, moment):
+    return timezone.make_aware(datetime.combine(day, moment))
+
+
+def relations_prefetch():
+    """The relations ``compile_coupon`` reads, loading only what it needs."""
+    variants = ProductVariant.objects.only("pk")
+    return [
+        Prefetch("specific_products", queryset=variants),
+        Prefetch("buy_products", queryset=variants),
+        Prefetch("customer_get_products", queryset=variants),
+        Prefetch("states", queryset=State.objects.only("pk", "abbreviation")),
+    ]
+
+
+def compile_coupon(coupon, version):
+    def ids(relation):
+        return frozenset(related.pk for related in relation.all())
+
+    return CompiledCoupon(
+        coupon_id=coupon.pk,
+        version=version,
+        starts_at=combine(coupon.start_date, coupon.start_time),
+        ends_at=combine(coupon.end_date, coupon.end_time),
+        specific_products=ids(coupon.specific_products),
+        buy_products=ids(coupon.buy_products),
+        get_products=ids(coupon.customer_get_products),
+        states=frozenset(state.abbreviation for state in coupon.states.all()),
+    )
+
+
+def is_compiled(coupon):
+    compiled = compiled_coupons.get(coupon.pk)
+    return (
+        compiled is not None
+        and coupon.updated_at is not None
+        and compiled.version == coupon.updated_at
+    )
+
+
+def get_compiled_coupons(coupons):
+    """
+    The ``CompiledCoupon`` of each of ``coupons``, compiling the ones whose
+    ``updated_at`` moved with one query per relation for all of them.
+    """
+    stale = [coupon for coupon in coupons if not is_compiled(coupon)]
+    if stale:
+        # Fresh instances, so a stale prefetch cache is never compiled.
+        fresh = Coupon.objects.prefetch_related(*relations_prefetch()).in_bulk(
+            [coupon.pk for coupon in stale]
+        )
+        for coupon in stale:
+            compiled_coupons[coupon.pk] = compile_coupon(
+                fresh.get(coupon.pk, coupon), coupon.updated_at
+            )
+    return [compiled_coupons[coupon.pk] for coupon in coupons]
+
+
+def get_compiled_coupon(coupon):
+    """The ``CompiledCoupon`` of ``coupon``, compiled once per version."""
+    return get_compiled_coupons([coupon])[0]
+
+
+def forget_coupons(coupon_ids):
+    for coupon_id in coupon_ids:
+        compiled_coupons.pop(coupon_id, None)
+
+
+def invalidate_coupons(coupon_ids, touch=True):
+    """
+    Retire the compiled form of ``coupon_ids``. With ``touch`` their
+    ``updated_at`` is moved, so every process recompiles them; pass
+    ``touch=False`` for rows that were just saved. This process drops its
+    copies now and again on commit, so nothing compiled from uncommitted rows
+    is kept.
+    """
+    coupon_ids = list(coupon_ids)
+    if not coupon_ids:
+        return
+    if touch:
+        Coupon.objects.filter(pk__in=coupon_ids).update(updated_at=timezone.now())
+    forget_coupons(coupon_ids)
+    transaction.on_commit(lambda: forget_coupons(coupon_ids))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from coupon.segments import rebuild_customer_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the order count and last order time of every customer"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of customers recomputed per query",
+        )
+
+    def handle(self, *args, **kwargs):
+        rebuild_customer_summaries(batch_size=kwargs["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Customer order summaries rebuilt."))
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def build_customer_summaries(apps, schema_editor):
+    # Works on the historical models so later schema changes cannot break it;
+    # ``manage.py rebuild_customer_summaries`` rebuilds the same rows with the
+    # live code.
+    Order = apps.get_model("orders", "Order")
+    CustomerOrderSummary = apps.get_model("coupon", "CustomerOrderSummary")
+
+    customers = (
+        Order.objects.filter(user__isnull=False)
+        .values("user_id")
+        .annotate(order_count=Count("pk"), last_order_at=Max("created_at"))
+        .order_by("user_id")
+    )
+    CustomerOrderSummary.objects.bulk_create(
+        (
+            CustomerOrderSummary(
+                user_id=row["user_id"],
+                order_count=row["order_count"],
+                last_order_at=row["last_order_at"],
+            )
+            for row in customers.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0021_alter_verifyemailotp_email"),
+        ("coupon", "0022_coupon_minimum_purchase_requirement"),
+        ("orders", "0032_alter_invoice_due_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerOrderSummary",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="order_summary",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("order_count", models.PositiveIntegerField(db_index=True, default=0)),
+                (
+                    "last_order_at",
+                    models.DateTimeField(blank=True, db_index=True, null=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(build_customer_summaries, migrations.RunPython.noop),
+    ]
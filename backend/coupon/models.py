@@ -294,3 +294,25 @@ class UserCoupon(models.Model):
     def __str__(self):
         status = "Redeemed" if self.redeemed else "Not Redeemed"
         return f"{self.user} - {self.coupon.code} /- {status}"
+
+
+class CustomerOrderSummary(models.Model):
+    """
+    Per-customer order aggregates used to match coupon customer segments.
+
+    Maintained incrementally by ``coupon.signals`` (see ``coupon.segments``)
+    so segment queries read indexed columns instead of aggregating the order
+    history.
+    """
+
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="order_summary",
+    )
+    order_count = models.PositiveIntegerField(default=0, db_index=True)
+    last_order_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"Order summary for {self.user_id}"
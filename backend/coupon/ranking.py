@@ -0,0 +1,189 @@
+"""
+Best coupon selection.
+
+``rank_coupons`` prices a cart under every coupon its user can redeem and
+ranks them by what each saves. The cart's items, the user's coupons, their
+compiled product and state sets (see ``coupon.compiled``), the get products
+of Buy X Get Y coupons and the primary address are each loaded once; every
+coupon is then priced in memory by ``cart.pricing.price_lines`` against the
+same snapshot, so ranking dozens of coupons costs the same handful of
+queries as ranking one.
+
+A coupon's saving is the cart's total (VAT and shipping included) without it
+minus the total with it, over the lines the coupon would leave in the cart:
+a Buy X Get Y coupon is priced with its get products added, as
+``ApplyCouponAPIView`` would add them. Coupons the cart does not qualify for
+or that save nothing are left out.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.utils import timezone
+
+from cart.models import CartItem
+from cart.pricing import (
+    CartPrice,
+    configured_vat_percentage,
+    get_primary_address,
+    load_items,
+    price_lines,
+)
+from coupon.compiled import get_compiled_coupons
+from coupon.models import Coupon, UserCoupon
+from product.models import ProductVariant
+
+
+@dataclass(frozen=True)
+class RankedCoupon:
+    coupon: Coupon
+    saving: Decimal
+    price: CartPrice
+
+
+def redeemable_coupons(user):
+    """The active coupons assigned to ``user`` and not redeemed yet."""
+    today = timezone.localdate()
+    user_coupons = UserCoupon.objects.filter(
+        user=user,
+        redeemed=False,
+        coupon__is_active=True,
+        coupon__is_deleted=False,
+        coupon__start_date__lte=today,
+        coupon__end_date__gte=today,
+    ).select_related("coupon")
+    coupons = []
+    for user_coupon in user_coupons:
+        coupon = user_coupon.coupon
+        if (
+            coupon.maximum_discount_usage
+            == Coupon.MaximumDiscountUsage.LIMIT_DISCOUNT_USAGE_TIME
+            and coupon.maximum_usage_value <= coupon.usage_count
+        ):
+            continue
+        coupons.append(coupon)
+    return coupons
+
+
+def meets_minimum(coupon, items, total_price):
+    if coupon.minimum_purchase_amount:
+        if total_price < coupon.minimum_purchase_value:
+            return False
+    if coupon.minimum_purchase_item:
+        total_items = sum(item.quantity for item in items)
+        if total_items < coupon.buy_products_quantity:
+            return False
+        if total_items < coupon.minimum_item_value:
+            return False
+    return True
+
+
+def buy_x_get_y_lines(coupon, compiled, items, variants):
+    """
+    ``items`` with the coupon's get products added, or ``None`` when the
+    cart does not hold enough of its buy products.
+    """
+    buy_count = sum(item.product_variant_id in compiled.buy_products for item in items)
+    if not buy_count or buy_count < coupon.buy_products_quantity:
+        return None
+
+    # Lines of a get product are merged into one, as ``apply_operations`` does.
+    get_products = compiled.get_products & variants.keys()
+    lines, positions = [], {}
+    for item in items:
+        variant_id = item.product_variant_id
+        if variant_id not in get_products:
+            lines.append(item)
+        elif variant_id in positions:
+            lines[positions[variant_id]].quantity += item.quantity
+        else:
+            positions[variant_id] = len(lines)
+            lines.append(
+                CartItem(
+                    pk=item.pk,
+                    cart_id=item.cart_id,
+                    product_variant=item.product_variant,
+                    quantity=item.quantity,
+                )
+            )
+    for variant_id in sorted(get_products):
+        if variant_id in positions:
+            lines[positions[variant_id]].quantity += coupon.customer_gets_quantity
+        else:
+            lines.append(
+                CartItem(
+                    product_variant=variants[variant_id],
+                    quantity=coupon.customer_gets_quantity,
+                )
+            )
+    return lines
+
+
+def rank_coupons(cart, coupons=None, vat_percentage=None):
+    """
+    Rank ``coupons`` (default: those ``cart``'s user can redeem) by what
+    they save on ``cart``, best first, as ``RankedCoupon`` entries.
+    """
+    if coupons is None:
+        coupons = redeemable_coupons(cart.user_id) if cart.user_id else []
+    items = load_items(cart)
+    if not coupons or not items:
+        return []
+    if vat_percentage is None:
+        vat_percentage = configured_vat_percentage()
+
+    now = timezone.now()
+    compiled_coupons = get_compiled_coupons(coupons)
+    candidates = [
+        (coupon, compiled)
+        for coupon, compiled in zip(coupons, compiled_coupons)
+        if compiled.is_current(now)
+    ]
+
+    get_product_ids = set()
+    needs_address = False
+    for coupon, compiled in candidates:
+        if coupon.coupon_type == Coupon.CouponType.BUY_X_GET_Y:
+            get_product_ids |= compiled.get_products
+        elif coupon.coupon_type == Coupon.CouponType.FREE_SHIPPING:
+            needs_address = True
+    variants = {}
+    if get_product_ids:
+        variants = ProductVariant.objects.select_related("inventory_items").in_bulk(
+            get_product_ids
+        )
+    address = get_primary_address(cart.user_id) if needs_address else None
+
+    def price(lines, coupon=None):
+        return price_lines(
+            lines,
+            coupon=coupon,
+            user_id=cart.user_id,
+            vat_percentage=vat_percentage,
+            shipping_cost=cart.shipping_cost,
+            cart_id=cart.pk,
+            address=address,
+        )
+
+    base_price = price(items)
+    ranking = []
+    for coupon, compiled in candidates:
+        if not meets_minimum(coupon, items, base_price.total_price):
+            continue
+        lines, without_coupon = items, base_price
+        if coupon.coupon_type == Coupon.CouponType.BUY_X_GET_Y:
+            lines = buy_x_get_y_lines(coupon, compiled, items, variants)
+            if lines is None:
+                continue
+            without_coupon = price(lines)
+        elif coupon.coupon_type == Coupon.CouponType.FREE_SHIPPING and not address:
+            continue
+
+        with_coupon = price(lines, coupon)
+        saving = without_coupon.total_with_vat - with_coupon.total_with_vat
+        if saving > 0:
+            ranking.append(
+                RankedCoupon(coupon=coupon, saving=saving, price=with_coupon)
+            )
+    ranking.sort(key=lambda ranked: ranked.saving, reverse=True)
+    return ranking
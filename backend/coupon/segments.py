@@ -0,0 +1,124 @@
+"""
+Coupon customer segments.
+
+``CustomerOrderSummary`` keeps each customer's order count and latest order
+time. The signals in ``coupon.signals`` add one order per ``Order`` created
+and recount a customer when one of their orders is deleted, so matching a
+segment never scans the order history.
+
+``assign_coupon`` hands a coupon to every customer of its segment with one
+``INSERT ... SELECT ... ON CONFLICT DO NOTHING``; customers who already hold
+the coupon are skipped by the ``(user, coupon)`` unique constraint.
+"""
+
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count, F, Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from account.models import CustomUser
+from coupon.models import Coupon, CustomerOrderSummary, UserCoupon
+from orders.models import Order
+
+RECENT_PURCHASE_DAYS = 30
+
+
+def refresh_customer_summaries(user_ids):
+    """Recount the orders of the given customers in one query."""
+    user_ids = set(
+        CustomUser.objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+    )
+    if not user_ids:
+        return
+    aggregates = {
+        row["user_id"]: row
+        for row in Order.objects.filter(user_id__in=user_ids)
+        .values("user_id")
+        .annotate(order_count=Count("pk"), last_order_at=Max("created_at"))
+    }
+    CustomerOrderSummary.objects.bulk_create(
+        [
+            CustomerOrderSummary(
+                user_id=user_id,
+                order_count=aggregates.get(user_id, {}).get("order_count", 0),
+                last_order_at=aggregates.get(user_id, {}).get("last_order_at"),
+            )
+            for user_id in user_ids
+        ],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["order_count", "last_order_at"],
+    )
+
+
+def record_order(user_id, created_at):
+    """Count a new order of ``user_id`` without reading the summary first."""
+    if user_id is None:
+        return
+    updated = CustomerOrderSummary.objects.filter(user_id=user_id).update(
+        order_count=F("order_count") + 1,
+        last_order_at=Greatest(F("last_order_at"), created_at),
+    )
+    if not updated:
+        refresh_customer_summaries([user_id])
+
+
+def rebuild_customer_summaries(batch_size=500):
+    """Recompute the summary of every customer with orders."""
+    user_ids = list(
+        Order.objects.filter(user__isnull=False)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    for start in range(0, len(user_ids), batch_size):
+        refresh_customer_summaries(user_ids[start : start + batch_size])
+
+
+def segment_users(coupon, now=None):
+    """The customers ``coupon`` is meant for, as a queryset."""
+    if coupon.customer_eligibility == Coupon.CustomerEligibilityType.ALL_CUSTOMER:
+        return CustomUser.objects.all()
+    if coupon.customer_eligibility != Coupon.CustomerEligibilityType.SPECIFIC_CUSTOMER:
+        return CustomUser.objects.none()
+
+    customers = CustomUser.objects.filter(role="bakery")
+    specification = coupon.customer_specification
+    if specification == Coupon.CustomerSpecificType.HAVENT_PURCHASED:
+        return customers.exclude(order_summary__order_count__gt=0)
+    if specification == Coupon.CustomerSpecificType.PURCHASED_ONCE:
+        return customers.filter(order_summary__order_count=1)
+    if specification == Coupon.CustomerSpecificType.PURCHASED_MORE_THAN_ONCE:
+        return customers.filter(order_summary__order_count__gt=1)
+    if specification == Coupon.CustomerSpecificType.RECENT_PURCHASED:
+        since = (now or timezone.now()) - timedelta(days=RECENT_PURCHASE_DAYS)
+        return customers.filter(order_summary__last_order_at__gte=since)
+    return CustomUser.objects.none()
+
+
+def assign_coupon(coupon):
+    """
+    Give ``coupon`` to every customer of its segment who does not hold it
+    yet. Returns the number of customers it was given to.
+    """
+    if coupon.customer_eligibility == Coupon.CustomerEligibilityType.SPECIFIC_CUSTOMER:
+        maximum_usage = coupon.usage_count
+    else:
+        maximum_usage = UserCoupon._meta.get_field("maximum_usage").default
+    select_sql, params = segment_users(coupon).values("pk").query.sql_with_params()
+
+    quote = connection.ops.quote_name
+    columns = ", ".join(
+        quote(UserCoupon._meta.get_field(name).column)
+        for name in ["user", "coupon", "redeemed", "maximum_usage"]
+    )
+    sql = (
+        f"INSERT INTO {quote(UserCoupon._meta.db_table)} ({columns}) "
+        f"SELECT segment.id, %s, false, %s FROM ({select_sql}) AS segment(id) "
+        "ON CONFLICT DO NOTHING"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [coupon.pk, maximum_usage, *params])
+        return cursor.rowcount
@@ -455,3 +455,19 @@ class BulkCouponSerializer(serializers.Serializer):
         if not all(isinstance(id, int) for id in value):
             raise serializers.ValidationError("All Coupon must be integers.")
         return value
+
+
+class RankedCouponSerializer(serializers.Serializer):
+    coupon_id = serializers.IntegerField(source="coupon.id")
+    code = serializers.CharField(source="coupon.code")
+    coupon_type = serializers.CharField(source="coupon.coupon_type")
+    saving = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discounted_price = serializers.DecimalField(
+        source="price.discounted_price", max_digits=12, decimal_places=2
+    )
+    shipping_cost = serializers.DecimalField(
+        source="price.shipping_cost", max_digits=10, decimal_places=2
+    )
+    total_with_vat = serializers.DecimalField(
+        source="price.total_with_vat", max_digits=12, decimal_places=2
+    )
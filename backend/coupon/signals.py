@@ -1,101 +1,62 @@
-from datetime import timedelta
-
-from django.contrib.auth import get_user_model
-from django.db.models import Count
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from django.utils import timezone
 
 from account.models import CustomUser
-from coupon.models import Coupon, UserCoupon
-from coupon.tasks import assign_coupons_to_new_user
+from coupon import segments
+from coupon.compiled import invalidate_coupons
+from coupon.models import Coupon
+from coupon.tasks import assign_coupon_to_segment, assign_coupons_to_new_user
 from orders.models import Order
 
-User = get_user_model()
-
 
 @receiver(post_save, sender=Coupon)
-def assign_coupon_to_all_users(sender, instance, created, **kwargs):
-    if (
-        created
-        and instance.customer_eligibility == Coupon.CustomerEligibilityType.ALL_CUSTOMER
-    ):
-        users = User.objects.all()
-        user_coupons = [
-            UserCoupon(user=user, coupon=instance)
-            for user in users
-            if not UserCoupon.objects.filter(user=user, coupon=instance).exists()
-        ]
-        UserCoupon.objects.bulk_create(user_coupons)
+def assign_coupon_to_eligible_users(sender, instance, created, **kwargs):
+    """
+    Hand a new coupon to its customer segment in the background, once the
+    coupon is committed.
+    """
+    if created:
+        coupon_id = instance.pk
+        transaction.on_commit(lambda: assign_coupon_to_segment.delay(coupon_id))
 
 
 @receiver(post_save, sender=Coupon)
-def assign_coupon_to_eligible_users(sender, instance, created, **kwargs):
-    users = None
-    if created:
+@receiver(post_delete, sender=Coupon)
+def invalidate_compiled_coupon(sender, instance, **kwargs):
+    invalidate_coupons([instance.pk], touch=False)
+
 
-        if (
-            instance.customer_eligibility
-            == Coupon.CustomerEligibilityType.SPECIFIC_CUSTOMER
-        ):
-            if (
-                instance.customer_specification
-                == Coupon.CustomerSpecificType.HAVENT_PURCHASED
-            ):
-                users = User.objects.filter(role="bakery").exclude(
-                    id__in=Order.objects.values_list("user_id", flat=True)
-                )
-            elif (
-                instance.customer_specification
-                == Coupon.CustomerSpecificType.PURCHASED_MORE_THAN_ONCE
-            ):
-                # Users who have made more than one purchase
-                user_ids = (
-                    Order.objects.values("user_id")
-                    .annotate(order_count=Count("id"))
-                    .filter(order_count__gt=1)
-                    .values_list("user_id", flat=True)
-                )
-                users = User.objects.filter(id__in=user_ids, role="bakery")
+@receiver(m2m_changed, sender=Coupon.specific_products.through)
+@receiver(m2m_changed, sender=Coupon.buy_products.through)
+@receiver(m2m_changed, sender=Coupon.customer_get_products.through)
+@receiver(m2m_changed, sender=Coupon.states.through)
+def invalidate_compiled_coupon_relations(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        coupon_ids = [instance.pk]
+    elif action == "pre_clear":
+        coupon_ids = sender.objects.filter(
+            **{instance._meta.model_name: instance}
+        ).values_list("coupon_id", flat=True)
+    else:
+        coupon_ids = pk_set
+    invalidate_coupons(list(coupon_ids))
 
-            elif (
-                instance.customer_specification
-                == Coupon.CustomerSpecificType.PURCHASED_ONCE
-            ):
-                # Users who have made exactly one purchase
-                user_ids = (
-                    Order.objects.values("user_id")
-                    .annotate(order_count=Count("id"))
-                    .filter(order_count=1)
-                    .values_list("user_id", flat=True)
-                )
-                users = User.objects.filter(id__in=user_ids, role="bakery")
 
-            elif (
-                instance.customer_specification
-                == Coupon.CustomerSpecificType.RECENT_PURCHASED
-            ):
-                # Users who have made a recent purchase (within the last 30 days)
-                recent_date = timezone.now() - timedelta(days=30)
-                user_ids = Order.objects.filter(
-                    created_at__gte=recent_date
-                ).values_list("user_id", flat=True)
-                users = User.objects.filter(id__in=user_ids, role="bakery")
+@receiver(post_save, sender=Order)
+def count_customer_order(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        segments.record_order(instance.user_id, instance.created_at)
 
-            else:
-                users = User.objects.none()
 
-        if users:
-            user_coupons = [
-                UserCoupon(
-                    user=user,
-                    coupon=instance,
-                    maximum_usage=instance.usage_count,
-                )
-                for user in users
-                if not UserCoupon.objects.filter(user=user, coupon=instance).exists()
-            ]
-            UserCoupon.objects.bulk_create(user_coupons)
+@receiver(post_delete, sender=Order)
+def recount_customer_orders(sender, instance, **kwargs):
+    if instance.user_id:
+        segments.refresh_customer_summaries([instance.user_id])
 
 
 @receiver(post_save, sender=CustomUser)
@@ -1,9 +1,19 @@
 from celery import shared_task
 
 from account.models import CustomUser
+from coupon import segments
 from coupon.models import Coupon, UserCoupon
 
 
+@shared_task
+def assign_coupon_to_segment(coupon_id):
+    """Give a coupon to every customer of its segment who lacks it."""
+    coupon = Coupon.objects.filter(pk=coupon_id).first()
+    if coupon is None:
+        return f"Coupon with ID {coupon_id} does not exist."
+    return segments.assign_coupon(coupon)
+
+
 @shared_task
 def assign_coupons_to_new_user(user_id):
     """
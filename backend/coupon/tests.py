@@ -0,0 +1,276 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from account.models import CustomUser as User
+from cart.models import Cart
+from cart.pricing import price_cart
+from coupon import compiled, segments
+from coupon.compiled import get_compiled_coupon
+from coupon.models import Coupon, CustomerOrderSummary, UserCoupon
+from coupon.ranking import rank_coupons
+from coupon.tasks import assign_coupon_to_segment
+from orders.models import Order, OrderStatus
+from product.models import ProductVariant
+
+
+class CouponSegmentTests(TestCase):
+    def setUp(self):
+        self.once, self.twice, self.never = [
+            User.objects.create_user(email=f"{name}@example.com", password="pass")
+            for name in ["once", "twice", "never"]
+        ]
+        User.objects.update(role="bakery")
+        now = timezone.now()
+        orders = Order.objects.bulk_create(
+            [
+                Order(user=user, contact_number="123", total_amount=Decimal("10"))
+                for user in [self.once, self.twice, self.twice]
+            ]
+        )
+        Order.objects.filter(pk=orders[0].pk).update(created_at=now)
+        Order.objects.filter(user=self.twice).update(created_at=now - timedelta(60))
+        segments.rebuild_customer_summaries()
+
+    def create_coupon(self, specification=None, **fields):
+        return Coupon.objects.create(
+            code=f"SEGMENT{Coupon.objects.count()}",
+            customer_eligibility=Coupon.CustomerEligibilityType.SPECIFIC_CUSTOMER,
+            customer_specification=specification,
+            start_date=date(2024, 1, 1),
+            start_time=time(0, 0),
+            end_date=date(2099, 1, 1),
+            end_time=time(0, 0),
+            **fields,
+        )
+
+    def test_segments_read_the_summaries(self):
+        expected = {
+            Coupon.CustomerSpecificType.HAVENT_PURCHASED: {self.never},
+            Coupon.CustomerSpecificType.PURCHASED_ONCE: {self.once},
+            Coupon.CustomerSpecificType.PURCHASED_MORE_THAN_ONCE: {self.twice},
+            Coupon.CustomerSpecificType.RECENT_PURCHASED: {self.once},
+        }
+        for specification, users in expected.items():
+            coupon = self.create_coupon(specification)
+            with self.subTest(specification):
+                self.assertEqual(set(segments.segment_users(coupon)), users)
+
+    def test_assignment_is_one_insert_and_skips_holders(self):
+        coupon = self.create_coupon(
+            Coupon.CustomerSpecificType.PURCHASED_ONCE, usage_count=3
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(segments.assign_coupon(coupon), 1)
+        self.assertEqual(assign_coupon_to_segment(coupon.pk), 0)
+        user_coupon = UserCoupon.objects.get(coupon=coupon)
+        self.assertEqual((user_coupon.user, user_coupon.maximum_usage), (self.once, 3))
+
+    def test_new_coupon_is_assigned_after_commit(self):
+        with mock.patch("coupon.signals.assign_coupon_to_segment.delay") as delay:
+            with self.captureOnCommitCallbacks() as callbacks:
+                coupon = self.create_coupon(Coupon.CustomerSpecificType.PURCHASED_ONCE)
+            delay.assert_not_called()
+            for callback in callbacks:
+                callback()
+        delay.assert_called_once_with(coupon.pk)
+
+    def test_orders_update_the_summary(self):
+        Cart.objects.create(user=self.never)
+        order = Order.objects.create(
+            user=self.never,
+            contact_number="123",
+            total_amount=Decimal("10"),
+            total_with_vat=Decimal("12"),
+            status=OrderStatus.DELIVERED.value,
+        )
+        summary = CustomerOrderSummary.objects.get(user=self.never)
+        self.assertEqual(summary.order_count, 1)
+        self.assertEqual(summary.last_order_at, order.created_at)
+
+        segments.record_order(self.never.pk, order.created_at - timedelta(1))
+        summary.refresh_from_db()
+        self.assertEqual(summary.order_count, 2)
+        self.assertEqual(summary.last_order_at, order.created_at)
+
+        order.delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.order_count, summary.last_order_at), (0, None))
+
+
+class CompiledCouponTests(APITestCase):
+    fixtures = ["cart/fixtures/cart_data.json"]
+
+    def setUp(self):
+        self.coupon = Coupon.objects.create(
+            code="BUY1GET1",
+            coupon_type=Coupon.CouponType.BUY_X_GET_Y,
+            customer_gets_types=Coupon.CustomerGetsType.FREE,
+            buy_products_quantity=1,
+            customer_gets_quantity=1,
+            start_date=date(2024, 1, 1),
+            start_time=time(0, 0),
+            end_date=date(2099, 1, 1),
+            end_time=time(0, 0),
+        )
+        self.coupon.buy_products.add(1)
+        self.coupon.customer_get_products.add(1)
+
+    def test_coupon_is_compiled_once_per_version(self):
+        compiled = get_compiled_coupon(self.coupon)
+        self.assertEqual(compiled.buy_products, {1})
+        self.assertTrue(compiled.is_current())
+        with self.assertNumQueries(0):
+            self.assertIs(get_compiled_coupon(self.coupon), compiled)
+
+        variant = ProductVariant.objects.create(product_id=1)
+        self.coupon.buy_products.add(variant)
+        self.assertEqual(get_compiled_coupon(self.coupon).buy_products, {1, variant.pk})
+
+        variant.coupons.clear()
+        self.assertEqual(get_compiled_coupon(self.coupon).buy_products, {1})
+
+        self.coupon.end_date = date(2024, 1, 2)
+        self.coupon.save()
+        self.assertFalse(get_compiled_coupon(self.coupon).is_current())
+
+    def test_change_from_another_process_is_seen(self):
+        self.assertTrue(get_compiled_coupon(self.coupon).is_current())
+        # What saving the coupon in another process leaves in the table.
+        Coupon.objects.filter(pk=self.coupon.pk).update(
+            end_date=date(2024, 1, 2), updated_at=timezone.now()
+        )
+        coupon = Coupon.objects.get(pk=self.coupon.pk)
+        self.assertFalse(get_compiled_coupon(coupon).is_current())
+
+    def test_cart_pricing_reads_the_compiled_coupon(self):
+        cart = Cart.objects.get(pk=1)
+        cart.applied_coupon = self.coupon
+        price_cart(cart)
+        with self.assertNumQueries(1):
+            price_cart(cart)
+
+    def test_buy_x_get_y_coupon_is_applied_and_removed_once(self):
+        user = User.objects.get(pk=1)
+        User.objects.filter(pk=1).update(role="bakery")
+        user.role = "bakery"
+        UserCoupon.objects.create(user=user, coupon=self.coupon)
+        self.client.force_authenticate(user)
+        url = reverse("apply-coupon")
+
+        response = self.client.post(url, {"coupon_code": "BUY1GET1"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cart = Cart.objects.get(pk=1)
+        self.assertEqual(cart.applied_coupon, self.coupon)
+        self.assertEqual(list(cart.items.values_list("quantity", flat=True)), [6])
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(cart.items.values_list("quantity", flat=True)), [5])
+
+
+class BestCouponTests(APITestCase):
+    fixtures = ["cart/fixtures/cart_data.json"]
+
+    def setUp(self):
+        self.user = User.objects.get(pk=1)
+        User.objects.filter(pk=1).update(role="bakery")
+        self.user.role = "bakery"
+        self.cart = Cart.objects.get(pk=1)
+
+    def assign(self, code, redeemed=False, **fields):
+        coupon = Coupon.objects.create(
+            code=code,
+            start_date=date(2024, 1, 1),
+            start_time=time(0, 0),
+            end_date=date(2099, 1, 1),
+            end_time=time(0, 0),
+            **fields,
+        )
+        UserCoupon.objects.create(user=self.user, coupon=coupon, redeemed=redeemed)
+        return coupon
+
+    def assign_order_coupon(self, code, value, **fields):
+        return self.assign(
+            code,
+            coupon_type=Coupon.CouponType.AMOUNT_OFF_ORDER,
+            discount_types=Coupon.DiscountType.AMOUNT,
+            discount_value=value,
+            **fields,
+        )
+
+    def assign_coupons(self):
+        self.assign_order_coupon("ORDER10", 10)
+        self.assign(
+            "HALF",
+            coupon_type=Coupon.CouponType.AMOUNT_OFF_ORDER,
+            discount_types=Coupon.DiscountType.PERCENTAGE,
+            discount_value=50,
+        )
+        buy_x_get_y = self.assign(
+            "BUY1GET1",
+            coupon_type=Coupon.CouponType.BUY_X_GET_Y,
+            customer_gets_types=Coupon.CustomerGetsType.FREE,
+            buy_products_quantity=1,
+            customer_gets_quantity=1,
+        )
+        buy_x_get_y.buy_products.add(1)
+        buy_x_get_y.customer_get_products.add(1)
+        self.assign_order_coupon(
+            "BIGSPEND",
+            400,
+            minimum_purchase_amount=True,
+            minimum_purchase_value=1000,
+        )
+        self.assign_order_coupon("REDEEMED", 300, redeemed=True)
+
+    def test_coupons_are_ranked_by_saving(self):
+        self.assign_coupons()
+        ranking = rank_coupons(self.cart, vat_percentage=0)
+        self.assertEqual(
+            [ranked.coupon.code for ranked in ranking],
+            ["HALF", "BUY1GET1", "ORDER10"],
+        )
+        self.assertEqual(
+            [ranked.saving for ranked in ranking],
+            [Decimal("250.00"), Decimal("100.00"), Decimal("10.00")],
+        )
+        # Nothing is applied or written while ranking.
+        self.cart.refresh_from_db()
+        self.assertIsNone(self.cart.applied_coupon)
+        self.assertEqual(
+            list(self.cart.items.order_by("pk").values_list("quantity", flat=True)),
+            [2, 3],
+        )
+
+    def test_queries_do_not_grow_with_the_coupons(self):
+        self.assign_coupons()
+
+        def count_queries():
+            compiled.compiled_coupons.clear()
+            with CaptureQueriesContext(connection) as queries:
+                rank_coupons(self.cart, vat_percentage=0)
+            return len(queries)
+
+        expected = count_queries()
+        for index in range(20):
+            self.assign_order_coupon(f"EXTRA{index}", index + 1)
+        self.assertEqual(count_queries(), expected)
+
+    def test_best_coupon_endpoint(self):
+        self.assign_coupons()
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse("best-coupon"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [coupon["code"] for coupon in response.data["coupons"]],
+            ["HALF", "BUY1GET1", "ORDER10"],
+        )
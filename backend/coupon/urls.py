@@ -3,6 +3,7 @@ from django.urls import path
 from coupon.views import (
     ApplyCouponAPIView,
     AssignCouponView,
+    BestCouponAPIView,
     BulkCouponUpdateDeleteAPIView,
     CouponDetailAPIView,
     CouponListCreateAPIView,
@@ -32,6 +33,7 @@ urlpatterns = [
         ApplyCouponAPIView.as_view(),
         name="apply-coupon",
     ),
+    path("best/coupon/", BestCouponAPIView.as_view(), name="best-coupon"),
     path(
         "bulk-coupon-update/",
         BulkCouponUpdateDeleteAPIView.as_view(),
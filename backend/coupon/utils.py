@@ -0,0 +1,29 @@
+from django.utils import timezone
+
+from coupon.models import Coupon, UserCoupon
+
+
+def get_usable_coupon(code, user=None):
+    """
+    Return the active, current coupon with ``code`` if ``user`` (``None``
+    for guests) may use it, else ``None``. Coupons for specific customers
+    need an unredeemed ``UserCoupon``.
+    """
+    today = timezone.localdate()
+    coupon = Coupon.objects.filter(
+        code=code,
+        is_active=True,
+        is_deleted=False,
+        start_date__lte=today,
+        end_date__gte=today,
+    ).first()
+    if coupon is None:
+        return None
+    if coupon.customer_eligibility == Coupon.CustomerEligibilityType.SPECIFIC_CUSTOMER:
+        if user is None:
+            return None
+        if not UserCoupon.objects.filter(
+            user=user, coupon=coupon, redeemed=False
+        ).exists():
+            return None
+    return coupon
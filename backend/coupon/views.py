@@ -15,16 +15,21 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from account.permissions import IsAdmin, IsBakery
 from bakery.models import BakeryAddress
-from cart.models import Cart, CartItem
+from cart.guest import get_request_cart
+from cart.models import Cart
+from cart.operations import ADD, apply_operations
+from cart.pricing import price_cart
+from coupon.compiled import get_compiled_coupon
 from coupon.models import Coupon, State, UserCoupon
+from coupon.ranking import rank_coupons
 from coupon.serializers import (
     BulkCouponSerializer,
     CouponSerializer,
+    RankedCouponSerializer,
     StateSerializer,
     UpdateCouponSerializer,
     UserCouponSerializer,
 )
-from product.models import ProductVariant
 from product.utils import CustomPagination
 
 
@@ -312,6 +317,13 @@ class ApplyCouponAPIView(APIView):
                             {"error": "This coupon is not available for this user."},
                             status=status.HTTP_400_BAD_REQUEST,
                         )
+            if coupon is None:
+                raise Coupon.DoesNotExist
+            if not get_compiled_coupon(coupon).is_current():
+                return Response(
+                    {"error": "This coupon is not valid at this time."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
             Coupon.objects.filter(id=coupon.id).update(usage_count=F("usage_count") + 1)
 
@@ -427,62 +439,29 @@ class ApplyCouponAPIView(APIView):
                 {"detail": "This coupon is already applied."},
                 status=status.HTTP_200_OK,
             )
-        buy_products = coupon.buy_products.all()
+        compiled = get_compiled_coupon(coupon)
         buy_products_value = coupon.buy_products_quantity
         cart.applied_coupon = coupon
 
-        if (
-            cart
-            and CartItem.objects.filter(
-                cart=cart, product_variant__in=buy_products
-            ).exists()
-        ):
-            cart_item_count = CartItem.objects.filter(
-                cart=cart, product_variant__in=buy_products
-            ).count()
+        cart_variant_ids = [item.product_variant_id for item in cart.cart_items]
+        cart_item_count = sum(
+            variant_id in compiled.buy_products for variant_id in cart_variant_ids
+        )
+        if cart_item_count:
             if cart_item_count >= buy_products_value:
-
-                products_get = coupon.customer_get_products.all()
-                affected_items = []
-                other_products = []
-                for product in products_get:
-
-                    item, created = CartItem.objects.get_or_create(
-                        cart=cart,
-                        product_variant=product,
-                        defaults={"quantity": coupon.customer_gets_quantity},
-                    )
-
-                    if not created:
-                        item.quantity += coupon.customer_gets_quantity
-
-                    if coupon.customer_gets_types == Coupon.CustomerGetsType.FREE:
-                        item.discounted_price = 0
-                        item.save()
-                        affected_items.append(item)
-
-                    elif (
-                        coupon.customer_gets_types
-                        == Coupon.CustomerGetsType.AMOUNT_OFF_EACH
-                    ):
-                        item.discounted_price = 0
-                        item.save()
-                        other_products.append(item)
-
-                    elif (
-                        coupon.customer_gets_types == Coupon.CustomerGetsType.PERCENTAGE
-                    ):
-                        percentage_discount = coupon.customer_gets_discount_value
-                        item_discounted_price = item.item_price * (
-                            1 - (Decimal(percentage_discount) / 100)
-                        )
-                        item.discounted_price = item_discounted_price
-                        item.save()
-                        other_products.append(item)
-
-                discounted_total = cart.calculate_discounted_total(
-                    free_items=affected_items, products=other_products
+                apply_operations(
+                    cart,
+                    [
+                        {
+                            "action": ADD,
+                            "product_variant": variant_id,
+                            "quantity": coupon.customer_gets_quantity,
+                        }
+                        for variant_id in sorted(compiled.get_products)
+                    ],
                 )
+
+                discounted_total = price_cart(cart).discounted_price
                 cart.save()
 
                 return Response(
@@ -523,9 +502,8 @@ class ApplyCouponAPIView(APIView):
                 {"detail": "No primary address found for the user."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        if coupon.shipping_scope == "Specific States":
-            offered_states = coupon.states.values_list("abbreviation", flat=True)
-            if address.state not in offered_states:
+        if coupon.shipping_scope == Coupon.ShippingScope.SPECIFIC_STATES:
+            if address.state not in get_compiled_coupon(coupon).states:
                 return Response(
                     {"detail": "Free shipping is not available for this state."},
                     status=status.HTTP_400_BAD_REQUEST,
@@ -610,23 +588,9 @@ class ApplyCouponAPIView(APIView):
                 status=status.HTTP_200_OK,
             )
 
-        if coupon.applies_to == Coupon.CouponApplyType.ALL_PRODUCTS:
-            eligible_products = ProductVariant.objects.all()
-        else:
-            eligible_products = coupon.specific_products.all()
+        # The discount itself is priced on the fly by ``cart.pricing``.
         cart.applied_coupon = coupon
-        cart_items = CartItem.objects.filter(
-            cart=cart, product_variant__in=eligible_products
-        )
-
-        for item in cart_items:
-            original_price = item.product_variant.inventory_items.regular_price
-            discounted_price = max(original_price - coupon.discount_value, 0)
-
-            item.discount_value = discounted_price * item.quantity
-
-            item.save()
-            cart.save()
+        cart.save()
 
         return Response(
             {"detail": "Discount applied to eligible products successfully."}
@@ -645,15 +609,11 @@ class ApplyCouponAPIView(APIView):
 
             coupon = cart.applied_coupon
 
-            if coupon.coupon_type == Coupon.CouponType.BUY_X_GET_Y:
-                self.revert_buy_x_get_y_coupon(cart, coupon)
-            elif coupon.coupon_type == Coupon.CouponType.FREE_SHIPPING:
+            # Buy X Get Y free items are taken back by the cart's pre_save
+            # signal (cart.signals.reset_discount_on_coupon_change); other
+            # discounts are priced on the fly and leave nothing to revert.
+            if coupon.coupon_type == Coupon.CouponType.FREE_SHIPPING:
                 self.revert_free_shipping_coupon(cart)
-            elif coupon.coupon_type in [
-                Coupon.CouponType.AMOUNT_OFF_ORDER,
-                Coupon.CouponType.AMOUNT_OFF_PRODUCT,
-            ]:
-                self.revert_amount_off_coupons(cart)
 
             cart.applied_coupon = None
             cart.save()
@@ -667,39 +627,6 @@ class ApplyCouponAPIView(APIView):
                 {"detail": "Invalid cart ID."}, status=status.HTTP_404_NOT_FOUND
             )
 
-    def revert_buy_x_get_y_coupon(self, cart, coupon):
-        """
-        Reverts changes made by Buy X Get Y coupons,
-        such as removing free items.
-        """
-        try:
-            free_products = coupon.customer_get_products.all()
-
-            if free_products.exists():
-
-                for product in free_products:
-                    try:
-                        cart_item = CartItem.objects.get(
-                            cart=cart, product_variant=product
-                        )
-                        if cart_item.quantity > coupon.customer_gets_quantity:
-                            cart_item.quantity -= coupon.customer_gets_quantity
-                            cart_item.discounted_price = None
-                            cart_item.save()
-                        else:
-                            cart_item.delete()
-
-                    except CartItem.DoesNotExist:
-                        continue
-            else:
-                return Response(
-                    {"detail": f"No products associated with coupon {coupon.id}."}
-                )
-        except AttributeError:
-            return Response(
-                {"detail": f"No products associated with coupon {coupon.id}."}
-            )
-
     def revert_free_shipping_coupon(self, cart):
         """
         Reverts changes made by Free Shipping coupons.
@@ -707,16 +634,47 @@ class ApplyCouponAPIView(APIView):
         cart.shipping_cost = cart.shipping_cost
         cart.save()
 
-    def revert_amount_off_coupons(self, cart):
-        """
-        Reverts any discounts applied to products or the total cart amount.
+
+class BestCouponAPIView(APIView):
+    """
+    API view for finding the best coupon for the current user's cart.
+
+    Methods:
+    - GET: Rank the user's redeemable coupons by what they save on the cart
+        - Only coupons the cart qualifies for and that save something are listed
+        - Buy X Get Y coupons are priced with their get products added
+        - Nothing is applied: the client applies the chosen coupon through
+          the apply coupon endpoint
+
+    Features:
+    - The cart, the coupons and their product and state sets are loaded
+      once, so ranking dozens of coupons costs a fixed number of queries
+
+    Authentication:
+    - Requires JWT authentication
+    - Only bakery users can access
+    """
+
+    permission_classes = [IsBakery]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request):
         """
-        cart_items = cart.cart_items.all()
-        for item in cart_items:
-            item.discounted_price = None
-            item.save()
+        Rank the coupons for the current user's cart.
 
-        cart.save()
+        Args:
+            request: HTTP request object
+
+        Returns:
+            Response: The coupons, best first, with their saving and the
+            cart's totals under each
+        """
+        cart = get_request_cart(request)
+        ranking = rank_coupons(cart) if cart is not None else []
+        return Response(
+            {"coupons": RankedCouponSerializer(ranking, many=True).data},
+            status=status.HTTP_200_OK,
+        )
 
 
 class BulkCouponUpdateDeleteAPIView(APIView):
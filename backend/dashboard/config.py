@@ -0,0 +1,91 @@
+"""
+Process-local snapshots of the admin configuration tables.
+
+``AdminConfiguration`` and ``AdminInvoiceConfiguration`` each hold one row
+that is read on almost every request and rarely changes. Every process keeps
+the row it last loaded together with the version of the model's
+``configuration:<label>`` scope in the catalog cache (see ``product.cache``)
+and only queries it again once that version moves, so a read costs one cache
+lookup instead of a query.
+
+The signals in ``dashboard.signals`` drop the local snapshot when a row is
+saved or deleted and bump the shared version once the transaction commits,
+so other processes cannot reload the old row under the new version. Until
+then the thread that made the change reads the table directly, which keeps a
+rolled back change out of the snapshot.
+
+Versions are only trusted when the catalog cache is shared between processes
+(``redis`` or ``file``). With the per-process ``locmem`` backend a change
+would only bump the version of the process that made it, so every read goes
+to the table instead.
+
+Snapshots are shared by every caller in the process: treat them as read-only.
+"""
+
+import threading
+
+from django.db import connection, transaction
+
+from dashboard.models import AdminConfiguration, AdminInvoiceConfiguration
+from product import cache as catalog_cache
+
+snapshots = {}
+uncommitted = threading.local()
+
+
+def configuration_scope(model):
+    return f"configuration:{model._meta.label}"
+
+
+def get_uncommitted():
+    if not hasattr(uncommitted, "models"):
+        uncommitted.models = set()
+    return uncommitted.models
+
+
+def get_snapshot(model):
+    """The last ``model`` row, or ``None``, loaded once per version."""
+    if not catalog_cache.is_shared():
+        return model.objects.last()
+
+    changed = get_uncommitted()
+    if model in changed:
+        if connection.in_atomic_block:
+            return model.objects.last()
+        # Outside a transaction the table holds committed rows only.
+        changed.discard(model)
+
+    (version,) = catalog_cache.get_versions([configuration_scope(model)])
+    snapshot = snapshots.get(model)
+    if snapshot is not None and snapshot[0] == version:
+        return snapshot[1]
+    instance = model.objects.last()
+    snapshots[model] = (version, instance)
+    return instance
+
+
+def get_admin_configuration():
+    return get_snapshot(AdminConfiguration)
+
+
+def get_invoice_configuration():
+    return get_snapshot(AdminInvoiceConfiguration)
+
+
+def publish(model):
+    get_uncommitted().discard(model)
+    snapshots.pop(model, None)
+    catalog_cache.bump_versions(configuration_scope(model))
+
+
+def invalidate(model):
+    """Retire ``model``'s snapshots after a change in the current transaction."""
+    snapshots.pop(model, None)
+    if connection.in_atomic_block:
+        get_uncommitted().add(model)
+    transaction.on_commit(lambda: publish(model))
+
+
+def reset():
+    snapshots.clear()
+    get_uncommitted().clear()
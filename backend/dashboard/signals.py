@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from dashboard import config as admin_config
+from dashboard.models import AdminConfiguration, AdminInvoiceConfiguration
+
+
+@receiver(post_save, sender=AdminConfiguration)
+@receiver(post_delete, sender=AdminConfiguration)
+@receiver(post_save, sender=AdminInvoiceConfiguration)
+@receiver(post_delete, sender=AdminInvoiceConfiguration)
+def invalidate_configuration_snapshot(sender, **kwargs):
+    admin_config.invalidate(sender)
@@ -1,11 +1,17 @@
+from unittest import mock
+
+from django.test import TestCase
 from django.urls import reverse
 import json
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 from account.models import CustomUser as User
-from dashboard.models import ZipCodeConfig
+from cart.models import Cart
+from dashboard import config as admin_config
+from dashboard.models import AdminConfiguration, ZipCodeConfig
 from dashboard.serializers import ZipCodeConfigSerializer
+from product import cache as catalog_cache
 
 class ZipViewSetTestCase(APITestCase):
     fixtures = ["dashboard/fixtures/zip_conf.json"]
@@ -85,3 +91,89 @@ class ZipViewSetTestCase(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         zip_code.refresh_from_db() 
+
+
+class AdminConfigurationConditionalRequestTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="adminpassword", role="admin"
+        )
+        self.user.is_superuser = True
+        self.user.save()
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+        self.url = reverse("admin-configuration-list-create")
+
+    def test_missing_configuration_is_not_tagged(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn("ETag", response.headers)
+
+    def test_unchanged_configuration_is_not_modified(self):
+        AdminConfiguration.objects.create()
+        etag = self.client.get(self.url).headers["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(self.url, {"reorder_level": 50}, format="json")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["reorder_level"], 50)
+
+
+class AdminConfigurationSnapshotTests(TestCase):
+    def setUp(self):
+        admin_config.reset()
+        self.addCleanup(admin_config.reset)
+        # Snapshots are only kept with a catalog cache shared between processes.
+        shared = mock.patch.object(catalog_cache, "is_shared", return_value=True)
+        self.is_shared = shared.start()
+        self.addCleanup(shared.stop)
+
+    def create_configuration(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AdminConfiguration.objects.create(**fields)
+
+    def test_configuration_is_read_once_per_version(self):
+        configuration = self.create_configuration(vat_amount=10)
+        with self.assertNumQueries(1):
+            admin_config.get_admin_configuration()
+        with self.assertNumQueries(0):
+            self.assertEqual(admin_config.get_admin_configuration().vat_amount, 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            configuration.vat_amount = 12
+            configuration.save()
+        self.assertEqual(admin_config.get_admin_configuration().vat_amount, 12)
+
+    def test_change_from_another_process_is_seen(self):
+        configuration = self.create_configuration(vat_amount=10)
+        admin_config.get_admin_configuration()
+        AdminConfiguration.objects.filter(pk=configuration.pk).update(vat_amount=15)
+        self.assertEqual(admin_config.get_admin_configuration().vat_amount, 10)
+
+        scope = admin_config.configuration_scope(AdminConfiguration)
+        catalog_cache.bump_versions(scope)
+        self.assertEqual(admin_config.get_admin_configuration().vat_amount, 15)
+
+    def test_per_process_cache_reads_the_table(self):
+        self.is_shared.return_value = False
+        configuration = self.create_configuration(vat_amount=10)
+        with self.assertNumQueries(1):
+            admin_config.get_admin_configuration()
+        AdminConfiguration.objects.filter(pk=configuration.pk).update(vat_amount=15)
+        self.assertEqual(admin_config.get_admin_configuration().vat_amount, 15)
+
+    def test_uncommitted_change_is_not_cached(self):
+        admin_config.get_admin_configuration()
+        AdminConfiguration.objects.create(vat_amount=10)
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                configuration = admin_config.get_admin_configuration()
+                self.assertEqual(configuration.vat_amount, 10)
+
+    def test_cart_fees_follow_the_configuration(self):
+        self.create_configuration(platform_fee=7, packing_fee=3)
+        cart = Cart.objects.create(session_id="snapshot")
+        self.assertEqual((cart.platform_fee, cart.packing_fee), (7, 3))
@@ -0,0 +1,25 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+
+def get_configuration_etag(model):
+    """
+    ETag of a singleton-style configuration table, from one aggregate query.
+
+    ``updated_at`` moves on every save, and the row count and highest id move
+    when a configuration is deleted and created again.
+    """
+    state = model.objects.aggregate(
+        count=Count("pk"), last=Max("pk"), updated=Max("updated_at")
+    )
+    if not state["count"]:
+        return None
+    updated = state["updated"].isoformat() if state["updated"] else ""
+    signature = f"{model._meta.label}:{state['count']}:{state['last']}:{updated}"
+    return hashlib.md5(signature.encode()).hexdigest()
+
+
+def configuration_etag(model):
+    """An ``etag_func`` for ``conditional_etag`` on ``model``'s views."""
+    return lambda view, request, *args, **kwargs: get_configuration_etag(model)
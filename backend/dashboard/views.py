@@ -22,6 +22,7 @@ from account.models import CustomUser
 from account.permissions import AllowGetOnlyIsAdminStockManager, IsAdmin
 from bakery.models import Bakery
 from bakery.serializers import BakeryAdminSerializer
+from dashboard import config as admin_config
 from dashboard.models import (
     AdminConfiguration,
     AdminInvoiceConfiguration,
@@ -34,8 +35,10 @@ from dashboard.serializers import (
     CustomerQuerySerializer,
     ZipCodeConfigSerializer,
 )
+from dashboard.utils import configuration_etag
 from orders.models import Order, OrderItem
 from product.models import Category, Inventory, Product, ProductVariant
+from product.utils import conditional_etag
 
 logger = logging.getLogger(__name__)
 
@@ -202,7 +205,7 @@ class ProductStatsView(APIView):
         total_today_order_price = (
             orders_in_range.aggregate(Sum("total_amount"))["total_amount__sum"] or 0.0
         )
-        configurations = AdminConfiguration.objects.all().last()
+        configurations = admin_config.get_admin_configuration()
         low_stock_threshold = (
             configurations.out_of_stock
             if configurations
@@ -578,7 +581,7 @@ class AdminConfigurationAPIView(APIView):
     API view for managing admin configurations.
 
     Methods:
-    - GET: Retrieve current admin configuration
+    - GET: Retrieve current admin configuration (honours If-None-Match)
     - POST: Create or update admin configuration
     - DELETE: Delete admin configuration
 
@@ -595,6 +598,7 @@ class AdminConfigurationAPIView(APIView):
     permission_classes = [IsAdmin]
     authentication_classes = [JWTAuthentication]
 
+    @conditional_etag(configuration_etag(AdminConfiguration))
     def get(self, request):
         """
         Retrieve the current admin configuration.
@@ -656,7 +660,7 @@ class AdminInvoiceConfigurationView(APIView):
     API view for managing invoice configurations.
 
     Methods:
-    - GET: Retrieve current invoice configuration
+    - GET: Retrieve current invoice configuration (honours If-None-Match)
     - POST: Create or update invoice configuration
 
     Handles:
@@ -676,6 +680,7 @@ class AdminInvoiceConfigurationView(APIView):
     authentication_classes = [JWTAuthentication]
     parser_classes = [MultiPartParser, FormParser]  # Add parser for file uploads
 
+    @conditional_etag(configuration_etag(AdminInvoiceConfiguration))
     def get(self, request, *args, **kwargs):
         """
         Retrieve the current invoice configuration.
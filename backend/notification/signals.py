@@ -21,6 +21,43 @@ def notify_on_new_object(sender, instance, created, **kwargs):
             send_push_notification(user, title, message, context=context)
 
 
+def notify_new_products(products):
+    """
+    Send the ``notify_on_new_object`` notification for products created with
+    ``bulk_create``, which sends no ``post_save``. Like
+    ``bulk_send_notifications`` the records are written in one query and
+    pushed to each recipient's socket.
+    """
+    if not products:
+        return
+    superusers = list(User.objects.filter(is_superuser=True))
+    title = "New Product Added"
+    notifications = [
+        Notification(
+            recipient=user,
+            title=title,
+            message=f"A new {Product.__name__} has been created: {product}",
+            notification_type="alert",
+            meta_data={"product_id": product.id},
+        )
+        for product in products
+        for user in superusers
+    ]
+    Notification.objects.bulk_create(notifications)
+
+    channel_layer = get_channel_layer()
+    for notification in notifications:
+        async_to_sync(channel_layer.group_send)(
+            f"notifications_{notification.recipient.id}",
+            {
+                "type": "send_notification",
+                "title": notification.title,
+                "message": notification.message,
+                "notification_type": notification.notification_type,
+            },
+        )
+
+
 @receiver(post_save, sender=Notification)
 def notify_new_notification(sender, instance, created, **kwargs):
     if created:
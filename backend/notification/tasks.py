@@ -2,6 +2,7 @@ import json
 
 from celery import shared_task
 from django.conf import settings
+from django.db.models import Q
 from django.template.loader import render_to_string
 from django.utils.timezone import now
 from twilio.rest import Client  # type: ignore
@@ -11,7 +12,9 @@ from bakery.models import Bakery
 from notification.models import AdminNotification, Notification
 from notification.utils import send_notification_email
 from orders.models import Order, OrderStatus
+from product import cache as catalog_cache
 from product.models import Inventory, Product, ProductVariant
+from product.search import refresh_search_documents
 
 
 @shared_task
@@ -29,7 +32,7 @@ def send_low_stock_notifications():
     out_of_stock_products = Product.objects.filter(
         variants__in=out_of_stock_products
     ).distinct()
-    out_of_stock_products.update(status="out_of_stock")
+    changed_ids = set_product_status(out_of_stock_products, "out_of_stock")
 
     # Update the status of in-stock products
     in_stock_inventories = Inventory.objects.filter(
@@ -42,7 +45,8 @@ def send_low_stock_notifications():
         variants__in=in_stock_variants_products
     ).distinct()
 
-    in_stock_products.update(status="in_stock")
+    changed_ids |= set_product_status(in_stock_products, "in_stock")
+    refresh_products_after_update(changed_ids)
     products = [
         {
             "variant_name": product.product_variant.variant_name,
@@ -74,6 +78,27 @@ def send_low_stock_notifications():
     return f"Low stock check completed. {low_stock_products.count()}"
 
 
+def set_product_status(products, status):
+    """Set ``status`` on ``products`` and return the ids that actually changed."""
+    changed_ids = set(products.exclude(status=status).values_list("id", flat=True))
+    Product.objects.filter(id__in=changed_ids).update(status=status)
+    return changed_ids
+
+
+def refresh_products_after_update(product_ids):
+    """
+    Queryset ``update()`` sends no ``post_save``: refresh the search documents
+    and catalog cache of the changed products the way ``product.signals`` would.
+    """
+    if not product_ids:
+        return
+    refresh_search_documents(Product, product_ids)
+    catalog_cache.bump_versions(
+        "product-lists",
+        *[catalog_cache.product_scope(product_id) for product_id in product_ids],
+    )
+
+
 @shared_task
 def send_order_notification_to_admin(order_id):
     try:
@@ -276,6 +301,21 @@ def update_sale_active_status():
     """
     current_date = now().date()
 
+    changed = Inventory.objects.filter(
+        sale_price_dates_from__lte=current_date,
+        sale_price_dates_to__gte=current_date,
+        sale_active=False,
+    ) | Inventory.objects.filter(
+        Q(sale_price_dates_from__gt=current_date)
+        | Q(sale_price_dates_to__lt=current_date),
+        sale_active=True,
+    )
+    product_ids = set(
+        changed.exclude(product_variant=None).values_list(
+            "product_variant__product_id", flat=True
+        )
+    )
+
     Inventory.objects.filter(
         sale_price_dates_from__lte=current_date, sale_price_dates_to__gte=current_date
     ).update(sale_active=True)
@@ -288,4 +328,11 @@ def update_sale_active_status():
         sale_active=False
     )
 
+    # Sale prices are part of the cached product payloads.
+    if product_ids:
+        catalog_cache.bump_versions(
+            "product-lists",
+            *[catalog_cache.product_scope(product_id) for product_id in product_ids],
+        )
+
     return "Sale active statuses updated successfully!"
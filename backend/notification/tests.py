@@ -1,3 +1,100 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import override_settings
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import CustomUser as User
+from notification.models import Notification
+from notification.tasks import send_low_stock_notifications
+from product import cache as catalog_cache
+from product.models import Product
+
+
+class NotificationKeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="user@example.com", password="userpassword", role="bakery"
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+        self.url = "/notification/"
+        Notification.objects.bulk_create(
+            Notification(recipient=self.user, title=f"Notification {index}")
+            for index in range(23)
+        )
+        # Give part of the rows the same timestamp so the ``pk`` tie-break matters.
+        created_at = now() - timedelta(days=1)
+        Notification.objects.filter(pk__in=self.ordered_ids()[5:15]).update(
+            created_at=created_at
+        )
+
+    def ordered_ids(self):
+        return list(
+            Notification.objects.filter(recipient=self.user)
+            .order_by("-created_at", "-pk")
+            .values_list("pk", flat=True)
+        )
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                set(response.data), {"count", "next", "previous", "results"}
+            )
+            pages.append(
+                [notification["id"] for notification in response.data["results"]]
+            )
+            url = response.data[link]
+        return pages
+
+    def test_cursor_pages_cover_every_row_once(self):
+        pages = self.walk(f"{self.url}?pagination=cursor", "next")
+        self.assertEqual([len(page) for page in pages], [10, 10, 3])
+        self.assertEqual(sum(pages, []), self.ordered_ids())
+
+    def test_previous_links_walk_back(self):
+        response = self.client.get(f"{self.url}?pagination=cursor")
+        self.assertIsNone(response.data["previous"])
+        last_page_url = self.client.get(response.data["next"]).data["next"]
+
+        pages = self.walk(last_page_url, "previous")
+        self.assertEqual(sum(reversed(pages), []), self.ordered_ids())
+
+    def test_counts(self):
+        response = self.client.get(f"{self.url}?pagination=cursor")
+        self.assertEqual(response.data["count"], 23)
+        response = self.client.get(f"{self.url}?count=approximate&page=2")
+        self.assertEqual(response.data["count"], 23)
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f"{self.url}?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(LOW_STOCK_THRESHOLD=5)
+class LowStockStatusTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def test_status_changes_refresh_search_and_cache(self):
+        with mock.patch("product.cache.bump_versions") as bump_versions:
+            send_low_stock_notifications()
+
+        product = Product.objects.get(pk=1)
+        self.assertEqual(product.status, "in_stock")
+        self.assertIn("in stock", product.search_document)
+        bump_versions.assert_called_once_with(
+            "product-lists", catalog_cache.product_scope(1)
+        )
+
+    def test_unchanged_status_is_not_refreshed(self):
+        Product.objects.filter(pk=1).update(status="in_stock")
+        with mock.patch("notification.tasks.refresh_search_documents") as refresh:
+            send_low_stock_notifications()
+        refresh.assert_not_called()
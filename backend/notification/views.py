@@ -19,6 +19,7 @@ from notification.serializers import (
     NotificationSerializer,
     UpdateStatusSerializer,
 )
+from product.utils import KeysetPagination
 
 
 class NotificationListAPIView(APIView):
@@ -28,14 +29,14 @@ class NotificationListAPIView(APIView):
     Methods:
     - GET: List all notifications for the authenticated user
         - Ordered by creation date (newest first)
-        - Paginated results
+        - Paginated results; pagination=cursor switches to keyset pagination
 
     Authentication:
     - Requires JWT authentication
     """
 
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
     authentication_classes = [JWTAuthentication]
 
     def get(self, request):
@@ -0,0 +1,156 @@
+"""
+PDF documents.
+
+``render_pdf`` renders a Django template to PDF with WeasyPrint (invoices)
+or xhtml2pdf (order and recipe sheets):
+
+- Templates are compiled once per process and WeasyPrint shares one font
+  configuration, so only the first document of a worker pays for parsing
+  and font discovery. ``warm_up`` does that work ahead of time for
+  ``settings.DOCUMENT_TEMPLATES``; Celery workers call it on start.
+- Files in storage are referenced as ``storage:<name>`` (see
+  ``storage_url``) and read straight from storage by the renderers instead
+  of over HTTP from the public site.
+- Rendered PDFs are kept in storage under ``settings.DOCUMENT_CACHE_DIR``,
+  named by a hash of the engine and the rendered HTML. Rendering an
+  unchanged document again costs a template render and a file read.
+  ``purge_rendered_documents`` deletes the old ones.
+"""
+
+import hashlib
+import mimetypes
+from datetime import timedelta
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import get_template
+from django.utils import timezone
+from weasyprint import HTML, default_url_fetcher
+from xhtml2pdf import pisa
+
+WEASYPRINT = "weasyprint"
+XHTML2PDF = "xhtml2pdf"
+STORAGE_SCHEME = "storage:"
+
+
+class DocumentRenderError(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_document_template(template_name):
+    return get_template(template_name)
+
+
+@lru_cache(maxsize=None)
+def get_font_config():
+    # Imported here: font discovery loads Pango, which only renderers need.
+    from weasyprint.text.fonts import FontConfiguration
+
+    return FontConfiguration()
+
+
+def warm_up():
+    """Compile the document templates and load the fonts of this process."""
+    for template_name in settings.DOCUMENT_TEMPLATES:
+        get_document_template(template_name)
+    get_font_config()
+
+
+def storage_url(file):
+    """The URL the renderers read a stored ``file`` (a ``FieldFile``) from."""
+    return f"{STORAGE_SCHEME}{file.name}"
+
+
+def fetch_url(url, *args, **kwargs):
+    """WeasyPrint URL fetcher reading ``storage:`` URLs from storage."""
+    if url.startswith(STORAGE_SCHEME):
+        name = url[len(STORAGE_SCHEME) :]
+        return {
+            "file_obj": default_storage.open(name, "rb"),
+            "mime_type": mimetypes.guess_type(name)[0],
+            "redirected_url": url,
+        }
+    return default_url_fetcher(url, *args, **kwargs)
+
+
+def link_callback(uri, rel):
+    """xhtml2pdf link callback resolving ``storage:`` URLs to local paths."""
+    if uri.startswith(STORAGE_SCHEME):
+        return default_storage.path(uri[len(STORAGE_SCHEME) :])
+    return uri
+
+
+def write_pdf(html, engine):
+    if engine == WEASYPRINT:
+        return HTML(string=html, url_fetcher=fetch_url).write_pdf(
+            font_config=get_font_config()
+        )
+    buffer = BytesIO()
+    result = pisa.CreatePDF(html, dest=buffer, link_callback=link_callback)
+    if result.err:
+        raise DocumentRenderError(f"xhtml2pdf failed with {result.err} error(s).")
+    return buffer.getvalue()
+
+
+def cache_name(html, engine):
+    digest = hashlib.sha256(f"{engine}\0{html}".encode()).hexdigest()
+    return f"{settings.DOCUMENT_CACHE_DIR}/{digest}.pdf"
+
+
+def render_html(template_name, context):
+    return get_document_template(template_name).render(context)
+
+
+def get_cached_pdf(html, engine):
+    """The cached PDF of ``html``, or ``None``."""
+    name = cache_name(html, engine)
+    if not default_storage.exists(name):
+        return None
+    with default_storage.open(name, "rb") as cached:
+        return cached.read()
+
+
+def cache_pdf(html, engine, pdf):
+    name = cache_name(html, engine)
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(pdf))
+
+
+def render_pdf(template_name, context, engine=WEASYPRINT):
+    """
+    Render ``template_name`` with ``context`` to PDF bytes with ``engine``,
+    reusing the stored PDF of an identical document.
+
+    Raises:
+        DocumentRenderError: If xhtml2pdf reports errors
+    """
+    html = render_html(template_name, context)
+    pdf = get_cached_pdf(html, engine)
+    if pdf is None:
+        pdf = write_pdf(html, engine)
+        cache_pdf(html, engine, pdf)
+    return pdf
+
+
+def purge_rendered_documents(max_age=None):
+    """
+    Delete cached PDFs older than ``max_age`` seconds (default:
+    ``DOCUMENT_CACHE_MAX_AGE``). Returns the number of files deleted.
+    """
+    if max_age is None:
+        max_age = settings.DOCUMENT_CACHE_MAX_AGE
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    if not default_storage.exists(settings.DOCUMENT_CACHE_DIR):
+        return 0
+    _, files = default_storage.listdir(settings.DOCUMENT_CACHE_DIR)
+    deleted = 0
+    for file_name in files:
+        name = f"{settings.DOCUMENT_CACHE_DIR}/{file_name}"
+        if default_storage.get_modified_time(name) < cutoff:
+            default_storage.delete(name)
+            deleted += 1
+    return deleted
@@ -0,0 +1,178 @@
+"""
+Invoice exports.
+
+``export_invoices`` streams a ZIP archive of invoice PDFs followed by a CSV
+ledger of the exported invoices. The archive is written to the response as
+it is built (``zipfile`` supports unseekable output), invoices are read in
+batches of ``settings.INVOICE_EXPORT_BATCH_SIZE`` and stored PDFs are copied
+in chunks, so memory use is bounded by one batch however many invoices are
+exported. The ledger is spooled to disk once it outgrows memory.
+
+Invoices whose PDF is not ready go through the ``render_invoice_pdf`` jobs
+(see ``orders.invoices``): every one of them is queued before the archive
+starts, so the Celery workers render ahead of the stream, and each batch
+waits up to ``settings.INVOICE_PDF_WAIT_TIMEOUT`` seconds for its own. PDFs
+still missing then are left out of the archive and have an empty ``pdf``
+column in the ledger.
+"""
+
+import csv
+import io
+import logging
+import tempfile
+import time
+import zipfile
+from contextlib import ExitStack
+
+from django.conf import settings
+
+from orders.invoices import enqueue_invoice_pdf
+from orders.models import Invoice, InvoicePdfStatus
+
+logger = logging.getLogger(__name__)
+
+LEDGER_FIELDS = [
+    "invoice_number",
+    "order_id",
+    "customer",
+    "email",
+    "status",
+    "invoice_date",
+    "due_date",
+    "total_amount",
+    "pdf",
+]
+
+
+class ZipOutput(io.RawIOBase):
+    """An unseekable file that keeps what ``zipfile`` writes until taken."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def batches(invoices, size):
+    batch = []
+    for invoice in invoices.iterator(chunk_size=size):
+        batch.append(invoice)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def is_ready(invoice):
+    return invoice.pdf_status == InvoicePdfStatus.READY and bool(invoice.pdf_file)
+
+
+def queue_missing(invoices):
+    """Queue the render job of every invoice of ``invoices`` that is not ready."""
+    pending = invoices.exclude(pdf_status=InvoicePdfStatus.READY).values_list(
+        "invoice_number", "pdf_version"
+    )
+    for invoice_number, version in pending.iterator():
+        enqueue_invoice_pdf(invoice_number, version)
+
+
+def wait_for_batch(batch, timeout):
+    """
+    Wait up to ``timeout`` seconds for the render jobs of the invoices of
+    ``batch`` that are not ready, reloading the ones that finish in place.
+    """
+    pending = {invoice.pk: invoice for invoice in batch if not is_ready(invoice)}
+    deadline = time.monotonic() + timeout
+    while pending:
+        for fresh in Invoice.objects.filter(
+            pk__in=list(pending), pdf_status=InvoicePdfStatus.READY
+        ).only("pk", "pdf_file"):
+            invoice = pending.pop(fresh.pk)
+            invoice.pdf_file.name = fresh.pdf_file.name
+            invoice.pdf_status = InvoicePdfStatus.READY
+        if not pending or time.monotonic() >= deadline:
+            break
+        time.sleep(settings.INVOICE_PDF_POLL_INTERVAL)
+
+
+def ledger_row(invoice, pdf_name):
+    user = invoice.user
+    return [
+        invoice.invoice_number,
+        invoice.order.order_id,
+        f"{user.first_name} {user.last_name}".strip(),
+        user.email,
+        invoice.status,
+        invoice.created_at.date().isoformat(),
+        invoice.due_date.isoformat() if invoice.due_date else "",
+        invoice.total_amount,
+        pdf_name,
+    ]
+
+
+def export_invoices(invoices):
+    """
+    Yield a ZIP archive, chunk by chunk, holding ``invoices`` (a queryset)
+    as ``invoices/<number>.pdf`` and the ledger as ``ledger.csv``.
+    """
+    return (chunk for chunk in write_archive(invoices) if chunk)
+
+
+def write_archive(invoices):
+    invoices = invoices.select_related("order", "user")
+    if not invoices.ordered:
+        invoices = invoices.order_by("created_at", "pk")
+
+    output = ZipOutput()
+    with ExitStack() as stack:
+        ledger = stack.enter_context(
+            tempfile.SpooledTemporaryFile(
+                max_size=settings.INVOICE_EXPORT_LEDGER_MEMORY,
+                mode="w+",
+                newline="",
+                encoding="utf-8",
+            )
+        )
+        writer = csv.writer(ledger)
+        writer.writerow(LEDGER_FIELDS)
+        archive = stack.enter_context(zipfile.ZipFile(output, mode="w"))
+        queue_missing(invoices)
+
+        for batch in batches(invoices, settings.INVOICE_EXPORT_BATCH_SIZE):
+            wait_for_batch(batch, settings.INVOICE_PDF_WAIT_TIMEOUT)
+            for invoice in batch:
+                name = f"invoices/{invoice.invoice_number}.pdf"
+                if is_ready(invoice):
+                    try:
+                        pdf = invoice.pdf_file.open("rb")
+                    except OSError:
+                        logger.exception("Missing PDF of %s", invoice.invoice_number)
+                        name = ""
+                    else:
+                        with pdf, archive.open(name, "w") as entry:
+                            for chunk in pdf.chunks():
+                                entry.write(chunk)
+                                yield output.take()
+                else:
+                    name = ""
+                writer.writerow(ledger_row(invoice, name))
+                yield output.take()
+
+        ledger.seek(0)
+        with archive.open("ledger.csv", "w") as entry:
+            while chunk := ledger.read(64 * 1024):
+                entry.write(chunk.encode("utf-8"))
+                yield output.take()
+    # Closing the archive wrote its central directory.
+    yield output.take()
@@ -0,0 +1,124 @@
+"""
+Invoice PDFs.
+
+Invoice PDFs are rendered off the request by the ``render_invoice_pdf``
+Celery task. A render job is keyed on the invoice number and the invoice's
+``pdf_version``:
+
+- ``queue_invoice_pdf`` queues the job for the current version once the
+  transaction commits; ``request_invoice_pdf`` first bumps the version and
+  marks the PDF pending, for when the invoice changed.
+- ``render_invoice`` renders only while its version is current and stores
+  the file only if no newer version was requested meanwhile, so a job can be
+  retried or queued twice safely and a late job never replaces a newer PDF.
+- ``wait_for_invoice_pdf`` lets a download wait for the job, up to
+  ``settings.INVOICE_PDF_WAIT_TIMEOUT`` seconds.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+
+from orders.models import Invoice, InvoicePdfStatus
+from orders.utils import generate_invoice_pdf
+
+
+def job_id(invoice_number, version):
+    return f"invoice-pdf:{invoice_number}:{version}"
+
+
+def enqueue_invoice_pdf(invoice_number, version):
+    # Imported here: the task module imports this one.
+    from orders.tasks import render_invoice_pdf
+
+    render_invoice_pdf.apply_async(
+        args=(invoice_number, version), task_id=job_id(invoice_number, version)
+    )
+
+
+def queue_invoice_pdf(invoice):
+    """Render ``invoice``'s current PDF version once the transaction commits."""
+    invoice_number, version = invoice.invoice_number, invoice.pdf_version
+    transaction.on_commit(lambda: enqueue_invoice_pdf(invoice_number, version))
+
+
+def request_invoice_pdf(invoice):
+    """Mark ``invoice``'s PDF out of date and queue a new version of it."""
+    Invoice.objects.filter(pk=invoice.pk).update(
+        pdf_version=F("pdf_version") + 1, pdf_status=InvoicePdfStatus.PENDING
+    )
+    invoice.refresh_from_db(fields=["pdf_version", "pdf_status"])
+    queue_invoice_pdf(invoice)
+
+
+def render_invoice(invoice_number, version):
+    """
+    Render version ``version`` of the invoice's PDF unless it is already
+    rendered or superseded. Returns the stored file name, or ``None``.
+    """
+    invoice = (
+        Invoice.objects.select_related("order", "user")
+        .filter(invoice_number=invoice_number)
+        .first()
+    )
+    if invoice is None or invoice.pdf_version != version:
+        return None
+    if invoice.pdf_status == InvoicePdfStatus.READY:
+        return invoice.pdf_file.name
+
+    try:
+        pdf = generate_invoice_pdf(invoice)
+    except Exception:
+        Invoice.objects.filter(pk=invoice.pk, pdf_version=version).update(
+            pdf_status=InvoicePdfStatus.FAILED
+        )
+        raise
+    return store_invoice_pdf(invoice, version, pdf.getvalue())
+
+
+def store_invoice_pdf(invoice, version, pdf):
+    """
+    Store ``pdf`` (bytes) as version ``version`` of ``invoice``'s PDF unless
+    a newer version was requested. Returns the stored file name, or ``None``.
+    """
+    previous_name = invoice.pdf_file.name
+    invoice.pdf_file.save(
+        f"{invoice.invoice_number}-v{version}.pdf", ContentFile(pdf), save=False
+    )
+    name = invoice.pdf_file.name
+    storage = invoice.pdf_file.storage
+    updated = Invoice.objects.filter(pk=invoice.pk, pdf_version=version).update(
+        pdf_file=name, pdf_status=InvoicePdfStatus.READY
+    )
+    if not updated:
+        storage.delete(name)
+        invoice.pdf_file.name = previous_name
+        return None
+    invoice.pdf_status = InvoicePdfStatus.READY
+    if previous_name and previous_name != name:
+        storage.delete(previous_name)
+    return name
+
+
+def wait_for_invoice_pdf(invoice, timeout=None):
+    """
+    Wait up to ``timeout`` seconds (default: ``INVOICE_PDF_WAIT_TIMEOUT``)
+    for ``invoice``'s PDF to be ready, reloading its status in place. A failed
+    or overdue job is queued again. Returns whether the PDF is ready.
+    """
+    if timeout is None:
+        timeout = settings.INVOICE_PDF_WAIT_TIMEOUT
+    deadline = time.monotonic() + timeout
+    while invoice.pdf_status == InvoicePdfStatus.PENDING:
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(settings.INVOICE_PDF_POLL_INTERVAL)
+        invoice.refresh_from_db(fields=["pdf_file", "pdf_version", "pdf_status"])
+    if invoice.pdf_status == InvoicePdfStatus.READY:
+        return True
+    # Jobs are idempotent: queueing one that is merely slow costs nothing.
+    enqueue_invoice_pdf(invoice.invoice_number, invoice.pdf_version)
+    return False
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+def mark_rendered_invoices_ready(apps, schema_editor):
+    Invoice = apps.get_model("orders", "Invoice")
+    Invoice.objects.exclude(pdf_file="").exclude(pdf_file=None).update(
+        pdf_status="ready"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0032_alter_invoice_due_date"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="invoice",
+            name="pdf_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="invoice",
+            name="pdf_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(mark_rendered_invoices_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:21
+
+import datetime
+
+from django.db import migrations, models
+
+
+def seed_order_sequences(apps, schema_editor):
+    # Continue after the order IDs already issued for recent days, which
+    # the old Max("order_id") scheme numbered with the same YYYYMMDD prefix.
+    Order = apps.get_model("orders", "Order")
+    OrderSequence = apps.get_model("orders", "OrderSequence")
+    since = (datetime.date.today() - datetime.timedelta(days=2)).strftime("%Y%m%d")
+    last_numbers = {}
+    for order_id in Order.objects.filter(
+        order_id__regex=r"^[0-9]{9,}$", order_id__gte=since
+    ).values_list("order_id", flat=True):
+        try:
+            day = datetime.datetime.strptime(order_id[:8], "%Y%m%d").date()
+        except ValueError:
+            continue
+        last_numbers[day] = max(last_numbers.get(day, 0), int(order_id[8:]))
+    OrderSequence.objects.bulk_create(
+        OrderSequence(day=day, last_number=number)
+        for day, number in last_numbers.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0033_invoice_pdf_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OrderSequence",
+            fields=[
+                ("day", models.DateField(primary_key=True, serialize=False)),
+                ("last_number", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_order_sequences, migrations.RunPython.noop),
+    ]
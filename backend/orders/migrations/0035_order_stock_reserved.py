@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+def mark_reserved_orders(apps, schema_editor):
+    # Items of existing orders took their stock when they were created, so
+    # the orders that are still open hold it.
+    Order = apps.get_model("orders", "Order")
+    Order.objects.exclude(status__in=["canceled", "rejected"]).filter(
+        items__isnull=False
+    ).update(stock_reserved=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0034_ordersequence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="stock_reserved",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_reserved_orders, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from enum import Enum
 
 from django.conf import settings
-from django.db import models
-from django.db.models import Max
-from django.utils.timezone import now
+from django.db import connection, models
+from django.utils.timezone import localdate, now
 from django.utils.translation import gettext_lazy as _
 
 from account.models import BaseModel, CustomUser
-from dashboard.models import AdminConfiguration
+from dashboard import config as admin_config
 from product.models import ProductVariant
 
 
@@ -64,9 +63,11 @@ class Order(BaseModel):
     vat_tax = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     address = models.TextField(null=True, blank=True)
     coupon_name = models.CharField(max_length=200, null=True, blank=True)
+    # Whether the order holds the stock of its items (see product.stock).
+    stock_reserved = models.BooleanField(default=False)
 
     def save(self, *args, **kwargs):
-        config = AdminConfiguration.objects.last()
+        config = admin_config.get_admin_configuration()
         self.platform_fee = config.platform_fee if config else settings.PLATFORM_FEE
         self.packing_fee = config.packing_fee if config else settings.PACKING_FEE
         if not self.order_id:
@@ -83,23 +84,13 @@ class Order(BaseModel):
 
     def generate_order_id(self):
         """
-        Generate a unique order ID in the format YYYYMMDDXXX.
-        Example: 20240116001 (10 digits).
+        Generate a unique order ID in the format YYYYMMDD followed by the
+        day's order number, zero-padded to ``settings.ORDER_ID_WIDTH`` digits.
+        Example: 20240116001. Numbers past the width just get longer.
         """
-        current_date = datetime.now().strftime("%Y%m%d")
-
-        # Get the highest order_id for today
-        last_order = Order.objects.filter(order_id__startswith=current_date).aggregate(
-            Max("order_id")
-        )["order_id__max"]
-
-        if last_order:
-            last_number = int(last_order[-3:])  # Extract last 3 digits
-            new_number = last_number + 1
-        else:
-            new_number = 1  # Start from 001 if no orders exist today
-
-        return f"{current_date}{new_number:03d}"
+        day = localdate()
+        number = OrderSequence.next_number(day)
+        return f"{day:%Y%m%d}{number:0{settings.ORDER_ID_WIDTH}d}"
 
     def calculate_vat(self, vat_percentage=12, shipping_fee=0):
         self.total_with_vat = self.total_amount + self.vat_amount
@@ -117,6 +108,37 @@ class Order(BaseModel):
         return f"{self.email}-{self.status}"
 
 
+class OrderSequence(models.Model):
+    """
+    The last order number allocated on each day, for ``Order.order_id``.
+    """
+
+    day = models.DateField(primary_key=True)
+    last_number = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def next_number(cls, day):
+        """
+        Allocate the next order number of ``day``. The upsert takes the day's
+        row lock, so concurrent checkouts always get distinct numbers.
+        """
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (day, last_number) VALUES (%s, 1)
+                ON CONFLICT (day)
+                DO UPDATE SET last_number = {table}.last_number + 1
+                RETURNING last_number
+                """,
+                [day],
+            )
+            return cursor.fetchone()[0]
+
+    def __str__(self) -> str:
+        return f"{self.day}: {self.last_number}"
+
+
 class OrderItem(BaseModel):
     order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
     product = models.ForeignKey(
@@ -136,12 +158,25 @@ class InvoiceStatus(models.TextChoices):
     REFUNDED = "refunded", "Refunded"
 
 
+class InvoicePdfStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    READY = "ready", "Ready"
+    FAILED = "failed", "Failed"
+
+
 class Invoice(BaseModel):
     invoice_number = models.CharField(max_length=20, unique=True)
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     order = models.OneToOneField(Order, on_delete=models.CASCADE)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     pdf_file = models.FileField(upload_to="invoices/", null=True, blank=True)
+    # Bumped whenever the PDF must be rendered again (see orders.invoices).
+    pdf_version = models.PositiveIntegerField(default=0)
+    pdf_status = models.CharField(
+        max_length=20,
+        choices=InvoicePdfStatus.choices,
+        default=InvoicePdfStatus.PENDING.value,
+    )
     status = models.CharField(
         _("Customer Get Types"),
         max_length=50,
@@ -3,7 +3,7 @@ from django.conf import settings
 from rest_framework import serializers
 
 from account.serializers import UserDetailSerializer
-from dashboard.models import AdminConfiguration
+from dashboard import config as admin_config
 from orders.models import Invoice, Order, OrderItem, OrderStatus
 from product.serializers import ProductVariantSerializer
 from todos.serializers import TaskSerializer
@@ -11,7 +11,7 @@ from todos.serializers import TaskSerializer
 
 # Convert sync ORM query to async-compatible
 async def get_admin_configuration():
-    return await sync_to_async(AdminConfiguration.objects.all().last)()
+    return await sync_to_async(admin_config.get_admin_configuration)()
 
 
 class ContactInformationSerializer(serializers.Serializer):
@@ -42,6 +42,7 @@ class OrderInvoiceSerializer(serializers.ModelSerializer):
             "invoice_number",
             "status",
             "pdf_file",
+            "pdf_status",
         ]
 
 
@@ -208,6 +209,7 @@ class InvoiceSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "pdf_file",
+            "pdf_status",
         ]
 
     def get_username(self, obj):
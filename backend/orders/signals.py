@@ -1,5 +1,4 @@
 from django.contrib.auth import get_user_model
-from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
@@ -10,35 +9,41 @@ from django.utils.timezone import now
 from account.models import CustomUser
 from cart.models import Cart
 from coupon.models import UserCoupon
-from dashboard.models import AdminInvoiceConfiguration
+from dashboard import config as admin_config
 from notification.models import AdminNotification, Notification
 from notification.tasks import send_order_notification_to_admin
 from notification.utils import send_notification_email
-from orders.models import Invoice, Order, OrderItem, OrderStatus
-from orders.utils import generate_invoice_number, generate_invoice_pdf
+from orders.invoices import queue_invoice_pdf
+from orders.models import Invoice, Order, OrderStatus
+from orders.utils import generate_invoice_number
+from product.stock import release_stock
 
 User = get_user_model()
 
+RELEASED_STATUSES = {OrderStatus.CANCELED.value, OrderStatus.REJECTED.value}
+
 
 @receiver(post_save, sender=Order)
 def SendOrderCreatedNotification(sender, instance, **kwargs):
     send_order_notification_to_admin.delay(instance.id)
 
 
-@receiver(post_save, sender=OrderItem)
-def UpdateProductQuantityWithOrder(sender, instance, created, **kwargs):
-    if created:
-        with transaction.atomic():
-
-            product_variant = instance.product.inventory_items
-
-            if product_variant.total_quantity >= instance.quantity:
-                product_variant.total_quantity -= instance.quantity
-                product_variant.save()
-            else:
-                raise ValidationError(
-                    f"Not enough stock available for {product_variant.sku}"
-                )
+@receiver(post_save, sender=Order)
+def release_order_stock(sender, instance, **kwargs):
+    """
+    Put back the stock of an order that is canceled or rejected. Checkout
+    reserves it before creating the order; the ``stock_reserved`` flag is
+    cleared in the same statement that claims the release, so it happens once.
+    """
+    if instance.status not in RELEASED_STATUSES or not instance.stock_reserved:
+        return
+    with transaction.atomic():
+        claimed = Order.objects.filter(pk=instance.pk, stock_reserved=True).update(
+            stock_reserved=False
+        )
+        if claimed:
+            release_stock(instance.items.values_list("product_id", "quantity"))
+    instance.stock_reserved = False
 
 
 @receiver(post_save, sender=Order)
@@ -68,27 +73,18 @@ def RedeemUserCoupon(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=Order)
 def create_invoice(sender, instance, created, **kwargs):
-
-    if instance.status == OrderStatus.PAYMENT_PENDING.value and not hasattr(
-        instance, "invoice"
-    ):
-
-        invoice = Invoice.objects.create(
-            invoice_number=generate_invoice_number(),
-            user=instance.user,
-            order=instance,
-            total_amount=instance.final_amount,
-        )
-        pdf_file = generate_invoice_pdf(invoice)
-        invoice.pdf_file.save(f"{invoice.invoice_number}.pdf", pdf_file)
-
-    elif not hasattr(instance, "invoice"):
+    """
+    Create the order's invoice. Its PDF is rendered by a Celery job once the
+    order is committed (see orders.invoices).
+    """
+    if not hasattr(instance, "invoice"):
         invoice = Invoice.objects.create(
             invoice_number=generate_invoice_number(),
             user=instance.user,
             order=instance,
             total_amount=instance.final_amount,
         )
+        queue_invoice_pdf(invoice)
 
 
 @receiver(pre_save, sender=Order)
@@ -115,7 +111,7 @@ def send_order_status_update_email(sender, instance, **kwargs):
                 "The Bakery Team"
             )
             try:
-                invoice_config = AdminInvoiceConfiguration.objects.last()
+                invoice_config = admin_config.get_invoice_configuration()
             except Exception:
                 invoice_config = None
             logo_url = (
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from orders.documents import purge_rendered_documents
+from orders.invoices import render_invoice
+
+
+@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def render_invoice_pdf(invoice_number, version):
+    """Render version ``version`` of an invoice's PDF (see orders.invoices)."""
+    return render_invoice(invoice_number, version)
+
+
+@shared_task
+def purge_document_cache():
+    """Delete cached PDFs older than DOCUMENT_CACHE_MAX_AGE."""
+    return purge_rendered_documents()
@@ -1,4 +1,20 @@
+import csv
+import io
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -6,9 +22,19 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from account.models import CustomUser as User
 from bakery.models import Bakery
 from cart.models import Cart, CartItem
-from orders.models import Order
+from orders import documents
+from orders.invoices import render_invoice, request_invoice_pdf
+from orders.models import (
+    Invoice,
+    InvoicePdfStatus,
+    Order,
+    OrderItem,
+    OrderSequence,
+    OrderStatus,
+)
 from orders.serializers import OrderSerializer
-from product.models import Category, Product, ProductVariant
+from product.models import Category, Inventory, Product, ProductVariant
+from product.stock import reserve_stock
 
 
 class CheckoutAPITestCase(APITestCase):
@@ -194,3 +220,320 @@ class ApproveOrderAPIViewTestCase(APITestCase):
         # Check if the status code is 400 Bad Request
         self.assertEqual(response.status_code, 404)
         self.assertEqual(response.data["message"], "Order not found")
+
+
+class InvoicePdfPipelineTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, INVOICE_PDF_WAIT_TIMEOUT=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(email="invoice@example.com", password="x")
+        (self.order,) = Order.objects.bulk_create(
+            [Order(user=self.user, contact_number="123", total_amount=Decimal("10"))]
+        )
+        self.invoice = Invoice.objects.create(
+            invoice_number="INV-TEST0001",
+            user=self.user,
+            order=self.order,
+            total_amount=Decimal("10"),
+        )
+        render = mock.patch(
+            "orders.invoices.generate_invoice_pdf",
+            side_effect=lambda invoice: BytesIO(b"%PDF-1.4 invoice"),
+        )
+        self.generate_pdf = render.start()
+        self.addCleanup(render.stop)
+
+    def test_job_renders_once_per_version(self):
+        name = render_invoice("INV-TEST0001", 0)
+        self.assertEqual(name, "invoices/INV-TEST0001-v0.pdf")
+        self.assertEqual(render_invoice("INV-TEST0001", 0), name)
+        self.assertEqual(self.generate_pdf.call_count, 1)
+
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.pdf_status, InvoicePdfStatus.READY)
+        self.assertEqual(self.invoice.pdf_file.read(), b"%PDF-1.4 invoice")
+
+    def test_superseded_job_is_skipped(self):
+        old_name = render_invoice("INV-TEST0001", 0)
+        with self.captureOnCommitCallbacks() as callbacks:
+            request_invoice_pdf(self.invoice)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            (self.invoice.pdf_version, self.invoice.pdf_status),
+            (1, InvoicePdfStatus.PENDING),
+        )
+
+        self.assertIsNone(render_invoice("INV-TEST0001", 0))
+        self.assertEqual(self.generate_pdf.call_count, 1)
+        self.assertEqual(
+            render_invoice("INV-TEST0001", 1), "invoices/INV-TEST0001-v1.pdf"
+        )
+        self.assertFalse(self.invoice.pdf_file.storage.exists(old_name))
+
+    def test_order_invoice_is_rendered_after_commit(self):
+        Cart.objects.create(user=self.user)
+        with mock.patch("orders.invoices.enqueue_invoice_pdf") as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                order = Order.objects.create(
+                    user=self.user,
+                    contact_number="123",
+                    total_amount=Decimal("10"),
+                    total_with_vat=Decimal("12"),
+                    status=OrderStatus.IN_TRANSIT.value,
+                )
+        self.generate_pdf.assert_not_called()
+        enqueue.assert_called_once_with(order.invoice.invoice_number, 0)
+
+    def test_download_waits_for_the_pdf(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("download-invoice", args=["INV-TEST0001"])
+        with mock.patch("orders.invoices.enqueue_invoice_pdf") as enqueue:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["invoice_status"], InvoicePdfStatus.PENDING)
+        enqueue.assert_called_once_with("INV-TEST0001", 0)
+
+        render_invoice("INV-TEST0001", 0)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.4 invoice")
+
+
+class DocumentRenderTests(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        write_pdf = mock.patch(
+            "orders.documents.write_pdf", return_value=b"%PDF-1.4 order"
+        )
+        self.write_pdf = write_pdf.start()
+        self.addCleanup(write_pdf.stop)
+
+    def render(self, order_id):
+        return documents.render_pdf(
+            "orders.html", {"order_id": order_id}, engine=documents.XHTML2PDF
+        )
+
+    def test_unchanged_documents_are_read_from_the_cache(self):
+        self.assertEqual(self.render("ORD-1"), b"%PDF-1.4 order")
+        self.assertEqual(self.render("ORD-1"), b"%PDF-1.4 order")
+        self.assertEqual(self.write_pdf.call_count, 1)
+
+        self.render("ORD-2")
+        self.assertEqual(self.write_pdf.call_count, 2)
+
+    def test_storage_urls_are_read_from_storage(self):
+        name = default_storage.save("logos/logo.png", ContentFile(b"png"))
+        fetched = documents.fetch_url(f"storage:{name}")
+        with fetched["file_obj"] as logo:
+            self.assertEqual(logo.read(), b"png")
+        self.assertEqual(fetched["mime_type"], "image/png")
+        self.assertEqual(
+            documents.link_callback(f"storage:{name}", None),
+            default_storage.path(name),
+        )
+
+    def test_old_documents_are_purged(self):
+        self.render("ORD-1")
+        self.assertEqual(documents.purge_rendered_documents(max_age=3600), 0)
+        self.assertEqual(documents.purge_rendered_documents(max_age=-1), 1)
+        self.render("ORD-1")
+        self.assertEqual(self.write_pdf.call_count, 2)
+
+
+class ExportInvoicesTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            INVOICE_EXPORT_BATCH_SIZE=2,
+            INVOICE_PDF_WAIT_TIMEOUT=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Render jobs run at once, as an idle worker would.
+        patcher = mock.patch(
+            "orders.exports.enqueue_invoice_pdf", side_effect=render_invoice
+        )
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.accountant = User.objects.create_user(
+            email="accountant@example.com", password="x", is_superuser=True
+        )
+        customer = User.objects.create_user(email="customer@example.com", password="x")
+        orders = Order.objects.bulk_create(
+            [
+                Order(user=customer, contact_number="123", total_amount=Decimal("10"))
+                for _ in range(3)
+            ]
+        )
+        self.invoices = [
+            Invoice.objects.create(
+                invoice_number=f"INV-EXP{index}",
+                user=customer,
+                order=order,
+                total_amount=Decimal("10"),
+                status="paid" if index else "pending",
+            )
+            for index, order in enumerate(orders)
+        ]
+        self.invoices[0].pdf_file.save("INV-EXP0.pdf", ContentFile(b"%PDF stored"))
+        Invoice.objects.filter(pk=self.invoices[0].pk).update(
+            pdf_status=InvoicePdfStatus.READY
+        )
+        self.client.force_authenticate(self.accountant)
+
+    def export(self, **params):
+        response = self.client.get(reverse("export-invoices"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+    def test_export_streams_pdfs_and_ledger(self):
+        archive = self.export()
+        self.assertEqual(
+            archive.namelist(),
+            [
+                "invoices/INV-EXP0.pdf",
+                "invoices/INV-EXP1.pdf",
+                "invoices/INV-EXP2.pdf",
+                "ledger.csv",
+            ],
+        )
+        self.assertEqual(archive.read("invoices/INV-EXP0.pdf"), b"%PDF stored")
+        self.assertTrue(archive.read("invoices/INV-EXP2.pdf").startswith(b"%PDF"))
+
+        ledger = list(csv.DictReader(io.StringIO(archive.read("ledger.csv").decode())))
+        self.assertEqual(
+            [(row["invoice_number"], row["status"]) for row in ledger],
+            [("INV-EXP0", "pending"), ("INV-EXP1", "paid"), ("INV-EXP2", "paid")],
+        )
+        # Missing PDFs went through their render jobs.
+        self.assertEqual(
+            sorted(call.args for call in self.enqueue.call_args_list),
+            [("INV-EXP1", 0), ("INV-EXP2", 0)],
+        )
+        self.assertEqual(
+            set(Invoice.objects.values_list("pdf_status", flat=True)),
+            {InvoicePdfStatus.READY},
+        )
+
+    def test_pdfs_still_rendering_are_left_out(self):
+        self.enqueue.side_effect = None
+        archive = self.export()
+        self.assertEqual(archive.namelist(), ["invoices/INV-EXP0.pdf", "ledger.csv"])
+        ledger = list(csv.DictReader(io.StringIO(archive.read("ledger.csv").decode())))
+        self.assertEqual(
+            [row["pdf"] for row in ledger], ["invoices/INV-EXP0.pdf", "", ""]
+        )
+
+    def test_export_applies_the_list_filters(self):
+        archive = self.export(status="paid", sort_by="-invoice_number")
+        self.assertEqual(
+            archive.namelist(),
+            ["invoices/INV-EXP2.pdf", "invoices/INV-EXP1.pdf", "ledger.csv"],
+        )
+
+
+class OrderIdAllocationTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="orders@example.com", password="x")
+        Cart.objects.create(user=self.user)
+        for target in [
+            "orders.signals.send_order_notification_to_admin",
+            "orders.invoices.enqueue_invoice_pdf",
+        ]:
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def checkout(self):
+        try:
+            return Order.objects.create(
+                user=self.user,
+                contact_number="123",
+                total_amount=Decimal("10"),
+                total_with_vat=Decimal("12"),
+                status=OrderStatus.IN_TRANSIT.value,
+            ).order_id
+        finally:
+            connection.close()
+
+    def test_parallel_checkouts_get_distinct_order_ids(self):
+        checkouts = 24
+        barrier = threading.Barrier(checkouts)
+
+        def checkout():
+            barrier.wait()
+            return self.checkout()
+
+        with ThreadPoolExecutor(max_workers=checkouts) as pool:
+            order_ids = list(pool.map(lambda _: checkout(), range(checkouts)))
+
+        prefix = f"{timezone.localdate():%Y%m%d}"
+        self.assertEqual(
+            sorted(order_ids),
+            [f"{prefix}{number:03d}" for number in range(1, checkouts + 1)],
+        )
+
+    @override_settings(ORDER_ID_WIDTH=5)
+    def test_width_is_configurable_and_numbers_continue(self):
+        OrderSequence.objects.create(day=timezone.localdate(), last_number=999)
+        order_id = Order(total_amount=Decimal("1")).generate_order_id()
+        self.assertEqual(order_id, f"{timezone.localdate():%Y%m%d}01000")
+
+
+class StockReleaseTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="stock@example.com", password="x"
+        )
+        Inventory.objects.filter(pk=1).update(total_quantity=10)
+        reserve_stock([(1, 4)])
+        (self.order,) = Order.objects.bulk_create(
+            [
+                Order(
+                    user=self.admin,
+                    order_id="STOCK-1",
+                    contact_number="123",
+                    total_amount=Decimal("10"),
+                    total_with_vat=Decimal("12"),
+                    status=OrderStatus.IN_PROGRESS.value,
+                    stock_reserved=True,
+                )
+            ]
+        )
+        OrderItem.objects.create(
+            order=self.order, product_id=1, quantity=4, price=Decimal("2.50")
+        )
+        self.client.force_authenticate(self.admin)
+
+    def set_status(self, order_status):
+        response = self.client.patch(
+            reverse("update-pending-approval", args=[self.order.pk]),
+            {"status": order_status},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return Inventory.objects.get(pk=1).total_quantity
+
+    def test_canceled_order_releases_its_stock_once(self):
+        self.assertEqual(self.set_status(OrderStatus.IN_TRANSIT.value), 6)
+        self.assertEqual(self.set_status(OrderStatus.CANCELED.value), 10)
+        self.assertEqual(self.set_status(OrderStatus.REJECTED.value), 10)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.stock_reserved)
@@ -5,6 +5,7 @@ from orders.views import (
     CheckoutAPIView,
     DownloadInvoiceAPIView,
     DownloadOrderAPIView,
+    ExportInvoicesAPIView,
     GetInvoiceAPIView,
     GetOrderByIdAPIView,
     GetUserInvoiceAPIView,
@@ -24,6 +25,7 @@ urlpatterns = [
     path("orders/", OrderListAPIVIew.as_view(), name="orders"),
     path("invoices/", ListInvoicesAPIView.as_view(), name="list-invoices"),
     path("invoices/<int:pk>/", GetInvoiceAPIView.as_view(), name="single-invoice"),
+    path("invoices/export/", ExportInvoicesAPIView.as_view(), name="export-invoices"),
     path("user-invoices/", GetUserInvoiceAPIView.as_view(), name="user-invoices"),
     path(
         "user-invoices/<int:pk>/", GetUserInvoiceAPIView.as_view(), name="user-invoices"
@@ -3,14 +3,14 @@ from datetime import datetime, timedelta
 from io import BytesIO
 
 from django.conf import settings
+from django.db.models import Q, Value
+from django.db.models.functions import Concat
 from django.http import HttpResponse
-from django.template.loader import render_to_string
 from django.utils import timezone
-from weasyprint import HTML
-from xhtml2pdf import pisa
 
 from bakery.utils import generate_otp, send_otp_email, send_otp_sms
-from dashboard.models import AdminInvoiceConfiguration
+from dashboard import config as admin_config
+from orders.documents import XHTML2PDF, DocumentRenderError, render_pdf, storage_url
 
 
 def contact_verification_otp(otp_verification, email=False, phone=False):
@@ -68,6 +68,66 @@ def contact_verification_otp(otp_verification, email=False, phone=False):
     return True
 
 
+def filter_invoices(invoices, params):
+    """
+    Apply the invoice list filters in ``params`` (query parameters) to
+    ``invoices``: search, status, sort_by and start_date/end_date.
+    """
+    # Search parameters
+    search_term = params.get("search")
+    status = params.get("status")
+    sort_by = params.get("sort_by", "-created_at")
+    start_date = params.get("start_date")
+    end_date = params.get("end_date")
+    # Regex search for invoice number if provided
+
+    if start_date and end_date:
+        invoices = invoices.filter(created_at__date__range=[start_date, end_date])
+    if search_term:
+        # Use regex for case-sensitive search
+        invoices = invoices.annotate(
+            full_name=Concat("user__first_name", Value(" "), "user__last_name")
+        ).filter(
+            Q(invoice_number__regex=search_term)
+            | Q(user__first_name__regex=search_term)
+            | Q(user__last_name__regex=search_term)
+            | Q(user__email__regex=search_term)
+            | Q(full_name__regex=search_term)
+            | Q(status__regex=search_term)
+            | Q(order__order_id__regex=search_term)
+        )
+    if status:
+        invoices = invoices.filter(status=status)
+
+    # Ordering logic
+    if sort_by:
+        if sort_by == "desc":
+            invoices = invoices.order_by("created_at")
+        elif sort_by == "asc":
+            invoices = invoices.order_by("-created_at")
+        if sort_by == "order_id":
+            invoices = invoices.order_by("order_id")
+        elif sort_by == "-order_id":
+            invoices = invoices.order_by("-order_id")
+        elif sort_by == "-total_amount":
+            invoices = invoices.order_by("-total_amount")
+        elif sort_by == "total_amount":
+            invoices = invoices.order_by("total_amount")
+        elif sort_by == "a_to_z":
+            invoices = invoices.order_by("user__first_name")
+        elif sort_by == "z_to_a":
+            invoices = invoices.order_by("-user__first_name")
+        elif sort_by == "invoice_number":
+            invoices = invoices.order_by("invoice_number")
+        elif sort_by == "-invoice_number":
+            invoices = invoices.order_by("-invoice_number")
+        elif sort_by == "status":
+            invoices = invoices.order_by("status")
+        elif sort_by == "-status":
+            invoices = invoices.order_by("-status")
+    return invoices
+
+
 def generate_invoice_number():
     """
     Generate a unique invoice number.
@@ -79,48 +139,52 @@ def generate_invoice_number():
     return f"INV-{uuid.uuid4().hex[:8].upper()}"
 
 
-def generate_invoice_pdf(invoice):
+def get_invoice_context(invoice):
     """
-    Generate a PDF file for the given invoice.
+    Build the ``invoice.html`` template context of an invoice.
 
     Args:
-        invoice: Invoice object containing order and items information
+        invoice: Invoice object with its order
 
     Returns:
-        BytesIO: PDF file buffer containing the generated invoice
+        dict: Invoice, order items, invoice configuration and logo URL
     """
     try:
-        invoice_config = AdminInvoiceConfiguration.objects.last()
+        invoice_config = admin_config.get_invoice_configuration()
     except Exception:
         invoice_config = None
 
+    # Read from storage by the renderer, not fetched from the public site.
+    logo_url = (
+        storage_url(invoice_config.logo)
+        if invoice_config and invoice_config.logo
+        else None
+    )
+    return {
+        "invoice": invoice,
+        "orders": invoice.order.items.all(),
+        "invoice_config": invoice_config,
+        "logo_url": logo_url,
+    }
+
+
+def generate_invoice_pdf(invoice):
+    """
+    Generate a PDF file for the given invoice.
+
+    Args:
+        invoice: Invoice object containing order and items information
+
+    Returns:
+        BytesIO: PDF file buffer containing the generated invoice
+    """
     print(f"🧾 Generating Invoice PDF for Invoice ID: {invoice.id}")
 
     if not hasattr(invoice, "order"):
         print("🚨 Invoice has no order associated!")
         return None
 
-    order = invoice.order
-    logo_url = (
-        f"https://bakery-api.rexett.com{invoice_config.logo.url}"
-        if invoice_config.logo
-        else None
-    )
-
-    order_items = order.items.all()
-    html_string = render_to_string(
-        "invoice.html",
-        {
-            "invoice": invoice,
-            "orders": order_items,
-            "invoice_config": invoice_config,
-            "logo_url": logo_url,
-        },
-    )
-
-    pdf_file = BytesIO()
-    HTML(string=html_string).write_pdf(pdf_file)
-    return pdf_file
+    return BytesIO(render_pdf("invoice.html", get_invoice_context(invoice)))
 
 
 def generate_order_pdf(request):
@@ -150,16 +214,13 @@ def generate_order_pdf(request):
         "total_amount": 40,
     }
 
-    html_content = render_to_string("order_template.html", order_data)
-    buffer = BytesIO()
-    pisa_status = pisa.CreatePDF(html_content, dest=buffer)
-
-    if pisa_status.err:
+    try:
+        pdf = render_pdf("order_template.html", order_data, engine=XHTML2PDF)
+    except DocumentRenderError:
         return HttpResponse("Error generating PDF", status=500)
 
-    buffer.seek(0)
     return HttpResponse(
-        buffer,
+        pdf,
         content_type="application/pdf",
         headers={
             "Content-Disposition": f"attachment; filename={order_data['order_id']}.pdf",
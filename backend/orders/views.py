@@ -1,16 +1,17 @@
 import logging
 import re
 from datetime import time
-from io import BytesIO
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
+from django.db import transaction
 from django.db.models import Q, Value
 from django.db.models.functions import Concat
-from django.http import FileResponse, HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
@@ -20,7 +21,6 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from xhtml2pdf import pisa
 
 from account.permissions import (
     AllowGetOnlyIsAdminStockManager,
@@ -29,7 +29,11 @@ from account.permissions import (
 )
 from bakery.models import Bakery, BakeryAddress
 from cart.models import Cart, CartItem
-from orders.models import Invoice, Order, OrderItem, OrderStatus
+from cart.pricing import configured_vat_percentage, prefetch_items, price_cart
+from orders.documents import XHTML2PDF, DocumentRenderError, render_pdf
+from orders.exports import export_invoices
+from orders.invoices import request_invoice_pdf, wait_for_invoice_pdf
+from orders.models import Invoice, InvoicePdfStatus, Order, OrderItem, OrderStatus
 from orders.serializers import (
     AdminOrderSerializer,
     InvoiceIDSerializer,
@@ -39,7 +43,9 @@ from orders.serializers import (
     OrderCustomerAddress,
     OrderSerializer,
 )
-from orders.utils import generate_invoice_pdf
+from orders.utils import filter_invoices
+from product.stock import reserve_stock
+from product.utils import KeysetPagination
 
 logger = logging.getLogger(__name__)
 
@@ -52,13 +58,14 @@ class CheckoutAPIView(APIView):
     - POST: Create a new order from cart items
         - Validates user authentication and role
         - Checks shipping address
+        - Reserves the stock of all cart items in one statement
         - Processes cart items into order items
         - Handles coupon applications
         - Generates invoice if applicable
 
     Returns:
     - 200: Successful checkout with order details
-    - 400: Invalid request (empty cart, invalid address)
+    - 400: Invalid request (empty cart, invalid address, not enough stock)
     - Redirects to registration if user is not authenticated
 
     Authentication:
@@ -138,7 +145,8 @@ class CheckoutAPIView(APIView):
                 {"message": "Your cart is empty"}, status=status.HTTP_400_BAD_REQUEST
             )
         cart_items = CartItem.objects.filter(cart=cart, cart__user=request.user)
-        if not cart_items.exists():
+        prefetch_items(cart)
+        if not cart.items.all():
             return Response(
                 {"message": "Your cart is empty"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -156,41 +164,39 @@ class CheckoutAPIView(APIView):
             else OrderStatus.PAYMENT_PENDING.value
         )
 
-        try:
-            coupon_name = None
-            if cart.applied_coupon:
-                coupon_name = cart.applied_coupon
-            order = Order.objects.create(
-                user=request.user,
-                email=contact_info.get("email"),
-                contact_number=contact_info.get("contact_number"),
-                total_amount=cart.total_price,
-                discount_amount=cart.discounted_price,
-                final_amount=cart.total_with_vat,
-                status=order_status,
-                total_with_vat=cart.total_with_vat,
-                vat_amount=cart.vat_amount,
-                shipping_fee=cart.shipping_cost,
-                address=shipping_address_str,
-                coupon_name=coupon_name.code if coupon_name else None,
-            )
-
-        except ValidationError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        pricing = price_cart(cart, vat_percentage=int(configured_vat_percentage()))
 
-        for item in cart_items:
-            try:
-                variant_inventory_regular_price = (
-                    item.product_variant.inventory_items.regular_price
+        # The stock of every line is reserved before the order exists, all
+        # of it or none; any failure rolls back the reservation with it.
+        try:
+            with transaction.atomic():
+                reserve_stock(
+                    (item.product_variant_id, item.quantity) for item in pricing.items
                 )
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product_variant,
-                    quantity=item.quantity,
-                    price=variant_inventory_regular_price,
+                order = Order.objects.create(
+                    user=request.user,
+                    email=contact_info.get("email"),
+                    contact_number=contact_info.get("contact_number"),
+                    total_amount=pricing.total_price,
+                    discount_amount=pricing.discounted_price,
+                    final_amount=pricing.total_with_vat,
+                    status=order_status,
+                    total_with_vat=pricing.total_with_vat,
+                    vat_amount=pricing.vat_amount,
+                    shipping_fee=pricing.shipping_cost,
+                    address=shipping_address_str,
+                    coupon_name=pricing.coupon_code,
+                    stock_reserved=True,
                 )
-            except ValidationError as e:
-                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                for item in pricing.items:
+                    OrderItem.objects.create(
+                        order=order,
+                        product_id=item.product_variant_id,
+                        quantity=item.quantity,
+                        price=item.unit_price,
+                    )
+        except ValidationError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         cart_items.delete()
         cart.applied_coupon = None
@@ -206,20 +212,30 @@ class CheckoutAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         else:
-            try:
-                invoice = Invoice.objects.get(order=order.id)
-                pdf_file = generate_invoice_pdf(invoice)
-                invoice.pdf_file.save(f"{invoice.invoice_number}.pdf", pdf_file)
+            # The invoice PDF is rendered in the background: ``invoice_file``
+            # stays the stored file's URL, null until it is rendered, and the
+            # authenticated download URL waits for it.
+            invoice = Invoice.objects.filter(order=order.id).first()
+            if invoice is not None:
+                invoice_ready = (
+                    invoice.pdf_status == InvoicePdfStatus.READY
+                    and bool(invoice.pdf_file)
+                )
                 return Response(
                     {
                         "message": "Order created successfully",
                         "order_id": order.id,
-                        "invoice_file": invoice.pdf_file.url,
+                        "invoice_number": invoice.invoice_number,
+                        "invoice_status": invoice.pdf_status,
+                        "invoice_file": (
+                            invoice.pdf_file.url if invoice_ready else None
+                        ),
+                        "invoice_download_url": reverse(
+                            "download-invoice", args=[invoice.invoice_number]
+                        ),
                     },
                     status=status.HTTP_201_CREATED,
                 )
-            except Invoice.DoesNotExist:
-                pass
 
         return Response(
             {"message": "Order created successfully", "order_id": order.id},
@@ -239,6 +255,7 @@ class OrderListAPIVIew(APIView):
         - created_after/created_before: Filter by date range
         - sort_by: order_id/user__first_name/status/created_at/total_amount
         - sort: asc/desc
+        - pagination=cursor: keyset pagination, count=approximate: estimated count
 
     Authentication:
     - Requires JWT authentication
@@ -246,7 +263,7 @@ class OrderListAPIVIew(APIView):
 
     permission_classes = [IsAuthenticated]
     authentication_classes = [JWTAuthentication]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
 
     def get(self, request):
         orders = Order.objects.filter(user=request.user).order_by("-created_at")
@@ -448,9 +465,12 @@ class DownloadInvoiceAPIView(APIView):
 
     Methods:
     - GET: Download invoice PDF file by invoice number
+        - Waits for a PDF that is still being rendered, up to
+          INVOICE_PDF_WAIT_TIMEOUT seconds
 
     Returns:
     - PDF file response
+    - 202 with the PDF status while it is not ready yet
     - 404 if invoice not found
 
     Authentication:
@@ -462,6 +482,15 @@ class DownloadInvoiceAPIView(APIView):
 
     def get(self, request, invoice_number):
         invoice = get_object_or_404(Invoice, invoice_number=invoice_number)
+        if not wait_for_invoice_pdf(invoice):
+            return Response(
+                {
+                    "detail": "The invoice is being generated. Try again shortly.",
+                    "invoice_status": invoice.pdf_status,
+                },
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Retry-After": "5"},
+            )
         return FileResponse(
             invoice.pdf_file, as_attachment=True, filename=f"{invoice_number}.pdf"
         )
@@ -477,6 +506,7 @@ class ListInvoicesAPIView(APIView):
         - status: Filter by invoice status
         - sort_by: Various sorting options (created_at, order_id, total_amount, etc.)
         - start_date/end_date: Filter by date range
+        - pagination=cursor: keyset pagination, count=approximate: estimated count
 
     Authentication:
     - Requires JWT authentication
@@ -485,63 +515,10 @@ class ListInvoicesAPIView(APIView):
 
     permission_classes = [AllowGetOnlyIsAdminStockWorker]
     authentication_classes = [JWTAuthentication]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
 
     def get(self, request):
-        invoices = Invoice.objects.all()
-
-        # Search parameters
-        search_term = request.query_params.get("search")
-        status = request.query_params.get("status")
-        sort_by = request.query_params.get("sort_by", "-created_at")
-        start_date = request.query_params.get("start_date")
-        end_date = request.query_params.get("end_date")
-        # Regex search for invoice number if provided
-
-        if start_date and end_date:
-            invoices = invoices.filter(date__range=[start_date, end_date])
-        if search_term:
-            # Use regex for case-sensitive search
-            invoices = invoices.annotate(
-                full_name=Concat("user__first_name", Value(" "), "user__last_name")
-            ).filter(
-                Q(invoice_number__regex=search_term)
-                | Q(user__first_name__regex=search_term)
-                | Q(user__last_name__regex=search_term)
-                | Q(user__email__regex=search_term)
-                | Q(full_name__regex=search_term)
-                | Q(status__regex=search_term)
-                | Q(order__order_id__regex=search_term)
-            )
-        if status:
-            invoices = invoices.filter(status=status)
-
-        # Ordering logic
-        if sort_by:
-            if sort_by == "desc":
-                invoices = invoices.order_by("created_at")
-            elif sort_by == "asc":
-                invoices = invoices.order_by("-created_at")
-            if sort_by == "order_id":
-                invoices = invoices.order_by("order_id")
-            elif sort_by == "-order_id":
-                invoices = invoices.order_by("-order_id")
-            elif sort_by == "-total_amount":
-                invoices = invoices.order_by("-total_amount")
-            elif sort_by == "total_amount":
-                invoices = invoices.order_by("total_amount")
-            elif sort_by == "a_to_z":
-                invoices = invoices.order_by("user__first_name")
-            elif sort_by == "z_to_a":
-                invoices = invoices.order_by("-user__first_name")
-            elif sort_by == "invoice_number":
-                invoices = invoices.order_by("invoice_number")
-            elif sort_by == "-invoice_number":
-                invoices = invoices.order_by("-invoice_number")
-            elif sort_by == "status":
-                invoices = invoices.order_by("status")
-            elif sort_by == "-status":
-                invoices = invoices.order_by("-status")
+        invoices = filter_invoices(Invoice.objects.all(), request.query_params)
 
         paginator = self.pagination_class()
         paginated_invoices = paginator.paginate_queryset(invoices, request)
@@ -550,6 +527,48 @@ class ListInvoicesAPIView(APIView):
         return paginator.get_paginated_response(serializer.data)
 
 
+class ExportInvoicesAPIView(APIView):
+    """
+    API view for exporting invoices in bulk.
+
+    Methods:
+    - GET: Download a ZIP of the PDFs of all invoices matching the invoice
+      list filters (search, status, sort_by, start_date/end_date)
+        - Includes ledger.csv, one row per exported invoice
+        - PDFs not rendered yet are queued as render jobs; the ones that
+          are not ready in time are left out (empty pdf column in the ledger)
+
+    Features:
+    - The archive is streamed while it is built, so memory use stays
+      bounded for thousands of invoices
+
+    Authentication:
+    - Requires JWT authentication
+    - Admin, stock manager or accountant access required
+    """
+
+    permission_classes = [AllowGetOnlyIsAdminStockWorker]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request):
+        """
+        Stream the invoice export.
+
+        Args:
+            request: HTTP request object with the invoice list filters
+
+        Returns:
+            StreamingHttpResponse: ZIP archive of the matching invoices
+        """
+        invoices = filter_invoices(Invoice.objects.all(), request.query_params)
+        filename = f"invoices-{timezone.localdate().isoformat()}.zip"
+        return StreamingHttpResponse(
+            export_invoices(invoices),
+            content_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+
 class GetInvoiceAPIView(APIView):
     """
     API view for managing individual invoices.
@@ -557,7 +576,7 @@ class GetInvoiceAPIView(APIView):
     Methods:
     - GET: Retrieve a specific invoice by ID
     - PATCH: Update invoice status
-        - Automatically regenerates PDF after status update
+        - Queues the PDF to be rendered again after the status update
 
     Authentication:
     - Requires JWT authentication
@@ -591,10 +610,12 @@ class GetInvoiceAPIView(APIView):
 
         if serializer.is_valid():
             serializer.save()
-            pdf_file = generate_invoice_pdf(invoice)
-            invoice.pdf_file.save(f"{invoice.invoice_number}.pdf", pdf_file)
+            request_invoice_pdf(invoice)
             return Response(
-                {"message": "Invoice Status Updated successfully"},
+                {
+                    "message": "Invoice Status Updated successfully",
+                    "invoice_status": invoice.pdf_status,
+                },
                 status=status.HTTP_200_OK,
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -811,14 +832,11 @@ class DownloadOrderAPIView(APIView):
             "total_amount": order.total_amount,
         }
 
-        html_content = render_to_string("orders.html", order_data)
-        buffer = BytesIO()
-        pisa_status = pisa.CreatePDF(html_content.encode("utf-8"), dest=buffer)
-
-        if pisa_status.err:
-            logger.error("Error: %s" % pisa_status.err)
-        pdf = buffer.getvalue()
-        buffer.close()
+        try:
+            pdf = render_pdf("orders.html", order_data, engine=XHTML2PDF)
+        except DocumentRenderError as e:
+            logger.error("Error: %s" % e)
+            return HttpResponse("Error generating PDF", status=500)
         return HttpResponse(pdf, content_type="application/pdf")
 
 
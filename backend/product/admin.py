@@ -6,6 +6,7 @@ from product.models import (
     Inventory,
     Product,
     ProductImage,
+    ProductImportJob,
     ProductMaterial,
     ProductSeo,
     ProductVariant,
@@ -21,3 +22,4 @@ admin.site.register(ProductSeo)
 admin.site.register(Inventory)
 admin.site.register(FavouriteItem)
 admin.site.register(ProductMaterial)
+admin.site.register(ProductImportJob)
@@ -0,0 +1,150 @@
+"""
+EAN-13 barcode images for inventories and raw materials.
+
+Barcodes are rendered on first request and stored content-addressed as
+``<upload_to><unique_code>.png``: the image depends on nothing but the code,
+so once the file exists it is served as is and never rendered again.
+``prerender_missing_barcodes`` fills the gaps in bulk, in this process or,
+for the management command, in a pool of processes started with ``spawn``.
+Celery workers are daemonic and cannot have children, so the task renders in
+process.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import barcode
+import django
+from barcode.writer import ImageWriter
+from django.core.files.base import ContentFile
+from django.db.models import Q
+
+from product.models import Inventory, ProductMaterial
+
+BARCODE_MODELS = [Inventory, ProductMaterial]
+RENDER_CHUNK_SIZE = 50
+
+
+def render_barcode(code):
+    """Render the PNG bytes of an EAN-13 ``code``."""
+    if len(code) != 13 or not code.isdigit():
+        raise ValueError("The unique code must be a 13-digit numeric string.")
+    buffer = BytesIO()
+    barcode.get("ean13", code, writer=ImageWriter()).write(buffer)
+    return buffer.getvalue()
+
+
+def get_storage(model):
+    return model._meta.get_field("barcode").storage
+
+
+def barcode_path(instance):
+    upload_to = instance._meta.get_field("barcode").upload_to
+    return f"{upload_to}{instance.unique_code}.png"
+
+
+def assign_unique_codes(model, instances):
+    """
+    Give the ``instances`` without a unique code a fresh one, checking the
+    candidates in one query per round and saving them with ``bulk_update``.
+    """
+    missing = [instance for instance in instances if not instance.unique_code]
+    pending = missing
+    while pending:
+        codes = {}
+        for instance in pending:
+            code = instance.generate_unique_code()
+            while code in codes:
+                code = instance.generate_unique_code()
+            codes[code] = instance
+        taken = set(
+            model.objects.filter(unique_code__in=codes).values_list(
+                "unique_code", flat=True
+            )
+        )
+        pending = []
+        for code, instance in codes.items():
+            if code in taken:
+                pending.append(instance)
+            else:
+                instance.unique_code = code
+    model.objects.bulk_update(missing, ["unique_code"], batch_size=500)
+
+
+def store_barcode(instance, content):
+    """Save rendered ``content`` for ``instance`` unless the file exists."""
+    storage = get_storage(type(instance))
+    path = barcode_path(instance)
+    if not storage.exists(path):
+        path = storage.save(path, ContentFile(content))
+    return path
+
+
+def get_barcode(instance):
+    """
+    Return the storage name of ``instance``'s barcode, rendering and storing
+    it on first use, and point the model's ``barcode`` field at it.
+    """
+    model = type(instance)
+    assign_unique_codes(model, [instance])
+    path = barcode_path(instance)
+    if not get_storage(model).exists(path):
+        path = store_barcode(instance, render_barcode(instance.unique_code))
+    if instance.barcode.name != path:
+        model.objects.filter(pk=instance.pk).update(barcode=path)
+        instance.barcode.name = path
+    return path
+
+
+def get_barcode_bytes(instance):
+    with get_storage(type(instance)).open(get_barcode(instance), "rb") as file:
+        return file.read()
+
+
+def render_barcodes(codes, workers=1):
+    """
+    Render ``codes`` in this process when ``workers`` is 1, else in a pool of
+    ``workers`` spawned processes (``None``: the CPU count).
+    """
+    if workers == 1:
+        return map(render_barcode, codes)
+    # Spawned processes start from scratch: set Django up before they import
+    # this module to unpickle ``render_barcode``.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    ) as executor:
+        return list(executor.map(render_barcode, codes, chunksize=RENDER_CHUNK_SIZE))
+
+
+def prerender_missing_barcodes(workers=1, models=BARCODE_MODELS):
+    """
+    Store a barcode for every row without one, rendering the missing images
+    as ``render_barcodes`` does. Returns the number rendered per model label.
+    """
+    rendered = {}
+    for model in models:
+        storage = get_storage(model)
+        instances = list(
+            model.objects.filter(Q(barcode="") | Q(barcode__isnull=True)).only(
+                "pk", "unique_code", "barcode"
+            )
+        )
+        assign_unique_codes(model, instances)
+        to_render = []
+        for instance in instances:
+            if storage.exists(barcode_path(instance)):
+                instance.barcode.name = barcode_path(instance)
+            else:
+                to_render.append(instance)
+
+        images = render_barcodes(
+            [instance.unique_code for instance in to_render], workers
+        )
+        for instance, content in zip(to_render, images):
+            instance.barcode.name = store_barcode(instance, content)
+        model.objects.bulk_update(instances, ["barcode"], batch_size=500)
+        rendered[model._meta.label] = len(to_render)
+    return rendered
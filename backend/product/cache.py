@@ -0,0 +1,178 @@
+"""
+Read cache for storefront catalog endpoints.
+
+Cached payloads live in the ``catalog`` cache (configured through the
+``CATALOG_CACHE_*`` settings) under keys that embed the current version of
+every scope the payload depends on:
+
+- ``catalog``: bumped when a category or sub category changes, since every
+  product payload embeds category names.
+- ``categories``: category and sub category listings (including their
+  product counts).
+- ``product-lists``: hot deals and related products.
+- ``product:<id>``: a single product's detail payload.
+
+The signals in ``product.signals`` bump only the scopes a change affects, so
+stale entries are never read again and simply age out with the TTL. Bumps
+have to reach every process that reads the catalog, Celery workers included,
+so with the per-process ``locmem`` backend payloads are built on every request
+and no ETags are sent.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_CACHE_ALIAS = "catalog"
+KEY_PREFIX = "catalog"
+HITS_KEY = f"{KEY_PREFIX}:stats:hits"
+MISSES_KEY = f"{KEY_PREFIX}:stats:misses"
+
+MISSING = object()
+
+
+def get_catalog_cache():
+    return caches[CATALOG_CACHE_ALIAS]
+
+
+def is_shared():
+    """Whether every process sees the same catalog cache (it is not ``locmem``)."""
+    return not isinstance(get_catalog_cache(), LocMemCache)
+
+
+def product_scope(product_id):
+    return f"product:{product_id}"
+
+
+def version_key(scope):
+    return f"{KEY_PREFIX}:version:{scope}"
+
+
+def increment(cache, key, initial, timeout=None):
+    """``cache.incr`` that creates the key when it is missing or evicted."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, initial, timeout)
+        return initial
+
+
+def get_versions(scopes):
+    """
+    Return the current version of each scope, creating missing ones.
+
+    New versions start from the clock rather than 1, so a version key that was
+    evicted can never come back with a number an old entry was stored under.
+    """
+    cache = get_catalog_cache()
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), settings.CATALOG_CACHE_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*scopes):
+    cache = get_catalog_cache()
+    for scope in scopes:
+        increment(
+            cache, version_key(scope), time.time_ns(), settings.CATALOG_CACHE_TIMEOUT
+        )
+
+
+def get_etag(scopes):
+    """
+    A strong ETag for payloads that depend on ``scopes``, or ``None`` (no
+    conditional requests) when the versions are per process and another
+    worker's change would go unseen.
+    """
+    if not is_shared():
+        return None
+    return ".".join(str(version) for version in get_versions(scopes))
+
+
+def scope_etag(*scopes):
+    """An ``etag_func`` for ``conditional_etag`` on views tied to ``scopes``."""
+    return lambda view, request, *args, **kwargs: get_etag(scopes)
+
+
+def product_etag(view, request, pk=None, *args, **kwargs):
+    return get_etag(["catalog", product_scope(pk)])
+
+
+def build_key(name, scopes, request=None):
+    versions = ":".join(str(version) for version in get_versions(scopes))
+    key = f"{KEY_PREFIX}:{name}:{versions}"
+    if request is not None:
+        # Paginated payloads carry absolute next/previous links.
+        uri = request.build_absolute_uri()
+        key = f"{key}:{hashlib.md5(uri.encode()).hexdigest()}"
+    return key
+
+
+def get_or_set(name, scopes, build, request=None):
+    """
+    Return the cached payload for ``name`` or build, store and return it.
+
+    ``build`` returns ``(data, cacheable)`` so callers can skip caching error
+    payloads. A per-process cache is bypassed: it would never see the changes
+    other processes make.
+    """
+    if not is_shared():
+        return build()[0]
+
+    cache = get_catalog_cache()
+    key = build_key(name, scopes, request)
+    data = cache.get(key, MISSING)
+    if data is not MISSING:
+        increment(cache, HITS_KEY, 1)
+        return data
+
+    increment(cache, MISSES_KEY, 1)
+    data, cacheable = build()
+    if cacheable:
+        cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+    return data
+
+
+def cached_response(name, scopes, view, request=None):
+    """
+    Serve ``view()``'s payload from the cache; only 200 responses are stored.
+    """
+    fresh = {}
+
+    def build():
+        response = view()
+        fresh["response"] = response
+        return response.data, response.status_code == status.HTTP_200_OK
+
+    data = get_or_set(name, scopes, build, request)
+    if "response" in fresh:
+        return fresh["response"]
+    return Response(data, status=status.HTTP_200_OK)
+
+
+def get_stats():
+    cache = get_catalog_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        "backend": settings.CATALOG_CACHE_BACKEND,
+        "timeout": settings.CATALOG_CACHE_TIMEOUT,
+        "max_entries": settings.CATALOG_CACHE_MAX_ENTRIES,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / lookups, 4) if lookups else None,
+    }
+
+
+def reset_stats():
+    get_catalog_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,294 @@
+"""
+Set-based duplication of products.
+
+Copies are named ``<name> (Copy <n>)``, where ``n`` follows the highest copy
+number already used for that product. SEO titles get the first free ``-<n>``
+suffix and SKUs are prefixed with the copy number. Every unique value is
+resolved with one query per batch instead of one probe per candidate, and
+the rows are written with ``bulk_create``, so duplicating hundreds of
+products costs a fixed number of statements.
+
+``bulk_create`` bypasses ``save()`` and the model signals, so the copies'
+search documents, summaries and catalog cache versions are refreshed, and the
+"New Product Added" notifications sent, here.
+"""
+
+import re
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from notification.signals import notify_new_products
+from product import cache as catalog_cache
+from product.models import Inventory, Product, ProductImage, ProductSeo, ProductVariant
+from product.search import refresh_search_documents
+from product.summary import refresh_product_summaries
+
+BATCH_SIZE = 500
+SKU_MAX_LENGTH = Inventory._meta.get_field("sku").max_length
+
+
+class DuplicationError(Exception):
+    pass
+
+
+def any_startswith(field, prefixes):
+    return reduce(or_, (Q(**{f"{field}__startswith": prefix}) for prefix in prefixes))
+
+
+def resolve_copy_names(names):
+    """
+    Return a copy name for each entry of ``names`` (repeats get distinct
+    numbers), reading the existing copies of all of them in one query.
+    """
+    bases = set(names)
+    highest = Counter()
+    # Product names are stored lower case.
+    patterns = {
+        base: re.compile(rf"^{re.escape(base.lower())} \(copy (\d+)\)$")
+        for base in bases
+    }
+    existing = Product.objects.filter(
+        any_startswith("name", [f"{base.lower()} (copy " for base in bases])
+    ).values_list("name", flat=True)
+    for name in existing:
+        for base, pattern in patterns.items():
+            match = pattern.match(name)
+            if match:
+                highest[base] = max(highest[base], int(match.group(1)))
+
+    copies = []
+    for name in names:
+        highest[name] += 1
+        copies.append((f"{name} (Copy {highest[name]})", highest[name]))
+    return copies
+
+
+def resolve_seo_titles(titles):
+    """
+    Return a free ``<title>-<n>`` for each title (``None`` stays ``None``),
+    reading the taken titles in one query.
+    """
+    bases = {title for title in titles if title}
+    taken = set()
+    if bases:
+        taken = set(
+            ProductSeo.objects.filter(any_startswith("seo_title", bases)).values_list(
+                "seo_title", flat=True
+            )
+        )
+
+    resolved = []
+    for title in titles:
+        if not title:
+            resolved.append(title)
+            continue
+        counter = 1
+        while f"{title}-{counter}" in taken:
+            counter += 1
+        candidate = f"{title}-{counter}"
+        taken.add(candidate)
+        resolved.append(candidate)
+    return resolved
+
+
+def resolve_skus(candidates):
+    """
+    Make every ``(sku, product_name)`` candidate unique; SKUs are compared
+    lower case like the column. Colliding or missing SKUs are retried with a
+    suffix or generated, one query per round.
+    """
+    skus = [
+        (sku or Inventory.build_sku(name))[:SKU_MAX_LENGTH].upper()
+        for sku, name in candidates
+    ]
+    attempt = 0
+    while True:
+        seen = set()
+        pending = []
+        for index, sku in enumerate(skus):
+            if sku.lower() in seen:
+                pending.append(index)
+            seen.add(sku.lower())
+        taken = set(
+            Inventory.objects.filter(sku__in=list(seen)).values_list("sku", flat=True)
+        )
+        pending += [index for index, sku in enumerate(skus) if sku.lower() in taken]
+        if not pending:
+            return skus
+        attempt += 1
+        for index in set(pending):
+            sku, name = candidates[index]
+            if sku:
+                suffix = f"-{attempt}"
+                sku = f"{sku[: SKU_MAX_LENGTH - len(suffix)]}{suffix}"
+            else:
+                sku = Inventory.build_sku(name)
+            skus[index] = sku.upper()
+
+
+def duplicate_products(product_ids):
+    """
+    Duplicate ``product_ids`` (in order, repeats allowed) with their
+    categories, tags, SEO, images, variants and inventories.
+
+    Raises ``DuplicationError`` when a product does not exist. Returns a
+    report with the created products and row counts.
+    """
+    originals = Product.objects.select_related("product_seo").prefetch_related(
+        "category", "sub_category", "images", "variants__inventory_items"
+    )
+    originals = originals.in_bulk(product_ids)
+    missing = [pk for pk in product_ids if pk not in originals]
+    if missing:
+        raise DuplicationError(f"Product with ID {missing[0]} does not exist.")
+    sources = [originals[pk] for pk in product_ids]
+
+    with transaction.atomic():
+        names = resolve_copy_names([product.name for product in sources])
+        copies = Product.objects.bulk_create(
+            [
+                Product(
+                    name=name,
+                    description=source.description,
+                    purchase_note=source.purchase_note,
+                    min_order_quantity=source.min_order_quantity,
+                    product_tag=source.product_tag,
+                )
+                for source, (name, _) in zip(sources, names)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        categories = [
+            Product.category.through(product_id=copy.pk, category_id=category.pk)
+            for source, copy in zip(sources, copies)
+            for category in source.category.all()
+        ]
+        sub_categories = [
+            Product.sub_category.through(
+                product_id=copy.pk, subcategory_id=sub_category.pk
+            )
+            for source, copy in zip(sources, copies)
+            for sub_category in source.sub_category.all()
+        ]
+        Product.category.through.objects.bulk_create(categories, batch_size=BATCH_SIZE)
+        Product.sub_category.through.objects.bulk_create(
+            sub_categories, batch_size=BATCH_SIZE
+        )
+
+        seo_sources = [
+            (source, copy)
+            for source, copy in zip(sources, copies)
+            if hasattr(source, "product_seo")
+        ]
+        seo_titles = resolve_seo_titles(
+            [source.product_seo.seo_title for source, _ in seo_sources]
+        )
+        seo = ProductSeo.objects.bulk_create(
+            [
+                ProductSeo(
+                    product=copy,
+                    focused_keyword=source.product_seo.focused_keyword,
+                    seo_title=seo_title,
+                    slug=f"{copy.name.replace(' ', '-')}-seo",
+                    preview_as=source.product_seo.preview_as,
+                    meta_description=source.product_seo.meta_description,
+                )
+                for (source, copy), seo_title in zip(seo_sources, seo_titles)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        images = ProductImage.objects.bulk_create(
+            [
+                ProductImage(
+                    product=copy, image=image.image, is_featured=image.is_featured
+                )
+                for source, copy in zip(sources, copies)
+                for image in source.images.all()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        variant_sources = [
+            (variant, copy, copy_number)
+            for source, copy, (_, copy_number) in zip(sources, copies, names)
+            for variant in source.variants.all()
+        ]
+        variants = ProductVariant.objects.bulk_create(
+            [
+                ProductVariant(
+                    product=copy,
+                    description=variant.description,
+                    enabled=variant.enabled,
+                    managed_stock=variant.managed_stock,
+                    allow_backorders=variant.allow_backorders,
+                )
+                for variant, copy, _ in variant_sources
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        inventory_sources = []
+        for (variant, copy, copy_number), new_variant in zip(variant_sources, variants):
+            inventory = getattr(variant, "inventory_items", None)
+            if inventory is not None:
+                inventory_sources.append((inventory, new_variant, copy, copy_number))
+        skus = resolve_skus(
+            [
+                (
+                    f"{copy_number}-SKU-{inventory.sku}" if inventory.sku else None,
+                    copy.name,
+                )
+                for inventory, _, copy, copy_number in inventory_sources
+            ]
+        )
+        new_inventories = []
+        for (inventory, new_variant, _, _), sku in zip(inventory_sources, skus):
+            new_inventory = Inventory(
+                product_variant=new_variant,
+                sku=sku,
+                regular_price=inventory.regular_price,
+                sale_price=inventory.sale_price,
+                sale_price_dates_from=inventory.sale_price_dates_from,
+                sale_price_dates_to=inventory.sale_price_dates_to,
+                weight=inventory.weight,
+                unit=inventory.unit,
+                total_quantity=inventory.total_quantity,
+                bulking_price_rules=inventory.bulking_price_rules,
+            )
+            new_inventory.update_sale_active()
+            new_inventory.compile_price_tiers()
+            new_inventories.append(new_inventory)
+        new_inventories = Inventory.objects.bulk_create(
+            new_inventories, batch_size=BATCH_SIZE
+        )
+
+        copy_ids = [copy.pk for copy in copies]
+        refresh_search_documents(Product, copy_ids)
+        refresh_search_documents(
+            Inventory, [inventory.pk for inventory in new_inventories]
+        )
+        refresh_product_summaries(copy_ids)
+        catalog_cache.bump_versions("categories", "product-lists")
+        notify_new_products(copies)
+
+    return {
+        "duplicated_products": [
+            {"id": copy.pk, "name": copy.name, "source": source.pk}
+            for source, copy in zip(sources, copies)
+        ],
+        "created": {
+            "products": len(copies),
+            "categories": len(categories),
+            "sub_categories": len(sub_categories),
+            "seo": len(seo),
+            "images": len(images),
+            "variants": len(variants),
+            "inventories": len(new_inventories),
+        },
+    }
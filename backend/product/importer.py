@@ -0,0 +1,479 @@
+"""
+Streaming CSV/XLSX import and export of the product catalog.
+
+One row per inventory, keyed on SKU (see ``COLUMNS``). Imports run in the
+``product.tasks.import_products`` Celery task: rows are read lazily,
+validated in chunks of ``CHUNK_SIZE`` and upserted with a fixed number of
+statements per chunk. Products are matched on name, inventories on SKU
+(``bulk_create(update_conflicts=True)``). For an existing SKU only the
+columns present in the row are changed; blank cells keep the stored value.
+Categories and sub categories are added to a product, never removed.
+
+Exports walk the inventories with ``.iterator()`` and yield rows one at a
+time, so neither side holds the catalog in memory.
+"""
+
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime
+from itertools import islice
+
+import openpyxl
+from django.db import DatabaseError, transaction
+from django.utils.timezone import now
+
+from notification.signals import notify_new_products
+from product import cache as catalog_cache
+from product.models import (
+    Category,
+    Inventory,
+    Product,
+    ProductImportJob,
+    ProductVariant,
+    SubCategory,
+    default_bulking_price_rules,
+)
+from product.search import refresh_search_documents
+from product.serializers import ProductImportRowSerializer
+from product.summary import refresh_product_summaries
+
+CHUNK_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 500
+
+COLUMNS = [
+    "sku",
+    "name",
+    "description",
+    "categories",
+    "sub_categories",
+    "tags",
+    "status",
+    "is_active",
+    "hot_deal",
+    "min_order_quantity",
+    "variant_description",
+    "enabled",
+    "managed_stock",
+    "allow_backorders",
+    "regular_price",
+    "sale_price",
+    "sale_price_dates_from",
+    "sale_price_dates_to",
+    "weight",
+    "unit",
+    "total_quantity",
+    "bulking_price_rules",
+]
+
+# Column -> model attribute, per model written by an import.
+PRODUCT_COLUMNS = {
+    "description": "description",
+    "tags": "product_tag",
+    "status": "status",
+    "is_active": "is_active",
+    "hot_deal": "hot_deal",
+    "min_order_quantity": "min_order_quantity",
+}
+VARIANT_COLUMNS = {
+    "variant_description": "description",
+    "enabled": "enabled",
+    "managed_stock": "managed_stock",
+    "allow_backorders": "allow_backorders",
+}
+INVENTORY_COLUMNS = {
+    "regular_price": "regular_price",
+    "sale_price": "sale_price",
+    "sale_price_dates_from": "sale_price_dates_from",
+    "sale_price_dates_to": "sale_price_dates_to",
+    "weight": "weight",
+    "unit": "unit",
+    "total_quantity": "total_quantity",
+    "bulking_price_rules": "bulking_price_rules",
+}
+
+
+def clean_cell(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def clean_row(row):
+    """Drop blank cells and unknown columns; blank means "keep" on update."""
+    cleaned = {}
+    for column, value in row.items():
+        value = clean_cell(value)
+        if column in COLUMNS and value not in (None, ""):
+            cleaned[column] = value
+    return cleaned
+
+
+def read_csv(file):
+    reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    header = [str(column or "").strip().lower() for column in next(reader, [])]
+    for values in reader:
+        yield dict(zip(header, values))
+
+
+def read_xlsx(file):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(column or "").strip().lower() for column in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+READERS = {
+    ProductImportJob.Format.CSV: read_csv,
+    ProductImportJob.Format.XLSX: read_xlsx,
+}
+
+
+def read_rows(job):
+    """Yield ``(row_number, row)``; row 1 is the header."""
+    with job.file.open("rb") as file:
+        for number, row in enumerate(READERS[job.file_format](file), start=2):
+            if any(value not in (None, "") for value in row.values()):
+                yield number, row
+
+
+def count_rows(job):
+    if job.file_format == ProductImportJob.Format.XLSX:
+        with job.file.open("rb") as file:
+            workbook = openpyxl.load_workbook(file, read_only=True)
+            max_row = workbook.active.max_row
+            workbook.close()
+        return max_row - 1 if max_row else None
+    return sum(1 for _ in read_rows(job))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def merge(values, data, provided, columns, existing):
+    """
+    Add the model values of ``columns`` to ``values``: provided cells win,
+    then the existing object's values, then the serializer defaults.
+    """
+    for column, attribute in columns.items():
+        if column in provided or existing is None:
+            if column in data:
+                values[attribute] = data[column]
+        else:
+            values[attribute] = getattr(existing, attribute)
+    return values
+
+
+def import_chunk(rows):
+    """
+    Validate and upsert one chunk of ``(row_number, row)`` pairs.
+
+    Returns ``(created, updated, errors)``; invalid rows are reported and
+    skipped, the rest of the chunk is still written.
+    """
+    errors = []
+    rows = [(number, clean_row(row)) for number, row in rows]
+    skus = {str(row["sku"]).lower() for _, row in rows if "sku" in row}
+    existing = {
+        inventory.sku.lower(): inventory
+        for inventory in Inventory.objects.filter(sku__in=skus).select_related(
+            "product_variant__product"
+        )
+    }
+
+    valid = {}
+    for number, row in rows:
+        sku = str(row.get("sku", "")).lower()
+        serializer = ProductImportRowSerializer(data=row, partial=sku in existing)
+        if not serializer.is_valid():
+            errors.append({"row": number, "errors": serializer.errors})
+            continue
+        if sku in valid:
+            errors.append(
+                {
+                    "row": valid[sku][0],
+                    "errors": {"sku": ["Duplicate SKU, replaced by a later row."]},
+                }
+            )
+        valid[sku] = (number, serializer.validated_data, set(row))
+
+    category_names = set()
+    sub_category_names = set()
+    for _, data, _ in valid.values():
+        category_names.update(name.lower() for name in data.get("categories", []))
+        sub_category_names.update(
+            name.lower() for name in data.get("sub_categories", [])
+        )
+    categories = dict(
+        Category.objects.filter(name__in=category_names).values_list("name", "pk")
+    )
+    sub_categories = dict(
+        SubCategory.objects.filter(name__in=sub_category_names).values_list(
+            "name", "pk"
+        )
+    )
+    for sku, (number, data, _) in list(valid.items()):
+        unknown = {
+            field: [f"Unknown name: {name}"]
+            for field, lookup in (
+                ("categories", categories),
+                ("sub_categories", sub_categories),
+            )
+            for name in data.get(field, [])
+            if name.lower() not in lookup
+        }
+        if unknown:
+            errors.append({"row": number, "errors": unknown})
+            del valid[sku]
+
+    if not valid:
+        return 0, 0, errors
+
+    # Product each row belongs to: the named one, else the SKU's current one.
+    for sku, (number, data, provided) in valid.items():
+        if "name" not in data:
+            data["name"] = existing[sku].product_variant.product.name
+    names = {data["name"].lower() for _, data, _ in valid.values()}
+    products = {
+        product.name.lower(): product
+        for product in Product.objects.filter(name__in=names)
+    }
+
+    with transaction.atomic():
+        product_rows = {}
+        for _, data, provided in valid.values():
+            name = data["name"].lower()
+            product_rows[name] = merge(
+                product_rows.get(name, {"name": data["name"]}),
+                data,
+                provided,
+                PRODUCT_COLUMNS,
+                products.get(name),
+            )
+        upserted = Product.objects.bulk_create(
+            [Product(**values) for values in product_rows.values()],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=list(PRODUCT_COLUMNS.values()),
+        )
+        product_ids = {product.name.lower(): product.pk for product in upserted}
+
+        new_variants = {}
+        moved_variants = []  # Existing variants, possibly moved to another product
+        for sku, (_, data, provided) in valid.items():
+            inventory = existing.get(sku)
+            product_id = product_ids[data["name"].lower()]
+            if inventory is None:
+                new_variants[sku] = ProductVariant(
+                    **merge(
+                        {"product_id": product_id},
+                        data,
+                        provided,
+                        VARIANT_COLUMNS,
+                        None,
+                    )
+                )
+                continue
+            variant = inventory.product_variant
+            values = merge({}, data, provided, VARIANT_COLUMNS, variant)
+            for attribute, value in values.items():
+                setattr(variant, attribute, value)
+            variant.product_id = product_id
+            moved_variants.append(variant)
+        ProductVariant.objects.bulk_create(new_variants.values(), batch_size=CHUNK_SIZE)
+        ProductVariant.objects.bulk_update(
+            moved_variants, ["product"] + list(VARIANT_COLUMNS.values())
+        )
+
+        inventories = []
+        for sku, (_, data, provided) in valid.items():
+            current = existing.get(sku)
+            values = merge(
+                {"sku": data.get("sku", sku).upper()},
+                data,
+                provided,
+                INVENTORY_COLUMNS,
+                current,
+            )
+            values.setdefault("bulking_price_rules", default_bulking_price_rules())
+            if current is None:
+                values["product_variant"] = new_variants[sku]
+            else:
+                values["product_variant_id"] = current.product_variant_id
+            inventory = Inventory(**values)
+            inventory.update_sale_active()
+            inventory.compile_price_tiers()
+            inventories.append(inventory)
+        inventories = Inventory.objects.bulk_create(
+            inventories,
+            update_conflicts=True,
+            unique_fields=["sku"],
+            update_fields=list(INVENTORY_COLUMNS.values())
+            + ["sale_active", "price_tiers"],
+        )
+
+        product_links = []
+        sub_category_links = []
+        for _, data, _ in valid.values():
+            product_id = product_ids[data["name"].lower()]
+            product_links += [
+                Product.category.through(
+                    product_id=product_id, category_id=categories[name.lower()]
+                )
+                for name in data.get("categories", [])
+            ]
+            sub_category_links += [
+                Product.sub_category.through(
+                    product_id=product_id,
+                    subcategory_id=sub_categories[name.lower()],
+                )
+                for name in data.get("sub_categories", [])
+            ]
+        Product.category.through.objects.bulk_create(
+            product_links, ignore_conflicts=True
+        )
+        Product.sub_category.through.objects.bulk_create(
+            sub_category_links, ignore_conflicts=True
+        )
+
+        # Variants moved to another product leave their old one changed too.
+        touched = set(product_ids.values()) | {
+            existing[sku].product_variant.product_id for sku in valid if sku in existing
+        }
+        refresh_search_documents(Product, touched)
+        refresh_search_documents(Inventory, [inventory.pk for inventory in inventories])
+        refresh_product_summaries(touched)
+        catalog_cache.bump_versions(
+            "categories",
+            "product-lists",
+            *[catalog_cache.product_scope(product_id) for product_id in touched],
+        )
+        # The upsert sends no post_save: notify the products it created.
+        notify_new_products(
+            [product for product in upserted if product.name.lower() not in products]
+        )
+
+    updated = sum(1 for sku in valid if sku in existing)
+    return len(valid) - updated, updated, errors
+
+
+def run_import(job, chunk_size=CHUNK_SIZE):
+    """Import ``job``'s file chunk by chunk, saving progress after each one."""
+    job.status = ProductImportJob.Status.RUNNING
+    job.total_rows = count_rows(job)
+    job.save(update_fields=["status", "total_rows", "updated_at"])
+
+    progress_fields = [
+        "processed_rows",
+        "created_count",
+        "updated_count",
+        "error_count",
+        "errors",
+        "updated_at",
+    ]
+    for chunk in chunked(read_rows(job), chunk_size):
+        try:
+            created, updated, errors = import_chunk(chunk)
+        except DatabaseError as e:
+            created, updated = 0, 0
+            errors = [
+                {"rows": [chunk[0][0], chunk[-1][0]], "errors": {"chunk": [str(e)]}}
+            ]
+        job.processed_rows += len(chunk)
+        job.created_count += created
+        job.updated_count += updated
+        job.error_count += len(errors)
+        job.errors += errors[: MAX_REPORTED_ERRORS - len(job.errors)]
+        job.save(update_fields=progress_fields)
+
+    job.status = ProductImportJob.Status.COMPLETED
+    job.finished_at = now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
+    return job
+
+
+def format_cell(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if value is None:
+        return ""
+    return str(value)
+
+
+def export_rows():
+    """Yield the header and then one row per inventory, ``COLUMNS`` order."""
+    yield COLUMNS
+    inventories = (
+        Inventory.objects.filter(product_variant__product__is_deleted=False)
+        .select_related("product_variant__product")
+        .prefetch_related(
+            "product_variant__product__category",
+            "product_variant__product__sub_category",
+        )
+        .order_by("pk")
+    )
+    for inventory in inventories.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        variant = inventory.product_variant
+        product = variant.product
+        values = {
+            "sku": inventory.sku.upper() if inventory.sku else "",
+            "name": product.name,
+            "categories": "|".join(
+                category.name for category in product.category.all()
+            ),
+            "sub_categories": "|".join(
+                sub_category.name for sub_category in product.sub_category.all()
+            ),
+            "tags": "|".join(product.product_tag),
+        }
+        for columns, instance in (
+            (PRODUCT_COLUMNS, product),
+            (VARIANT_COLUMNS, variant),
+            (INVENTORY_COLUMNS, inventory),
+        ):
+            for column, attribute in columns.items():
+                values.setdefault(column, getattr(instance, attribute))
+        yield [format_cell(values[column]) for column in COLUMNS]
+
+
+class Echo:
+    """File-like object whose ``write`` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv():
+    writer = csv.writer(Echo())
+    for row in export_rows():
+        yield writer.writerow(row)
+
+
+def write_xlsx():
+    """
+    Write the export to a temporary file with openpyxl's write-only mode,
+    which flushes rows to disk as they come, and return the open file.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("products")
+    for row in export_rows():
+        sheet.append(row)
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file
@@ -0,0 +1,196 @@
+"""
+Printable barcode label sheets.
+
+Labels are laid out on A4 pages in a ``COLUMNS`` x ``ROWS`` grid. Each
+distinct EAN-13 code is rendered once per process with a single shared
+``ImageWriter`` and pasted onto every label that carries it, so a series of
+2,000 labels for one SKU renders one barcode. Pages are composed in a
+process pool when there are several of them and encoded as one multi-page
+PDF, or as PNG pages.
+
+The pool is created once per web process with at most
+``settings.BARCODE_SHEET_WORKERS`` workers. They are started with ``spawn``
+instead of ``fork``, so they do not inherit the parent's threads or database
+connections, and only import this module.
+"""
+
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from io import BytesIO
+
+import barcode
+from barcode.writer import ImageWriter
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+DPI = 200
+PAGE_SIZE = (1654, 2339)  # A4 at 200 DPI
+MARGIN = 60
+COLUMNS = 3
+ROWS = 8
+LABELS_PER_PAGE = COLUMNS * ROWS
+CAPTION_HEIGHT = 56
+MAX_LABELS = 5000
+
+executor = None
+executor_lock = threading.Lock()
+
+WRITER = ImageWriter()
+WRITER_OPTIONS = {"module_height": 8, "font_size": 7, "quiet_zone": 2, "dpi": DPI}
+
+
+@lru_cache(maxsize=1024)
+def barcode_image(code):
+    """The PIL image of ``code``, rendered once per process."""
+    return barcode.get("ean13", code, writer=WRITER).render(WRITER_OPTIONS)
+
+
+@lru_cache(maxsize=None)
+def caption_font():
+    return ImageFont.load_default(size=22)
+
+
+def label_size():
+    width = (PAGE_SIZE[0] - 2 * MARGIN) // COLUMNS
+    height = (PAGE_SIZE[1] - 2 * MARGIN) // ROWS
+    return width, height
+
+
+@lru_cache(maxsize=1024)
+def fitted_barcode(code):
+    """``code``'s barcode scaled to fit a label above its caption."""
+    width, height = label_size()
+    image = barcode_image(code).convert("L")
+    image.thumbnail((width - 20, height - CAPTION_HEIGHT - 10))
+    return image.convert("1", dither=Image.Dither.NONE)
+
+
+def render_page(labels):
+    """
+    Compose one page from ``(code, caption)`` pairs. Pages are 1-bit, which
+    keeps bars sharp and lets the PDF use CCITT instead of JPEG compression.
+    """
+    page = Image.new("1", PAGE_SIZE, 1)
+    draw = ImageDraw.Draw(page)
+    width, height = label_size()
+    font = caption_font()
+    for index, (code, caption) in enumerate(labels):
+        column, row = index % COLUMNS, index // COLUMNS
+        left = MARGIN + column * width
+        top = MARGIN + row * height
+        image = fitted_barcode(code)
+        page.paste(image, (left + (width - image.width) // 2, top + 5))
+        caption_top = top + image.height + 15
+        for line_number, line in enumerate(caption.splitlines()[:2]):
+            draw.text(
+                (left + width // 2, caption_top + line_number * 26),
+                line,
+                fill=0,
+                font=font,
+                anchor="ma",
+            )
+    return page
+
+
+def render_page_png(labels):
+    """``render_page`` encoded as PNG; what the worker processes return."""
+    buffer = BytesIO()
+    render_page(labels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def get_executor():
+    """The process pool shared by every sheet rendered in this process."""
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ProcessPoolExecutor(
+                max_workers=settings.BARCODE_SHEET_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return executor
+
+
+def discard_executor(broken):
+    global executor
+    with executor_lock:
+        if executor is broken:
+            executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def render_pages(labels, workers=None):
+    """
+    Render the pages of ``labels``, in the shared pool when there are several
+    (in this process when ``workers`` or ``BARCODE_SHEET_WORKERS`` is 1 or 0).
+    """
+    pages = [
+        labels[start : start + LABELS_PER_PAGE]
+        for start in range(0, len(labels), LABELS_PER_PAGE)
+    ]
+    if workers is None:
+        workers = settings.BARCODE_SHEET_WORKERS
+    if len(pages) > 1 and workers > 1:
+        pool = get_executor()
+        try:
+            return [
+                Image.open(BytesIO(content))
+                for content in pool.map(render_page_png, pages)
+            ]
+        except BrokenProcessPool:
+            # A worker died; the next sheet gets a fresh pool.
+            discard_executor(pool)
+    return [render_page(page) for page in pages]
+
+
+def render_sheet(labels, output="pdf", workers=None):
+    """
+    Return ``(content, content_type, extension)`` for ``labels``: a
+    multi-page PDF, a PNG for a single page or a ZIP of PNG pages.
+    """
+    pages = render_pages(labels, workers)
+    buffer = BytesIO()
+    if output == "pdf":
+        pages[0].save(
+            buffer,
+            format="PDF",
+            save_all=True,
+            append_images=pages[1:],
+            resolution=DPI,
+        )
+        return buffer.getvalue(), "application/pdf", "pdf"
+    if len(pages) == 1:
+        pages[0].save(buffer, format="PNG")
+        return buffer.getvalue(), "image/png", "png"
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for number, page in enumerate(pages, start=1):
+            page_buffer = BytesIO()
+            page.save(page_buffer, format="PNG")
+            archive.writestr(f"labels-{number:03}.png", page_buffer.getvalue())
+    return buffer.getvalue(), "application/zip", "zip"
+
+
+def inventory_labels(inventories, copies=1):
+    """One label (times ``copies``) per inventory, captioned with its SKU."""
+    return [
+        (
+            inventory.unique_code,
+            f"{inventory.product_variant.product.name}\n{inventory.sku.upper()}",
+        )
+        for inventory in inventories
+        for _ in range(copies)
+    ]
+
+
+def series_labels(inventory, start, end):
+    """One label per unit numbered ``start`` to ``end`` of an inventory."""
+    name = inventory.product_variant.product.name
+    sku = inventory.sku.upper()
+    return [
+        (inventory.unique_code, f"{name}\n{sku} #{number}")
+        for number in range(start, end + 1)
+    ]
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from product.barcodes import prerender_missing_barcodes
+
+
+class Command(BaseCommand):
+    help = "Render and store the missing inventory and raw material barcodes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of rendering processes (defaults to the CPU count; "
+            "1 renders in this process)",
+        )
+
+    def handle(self, *args, **kwargs):
+        rendered = prerender_missing_barcodes(workers=kwargs["workers"])
+        for label, count in rendered.items():
+            self.stdout.write(f"{label}: {count} rendered")
+        self.stdout.write(self.style.SUCCESS("Barcodes pre-rendered."))
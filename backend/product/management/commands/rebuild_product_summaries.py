@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from product.summary import rebuild_product_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the price, stock and popularity summary of every product"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of products recomputed per query",
+        )
+
+    def handle(self, *args, **kwargs):
+        rebuild_product_summaries(batch_size=kwargs["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Product summaries rebuilt."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from product.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search documents of categories, products and inventories"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of rows refreshed per query",
+        )
+
+    def handle(self, *args, **kwargs):
+        rebuild_search_index(batch_size=kwargs["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,178 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:08
+
+import re
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+SEARCH_CONFIG = "simple"
+BATCH_SIZE = 500
+
+
+def normalize_search_text(*values):
+    # Frozen copy of ``product.search.normalize_search_text``.
+    text = " ".join(str(value) for value in values if value not in (None, ""))
+    return re.sub(r"[-_/]+", " ", text.lower()).strip()
+
+
+def category_document(category):
+    return normalize_search_text(category.slug, category.description)
+
+
+def product_document(product):
+    inventories = sorted(
+        (
+            variant.inventory_items
+            for variant in product.variants.all()
+            if getattr(variant, "inventory_items", None) is not None
+        ),
+        key=lambda inventory: inventory.pk,
+    )
+    return normalize_search_text(
+        product.status,
+        product.min_order_quantity,
+        *(product.product_tag or []),
+        *[category.name for category in product.category.all()],
+        *[sub_category.name for sub_category in product.sub_category.all()],
+        *[inventory.sku for inventory in inventories],
+        *[inventory.regular_price for inventory in inventories],
+    )
+
+
+def inventory_document(inventory):
+    return normalize_search_text(
+        inventory.product_variant.product.name,
+        inventory.regular_price,
+        inventory.weight,
+        inventory.unit,
+        inventory.total_quantity,
+    )
+
+
+def build_search_documents(apps, schema_editor):
+    # Works on the historical models so later schema changes cannot break it;
+    # ``manage.py rebuild_search_index`` rebuilds the same documents with the
+    # live code.
+    Category = apps.get_model("product", "Category")
+    SubCategory = apps.get_model("product", "SubCategory")
+    Product = apps.get_model("product", "Product")
+    Inventory = apps.get_model("product", "Inventory")
+
+    documents = [
+        (Category, "name", Category.objects.all(), category_document),
+        (SubCategory, "name", SubCategory.objects.all(), category_document),
+        (
+            Product,
+            "name",
+            Product.objects.prefetch_related(
+                "category", "sub_category", "variants__inventory_items"
+            ),
+            product_document,
+        ),
+        (
+            Inventory,
+            "sku",
+            Inventory.objects.select_related("product_variant__product"),
+            inventory_document,
+        ),
+    ]
+    for model, weighted_field, queryset, build_document in documents:
+        batch = []
+        for instance in queryset.order_by("pk").iterator(chunk_size=BATCH_SIZE):
+            instance.search_document = build_document(instance)
+            batch.append(instance)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(batch, ["search_document"])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["search_document"])
+        model.objects.update(
+            search_vector=SearchVector(weighted_field, weight="A", config=SEARCH_CONFIG)
+            + SearchVector("search_document", weight="B", config=SEARCH_CONFIG)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0077_alter_category_updated_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="inventory",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="inventory",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="subcategory",
+            name="search_document",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="subcategory",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="category_search_vector_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inventory",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="inventory_search_vector_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="product_search_vector_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="subcategory",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="subcategory_search_vector_gin"
+            ),
+        ),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
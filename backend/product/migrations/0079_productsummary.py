@@ -0,0 +1,91 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def build_product_summaries(apps, schema_editor):
+    # Works on the historical models so later schema changes cannot break it;
+    # ``manage.py rebuild_product_summaries`` rebuilds the same rows with the
+    # live code.
+    Product = apps.get_model("product", "Product")
+    ProductSummary = apps.get_model("product", "ProductSummary")
+
+    products = Product.objects.annotate(
+        min_regular_price=Min("variants__inventory_items__regular_price"),
+        min_total_quantity=Min("variants__inventory_items__total_quantity"),
+        first_variant_created_at=Min("variants__inventory_items__created_at"),
+        order_count=Count("variants__order_items"),
+    ).values_list(
+        "pk",
+        "min_regular_price",
+        "min_total_quantity",
+        "first_variant_created_at",
+        "order_count",
+    )
+    ProductSummary.objects.bulk_create(
+        (
+            ProductSummary(
+                product_id=pk,
+                min_regular_price=min_regular_price,
+                min_total_quantity=min_total_quantity,
+                first_variant_created_at=first_variant_created_at,
+                order_count=order_count,
+            )
+            for (
+                pk,
+                min_regular_price,
+                min_total_quantity,
+                first_variant_created_at,
+                order_count,
+            ) in products.order_by("pk").iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0032_alter_invoice_due_date"),
+        ("product", "0078_search_documents"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSummary",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="product.product",
+                    ),
+                ),
+                (
+                    "min_regular_price",
+                    models.DecimalField(
+                        blank=True,
+                        db_index=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                    ),
+                ),
+                (
+                    "min_total_quantity",
+                    models.IntegerField(blank=True, db_index=True, null=True),
+                ),
+                (
+                    "first_variant_created_at",
+                    models.DateTimeField(blank=True, db_index=True, null=True),
+                ),
+                ("order_count", models.PositiveIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.RunPython(build_product_summaries, migrations.RunPython.noop),
+    ]
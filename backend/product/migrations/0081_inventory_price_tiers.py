@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+def compile_existing_price_tiers(apps, schema_editor):
+    from product.price_tiers import compile_price_tiers
+
+    Inventory = apps.get_model("product", "Inventory")
+    inventories = list(Inventory.objects.only("pk", "bulking_price_rules"))
+    for inventory in inventories:
+        inventory.price_tiers = compile_price_tiers(inventory.bulking_price_rules)
+    Inventory.objects.bulk_update(inventories, ["price_tiers"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0080_productimportjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="inventory",
+            name="price_tiers",
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(compile_existing_price_tiers, migrations.RunPython.noop),
+    ]
@@ -4,23 +4,21 @@ import re
 import uuid
 from datetime import datetime
 from enum import Enum
-from io import BytesIO
 from typing import Any
 
-import barcode
-from barcode.writer import ImageWriter
 from ckeditor.fields import RichTextField
 from django.contrib.postgres.fields import ArrayField
-from django.core.files.base import ContentFile
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.db.models import UniqueConstraint
 from django.utils.text import slugify
 from django.utils.timezone import now
-from PIL import Image
 
 from account.models import BaseModel
 from account.models import CustomUser as User
 from product.fields import CaseInsensitiveCharField
+from product.price_tiers import compile_price_tiers
 
 
 def default_bulking_price_rules():
@@ -54,6 +52,13 @@ class Category(BaseModel):
         upload_to="category/images", null=True, blank=True
     )
     is_deleted = models.BooleanField(default=False)
+    search_document = models.TextField(blank=True, default="", editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="category_search_vector_gin"),
+        ]
 
     def save(self, *args, **kwargs):
         self.name = self.name.lower()
@@ -112,6 +117,13 @@ class SubCategory(BaseModel):
     )
     is_active = models.BooleanField(default=True)
     is_deleted = models.BooleanField(default=False)
+    search_document = models.TextField(blank=True, default="", editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="subcategory_search_vector_gin"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -207,6 +219,13 @@ class Product(BaseModel):
     )
     is_deleted = models.BooleanField(default=False)
     hot_deal = models.BooleanField(default=False)
+    search_document = models.TextField(blank=True, default="", editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="product_search_vector_gin"),
+        ]
 
     def __str__(self):
         return f"{self.name}"
@@ -239,10 +258,30 @@ class Product(BaseModel):
             },
         }
 
+    def get_variant_inventories(self):
+        """
+        Return the inventories of this product ordered by id.
+
+        Served from the prefetched ``variants`` (with ``inventory_items``
+        selected) when the caller attached them, so listing pages do not run
+        a query per product.
+        """
+        if "variants" in getattr(self, "_prefetched_objects_cache", {}):
+            inventories = [
+                variant.inventory_items
+                for variant in self.variants.all()
+                if getattr(variant, "inventory_items", None) is not None
+            ]
+            return sorted(inventories, key=lambda inventory: inventory.pk)
+        return list(
+            Inventory.objects.filter(product_variant__product=self)
+            .select_related("product_variant")
+            .order_by("pk")
+        )
+
     def get_inventory_data(self):
-        inventory_detail = Inventory.objects.filter(
-            product_variant__product__id=self.id
-        ).first()
+        inventories = self.get_variant_inventories()
+        inventory_detail = inventories[0] if inventories else None
         if inventory_detail:
             inventory = {
                 "sku": inventory_detail.sku,
@@ -270,9 +309,7 @@ class Product(BaseModel):
     def get_variants_data(self):
         variants = []
 
-        inventories = Inventory.objects.filter(product_variant__product=self)
-
-        for inventory in inventories:
+        for inventory in self.get_variant_inventories():
             variants.append(
                 {
                     "enabled": getattr(inventory.product_variant, "enabled", None),
@@ -348,23 +385,27 @@ class Inventory(BaseModel):
     )
     barcode = models.ImageField(upload_to="barcodes/", null=True, blank=True)
     bulking_price_rules = models.JSONField(default=default_bulking_price_rules)
+    price_tiers = models.JSONField(default=list, blank=True, editable=False)
     start_series = models.IntegerField(null=True, blank=True)
     end_series = models.IntegerField(null=True, blank=True)
     total_quantity = models.IntegerField(default=1)
     unique_code = models.CharField(max_length=100, unique=True, blank=True, null=True)
     sale_active = models.BooleanField(default=False)
+    search_document = models.TextField(blank=True, default="", editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="inventory_search_vector_gin"),
+        ]
 
     def __str__(self):
-        if not self.barcode:
-            self.generate_barcode()
         return f"Inventory for {self.sku}"
 
-    def generate_sku(self):
-        """Generate a unique SKU based on the product name,
-        timestamp, and ensure uppercase."""
-        product_name = (
-            self.product_variant.product.name
-        )  # Assuming `ProductVariant` has a `product` FK
+    @staticmethod
+    def build_sku(product_name):
+        """Build an SKU candidate from the product name and the current time;
+        uniqueness is left to the caller."""
         clean_name = re.sub(r"[^a-zA-Z0-9]", "", product_name).upper()[
             :4
         ]  # Remove special chars & limit length
@@ -374,11 +415,19 @@ class Inventory(BaseModel):
         base_sku = (
             f"{clean_name}-{timestamp}-{unique_id}"  # Example: "BRED-240212153045-1A2B"
         )
+        return base_sku
+
+    def generate_sku(self):
+        """Generate a unique SKU based on the product name,
+        timestamp, and ensure uppercase."""
+        product_name = (
+            self.product_variant.product.name
+        )  # Assuming `ProductVariant` has a `product` FK
+        base_sku = self.build_sku(product_name)
 
         # Ensure SKU is unique
         while Inventory.objects.filter(sku=base_sku).exists():
-            unique_id = uuid.uuid4().hex[:4].upper()
-            base_sku = f"{clean_name}-{timestamp}-{unique_id}"
+            base_sku = self.build_sku(product_name)
 
         return base_sku
 
@@ -397,6 +446,10 @@ class Inventory(BaseModel):
             start_sale and end_sale and (start_sale <= current_date <= end_sale)
         )
 
+    def compile_price_tiers(self):
+        """Compile `bulking_price_rules` into `price_tiers`; see product.price_tiers."""
+        self.price_tiers = compile_price_tiers(self.bulking_price_rules)
+
     def save(self, *args, **kwargs):
         """Ensure a unique uppercase SKU is generated if missing."""
         if not self.sku or self.sku.lower() == "none":  # ✅ Fix "none" issue
@@ -404,6 +457,10 @@ class Inventory(BaseModel):
         else:
             self.sku = self.sku.upper()  # ✅ Ensure existing SKU is stored in uppercase
         self.update_sale_active()
+        self.compile_price_tiers()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "bulking_price_rules" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "price_tiers"}
 
         super().save(*args, **kwargs)
 
@@ -429,32 +486,12 @@ class Inventory(BaseModel):
 
     def generate_barcode(self):
         """
-        Generate a barcode image using the unique 13-digit EAN-13 code,
-        including SKU and quantity details.
+        Return the storage name of the EAN-13 barcode image, rendering it
+        on first use (see ``product.barcodes``).
         """
-        if not self.unique_code:
-            self.unique_code = self.generate_unique_code()
-            self.save()
-
-        # Ensure unique_code is 13 digits
-        if len(self.unique_code) != 13 or not self.unique_code.isdigit():
-            raise ValueError("The unique code must be a 13-digit numeric string.")
-
-        # Generate the barcode using EAN-13 format
-        barcode_format = barcode.get("ean13", self.unique_code, writer=ImageWriter())
-        buffer = BytesIO()
-        barcode_format.write(buffer)
-        buffer.seek(0)
-
-        # Convert buffer to an image
-        img = Image.open(buffer)
-        output_buffer = BytesIO()
-        img.save(output_buffer, format="PNG")
-        output_buffer.seek(0)
-
-        # Save barcode image to model field
-        file_name = f"{self.unique_code}.png"
-        self.barcode.save(file_name, ContentFile(output_buffer.read()), save=False)
+        from product.barcodes import get_barcode
+
+        return get_barcode(self)
 
     def calculate_total_quantity(self):
         """Calculate total quantity from bulking price rules."""
@@ -464,6 +501,31 @@ class Inventory(BaseModel):
         return total_quantity
 
 
+class ProductSummary(models.Model):
+    """
+    Per-product aggregates used by the product listing sort modes.
+
+    Maintained incrementally by ``product.signals`` (see ``product.summary``)
+    so sorting by price, stock, age or popularity reads an indexed column
+    instead of aggregating variants, inventories and order items per request.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="summary"
+    )
+    min_regular_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, db_index=True
+    )
+    min_total_quantity = models.IntegerField(null=True, blank=True, db_index=True)
+    first_variant_created_at = models.DateTimeField(
+        null=True, blank=True, db_index=True
+    )
+    order_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"Summary for {self.product_id}"
+
+
 class ProductImage(BaseModel):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="images"
@@ -548,8 +610,6 @@ class ProductMaterial(BaseModel):
     unique_code = models.CharField(max_length=100, unique=True, blank=True, null=True)
 
     def __str__(self):
-        if not self.barcode:
-            self.generate_barcode()
         return f"{self.name}"
 
     def needs_reorder(self):
@@ -587,32 +647,12 @@ class ProductMaterial(BaseModel):
 
     def generate_barcode(self):
         """
-        Generate a barcode image using the unique 13-digit EAN-13 code,
-        including SKU and quantity details.
+        Return the storage name of the EAN-13 barcode image, rendering it
+        on first use (see ``product.barcodes``).
         """
-        if not self.unique_code:
-            self.unique_code = self.generate_unique_code()
-            self.save()
-
-        # Ensure unique_code is 13 digits
-        if len(self.unique_code) != 13 or not self.unique_code.isdigit():
-            raise ValueError("The unique code must be a 13-digit numeric string.")
-
-        # Generate the barcode using EAN-13 format
-        barcode_format = barcode.get("ean13", self.unique_code, writer=ImageWriter())
-        buffer = BytesIO()
-        barcode_format.write(buffer)
-        buffer.seek(0)
-
-        # Convert buffer to an image
-        img = Image.open(buffer)
-        output_buffer = BytesIO()
-        img.save(output_buffer, format="PNG")
-        output_buffer.seek(0)
-
-        # Save barcode image to model field
-        file_name = f"{self.unique_code}.png"
-        self.barcode.save(file_name, ContentFile(output_buffer.read()), save=False)
+        from product.barcodes import get_barcode
+
+        return get_barcode(self)
 
     def generate_unique_name(self):
         base_name = self.name
@@ -638,3 +678,43 @@ class FavouriteItem(BaseModel):
     def __str__(self) -> str:
         user_email = self.user.email if self.user else "Anonymous"
         return f"{user_email}"
+
+
+class ProductImportJob(BaseModel):
+    """
+    A CSV/XLSX catalog import processed in chunks by the
+    ``product.tasks.import_products`` Celery task (see ``product.importer``).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        XLSX = "xlsx", "XLSX"
+
+    file = models.FileField(upload_to="product_imports/")
+    file_format = models.CharField(max_length=10, choices=Format.choices)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    created_by = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="product_imports",
+    )
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Product import {self.pk} ({self.status})"
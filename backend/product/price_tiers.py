@@ -0,0 +1,72 @@
+"""
+Bulk price tiers.
+
+``Inventory.bulking_price_rules`` is free-form JSON edited from the admin
+panel: ``[{"quantity_from": 1, "quantity_to": 10, "price": "550.00"}, ...]``.
+Each time an inventory is saved the rules are compiled into
+``Inventory.price_tiers``: ``[quantity_from, quantity_to, price]`` rows
+sorted by ``quantity_to``, with placeholder and malformed rules dropped and,
+when several rules end at the same quantity, only the one with the lowest
+``quantity_from`` kept. Pricing then bisects the table instead of
+re-validating and re-sorting the JSON on every lookup.
+
+A tier's price is the price of a line of exactly ``quantity_to`` units, as
+the cart has always charged it; ``cart.pricing`` prices every other quantity
+at the sale or regular price.
+"""
+
+from bisect import bisect_left
+from decimal import Decimal, InvalidOperation
+
+
+def parse_quantity(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        quantity = int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity >= 0 else None
+
+
+def parse_price(value):
+    try:
+        price = Decimal(str(value).strip())
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def compile_price_tiers(rules):
+    """Compile ``bulking_price_rules`` into a table sorted by ``quantity_to``."""
+    if not isinstance(rules, list):
+        return []
+    tiers = []
+    for rule in rules:
+        if not isinstance(rule, dict):
+            continue
+        quantity_from = parse_quantity(rule.get("quantity_from"))
+        quantity_to = parse_quantity(rule.get("quantity_to"))
+        price = parse_price(rule.get("price"))
+        if quantity_from is None or quantity_to is None or price is None:
+            continue
+        # The default rule is all zeros.
+        if quantity_to == 0:
+            continue
+        tiers.append((quantity_from, quantity_to, price))
+
+    compiled = {}
+    for quantity_from, quantity_to, price in sorted(tiers, key=lambda t: t[:2]):
+        compiled.setdefault(quantity_to, [quantity_from, quantity_to, str(price)])
+    return [compiled[quantity_to] for quantity_to in sorted(compiled)]
+
+
+def resolve_tier_price(tiers, quantity):
+    """
+    The price of a line of ``quantity`` units under a compiled table: that of
+    the tier ending at ``quantity``, or ``None`` when no tier does.
+    """
+    index = bisect_left(tiers, quantity, key=lambda tier: tier[1])
+    if index < len(tiers) and tiers[index][1] == quantity:
+        return Decimal(tiers[index][2])
+    return None
@@ -0,0 +1,150 @@
+"""
+Precomputed search documents for the catalog.
+
+Every searchable model (category, sub category, product and inventory) keeps
+a denormalized ``search_document`` with the text its listing used to match
+through joins, and a ``search_vector`` built from it with the row's name
+weighted above the rest. The vectors are GIN indexed, so a search is a single
+index lookup instead of ``icontains``/``iregex`` scans across joined tables.
+
+Documents are refreshed by the signals in ``product.signals`` and can be
+rebuilt for the whole catalog with ``manage.py rebuild_search_index``.
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F
+
+from product.models import Category, Inventory, Product, SubCategory
+
+SEARCH_CONFIG = "simple"
+
+# Separators inside SKUs and slugs ("BREA-2401-1A2B", "rye-bread") are turned
+# into spaces so every part is its own lexeme and can be prefix matched.
+SEPARATOR_PATTERN = re.compile(r"[-_/]+")
+TOKEN_PATTERN = re.compile(r"[\w.@]+")
+
+
+def normalize_search_text(*values):
+    """Join the non-empty values into one lower-cased, separator-free string."""
+    text = " ".join(str(value) for value in values if value not in (None, ""))
+    return SEPARATOR_PATTERN.sub(" ", text.lower()).strip()
+
+
+def category_search_document(category):
+    return normalize_search_text(category.slug, category.description)
+
+
+def product_search_document(product):
+    inventories = product.get_variant_inventories()
+    return normalize_search_text(
+        product.status,
+        product.min_order_quantity,
+        *product.product_tag,
+        *[category.name for category in product.category.all()],
+        *[sub_category.name for sub_category in product.sub_category.all()],
+        *[inventory.sku for inventory in inventories],
+        *[inventory.regular_price for inventory in inventories],
+    )
+
+
+def inventory_search_document(inventory):
+    return normalize_search_text(
+        inventory.product_variant.product.name,
+        inventory.regular_price,
+        inventory.weight,
+        inventory.unit,
+        inventory.total_quantity,
+    )
+
+
+# model -> (weighted field, document builder, related lookups for the builder)
+SEARCH_DOCUMENTS = {
+    Category: ("name", category_search_document, {}),
+    SubCategory: ("name", category_search_document, {}),
+    Product: (
+        "name",
+        product_search_document,
+        {"prefetch_related": ["category", "sub_category", "variants__inventory_items"]},
+    ),
+    Inventory: (
+        "sku",
+        inventory_search_document,
+        {"select_related": ["product_variant__product"]},
+    ),
+}
+
+
+def refresh_search_documents(model, pks):
+    """
+    Rebuild the search document and vector of the given rows of ``model``.
+
+    Documents are written with one ``bulk_update`` and the vectors with a
+    single ``UPDATE``; neither sends ``post_save``, so this is safe to call
+    from the signal handlers that keep the index current.
+    """
+    pks = {pk for pk in pks if pk is not None}
+    if not pks:
+        return
+
+    weighted_field, build_document, related = SEARCH_DOCUMENTS[model]
+    queryset = model.objects.filter(pk__in=pks)
+    if "select_related" in related:
+        queryset = queryset.select_related(*related["select_related"])
+    if "prefetch_related" in related:
+        queryset = queryset.prefetch_related(*related["prefetch_related"])
+
+    instances = list(queryset)
+    for instance in instances:
+        instance.search_document = build_document(instance)
+    model.objects.bulk_update(instances, ["search_document"])
+
+    model.objects.filter(pk__in=pks).update(
+        search_vector=SearchVector(weighted_field, weight="A", config=SEARCH_CONFIG)
+        + SearchVector("search_document", weight="B", config=SEARCH_CONFIG)
+    )
+
+
+def rebuild_search_index(batch_size=500):
+    """Refresh every searchable row, ``batch_size`` rows at a time."""
+    for model in SEARCH_DOCUMENTS:
+        pks = list(model.objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(pks), batch_size):
+            refresh_search_documents(model, pks[start : start + batch_size])
+
+
+def build_search_query(term):
+    """
+    Turn user input into a prefix-matching ``SearchQuery``.
+
+    Every word has to match the start of a lexeme, so "choc cak" finds
+    "Chocolate Cake" and "1a2b" finds the SKU "BREA-2401-1A2B". Returns
+    ``None`` when the term has nothing searchable in it.
+    """
+    tokens = [
+        token.strip(".")
+        for token in TOKEN_PATTERN.findall(normalize_search_text(term))
+        if token.strip(".")
+    ]
+    if not tokens:
+        return None
+    raw_query = " & ".join(f"'{token}':*" for token in tokens)
+    return SearchQuery(raw_query, search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_queryset(queryset, term, *ordering):
+    """
+    Filter ``queryset`` to rows matching ``term``, best matches first.
+
+    Rows are annotated with ``search_rank``; ``ordering`` breaks ties.
+    Callers that apply an explicit sort afterwards simply override it.
+    """
+    query = build_search_query(term)
+    if query is None:
+        return queryset.none()
+    return (
+        queryset.filter(search_vector=query)
+        .annotate(search_rank=SearchRank(F("search_vector"), query))
+        .order_by("-search_rank", *ordering)
+    )
@@ -9,10 +9,13 @@ from product.models import (
     Category,
     FavouriteItem,
     Inventory,
+    MeasurementUnit,
     Product,
     ProductImage,
+    ProductImportJob,
     ProductMaterial,
     ProductSeo,
+    ProductStatus,
     ProductVariant,
     SubCategory,
 )
@@ -81,10 +84,21 @@ class ProductVariantSerializer(serializers.ModelSerializer):
             "inventory",
         ]
 
+    def get_inventory_by_sku(self, sku):
+        """
+        Resolve the inventory of a ``product_detail`` variant row, preferring
+        the ``inventory_lookup`` built by ``get_product_listing_context``.
+        """
+        inventory_lookup = self.context.get("inventory_lookup", {})
+        if sku and sku.lower() in inventory_lookup:
+            return inventory_lookup[sku.lower()]
+        return Inventory.objects.filter(sku__iexact=sku).last()
+
     def get_inventory(self, obj):
         try:
             if isinstance(obj, ProductVariant):
-                inventory = Inventory.objects.filter(product_variant__id=obj.id).last()
+                # One-to-one, so this reads a select_related inventory.
+                inventory = getattr(obj, "inventory_items", None)
                 if inventory:
                     return {
                         "id": inventory.product_variant.id,
@@ -98,7 +112,7 @@ class ProductVariantSerializer(serializers.ModelSerializer):
                         "sale_price_dates_to": inventory.sale_price_dates_to,
                     }
             else:
-                inventory = Inventory.objects.filter(sku__iexact=obj.get("sku")).last()
+                inventory = self.get_inventory_by_sku(obj.get("sku"))
                 if inventory:
                     return {
                         "id": inventory.product_variant.id,
@@ -161,7 +175,7 @@ class ProductVariantSerializer(serializers.ModelSerializer):
 
             return f"{product_name}"
         else:
-            inventory = Inventory.objects.filter(sku__iexact=obj.get("sku")).first()
+            inventory = self.get_inventory_by_sku(obj.get("sku"))
             product = inventory.product_variant.product.name
             unit = inventory.unit
             weight = inventory.weight
@@ -513,8 +527,10 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
 
     def get_feature_image(self, obj):
-        featured_image = obj.images.filter(is_featured=True).last()
-        if featured_image:
+        # Filter in Python so prefetched images are reused instead of queried.
+        featured_images = [image for image in obj.images.all() if image.is_featured]
+        if featured_images:
+            featured_image = max(featured_images, key=lambda image: image.pk)
             return ProductImageSerializer(featured_image).data
         return None
 
@@ -754,3 +770,118 @@ class GetBarcodeSerializer(serializers.Serializer):
         if not Inventory.objects.filter(sku=value).exists():
             raise serializers.ValidationError(f"No inventory found with SKU: {value}")
         return value
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """
+    One row of a catalog import; see ``product.importer.COLUMNS``. List
+    columns (categories, sub categories, tags) are ``|`` separated and
+    ``bulking_price_rules`` is a JSON list.
+    """
+
+    sku = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    categories = serializers.CharField(required=False, allow_blank=True, default="")
+    sub_categories = serializers.CharField(required=False, allow_blank=True, default="")
+    tags = serializers.CharField(required=False, allow_blank=True, default="")
+    status = serializers.ChoiceField(
+        choices=ProductStatus.choices(), default=ProductStatus.AVAILABLE.value
+    )
+    is_active = serializers.BooleanField(default=True)
+    hot_deal = serializers.BooleanField(default=False)
+    min_order_quantity = serializers.IntegerField(required=False, allow_null=True)
+    variant_description = serializers.CharField(
+        required=False, allow_blank=True, default=""
+    )
+    enabled = serializers.BooleanField(default=True)
+    managed_stock = serializers.BooleanField(default=True)
+    allow_backorders = serializers.ChoiceField(
+        choices=["Do Not Allow", "Allow"], default="Do Not Allow"
+    )
+    regular_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    sale_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False, allow_null=True
+    )
+    sale_price_dates_from = serializers.DateField(required=False, allow_null=True)
+    sale_price_dates_to = serializers.DateField(required=False, allow_null=True)
+    weight = serializers.DecimalField(max_digits=10, decimal_places=2)
+    unit = serializers.ChoiceField(
+        choices=MeasurementUnit.choices(), default=MeasurementUnit.UNIT.value
+    )
+    total_quantity = serializers.IntegerField(default=1)
+    bulking_price_rules = serializers.JSONField(binary=True, required=False)
+
+    def validate_bulking_price_rules(self, value):
+        if not isinstance(value, list):
+            raise serializers.ValidationError("Must be a JSON list of rules.")
+        BulkingPriceRuleSerializer(data=value, many=True).is_valid(raise_exception=True)
+        return value
+
+    def split(self, value):
+        return [item.strip() for item in value.split("|") if item.strip()]
+
+    def validate_categories(self, value):
+        return self.split(value)
+
+    def validate_sub_categories(self, value):
+        return self.split(value)
+
+    def validate_tags(self, value):
+        return self.split(value)
+
+
+class ProductImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductImportJob
+        fields = [
+            "id",
+            "file_format",
+            "status",
+            "total_rows",
+            "processed_rows",
+            "created_count",
+            "updated_count",
+            "error_count",
+            "errors",
+            "created_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+
+class ProductImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+    def validate_file(self, value):
+        extension = value.name.rsplit(".", 1)[-1].lower()
+        if extension not in ProductImportJob.Format.values:
+            raise serializers.ValidationError("Upload a .csv or .xlsx file.")
+        return value
+
+
+class BarcodeSheetSerializer(serializers.Serializer):
+    """
+    Either ``skus`` (one label per SKU, ``copies`` times) or a single ``sku``
+    with a series range; the range defaults to the inventory's
+    ``start_series``/``end_series``.
+    """
+
+    skus = serializers.ListField(
+        child=serializers.CharField(max_length=100), required=False, allow_empty=False
+    )
+    copies = serializers.IntegerField(min_value=1, max_value=100, default=1)
+    sku = serializers.CharField(max_length=100, required=False)
+    start_series = serializers.IntegerField(min_value=0, required=False)
+    end_series = serializers.IntegerField(min_value=0, required=False)
+    output = serializers.ChoiceField(choices=["pdf", "png"], default="pdf")
+
+    def validate(self, attrs):
+        if bool(attrs.get("skus")) == bool(attrs.get("sku")):
+            raise serializers.ValidationError("Provide either 'skus' or 'sku'.")
+        start, end = attrs.get("start_series"), attrs.get("end_series")
+        if start is not None and end is not None and start > end:
+            raise serializers.ValidationError(
+                "start_series must not be greater than end_series."
+            )
+        return attrs
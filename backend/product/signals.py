@@ -0,0 +1,208 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from orders.models import OrderItem
+from product import cache as catalog_cache
+from product.models import (
+    Category,
+    Inventory,
+    Product,
+    ProductImage,
+    ProductSeo,
+    ProductVariant,
+    SubCategory,
+)
+from product.search import refresh_search_documents
+from product.summary import adjust_order_count, refresh_product_summaries
+
+
+def get_variant_product_id(variant_id):
+    return (
+        ProductVariant.objects.filter(pk=variant_id)
+        .values_list("product_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+def refresh_category_search_document(sender, instance, **kwargs):
+    """
+    Re-index a saved category and the products whose document carries its name.
+    """
+    refresh_search_documents(sender, [instance.pk])
+    if sender is Category:
+        products = instance.products.all()
+    else:
+        products = instance.sub_category_products.all()
+    refresh_search_documents(Product, products.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=SubCategory)
+def remember_category_products(sender, instance, **kwargs):
+    """
+    Keep the linked product ids; the M2M rows are gone by ``post_delete``.
+    """
+    if sender is Category:
+        products = instance.products.all()
+    else:
+        products = instance.sub_category_products.all()
+    instance._search_product_ids = list(products.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+def refresh_search_documents_after_category_delete(sender, instance, **kwargs):
+    refresh_search_documents(Product, getattr(instance, "_search_product_ids", []))
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_search_document(sender, instance, **kwargs):
+    """
+    Re-index a saved product and its inventories, which include the product name.
+    """
+    refresh_search_documents(Product, [instance.pk])
+    refresh_search_documents(
+        Inventory,
+        Inventory.objects.filter(product_variant__product=instance).values_list(
+            "pk", flat=True
+        ),
+    )
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+@receiver(m2m_changed, sender=Product.sub_category.through)
+def refresh_search_document_on_category_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Re-index products whose categories or sub categories were changed, from
+    either side of the relation.
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        refresh_search_documents(Product, [instance.pk])
+    elif pk_set:
+        refresh_search_documents(Product, pk_set)
+
+
+@receiver(post_save, sender=Inventory)
+@receiver(post_delete, sender=Inventory)
+def refresh_inventory_search_document(sender, instance, **kwargs):
+    """
+    Re-index an inventory and its product, whose document lists SKUs and prices.
+    """
+    if kwargs.get("signal") is post_save:
+        refresh_search_documents(Inventory, [instance.pk])
+    refresh_search_documents(
+        Product, [get_variant_product_id(instance.product_variant_id)]
+    )
+
+
+@receiver(post_save, sender=Product)
+def create_product_summary(sender, instance, created, **kwargs):
+    if created:
+        refresh_product_summaries([instance.pk])
+
+
+@receiver(post_save, sender=Inventory)
+@receiver(post_delete, sender=Inventory)
+def refresh_summary_on_inventory_change(sender, instance, **kwargs):
+    """
+    Recompute the price, stock and first-variant columns of the product.
+    """
+    refresh_product_summaries(
+        [get_variant_product_id(instance.product_variant_id)],
+        create=kwargs.get("signal") is post_save,
+    )
+
+
+@receiver(post_delete, sender=ProductVariant)
+def refresh_summary_on_variant_delete(sender, instance, **kwargs):
+    """
+    Recompute the whole summary, the variant's order items went with it.
+    """
+    refresh_product_summaries(
+        [instance.product_id], include_order_count=True, create=False
+    )
+
+
+@receiver(post_save, sender=OrderItem)
+def count_product_order(sender, instance, created, **kwargs):
+    if created:
+        adjust_order_count(get_variant_product_id(instance.product_id), 1)
+
+
+@receiver(post_delete, sender=OrderItem)
+def uncount_product_order(sender, instance, **kwargs):
+    adjust_order_count(get_variant_product_id(instance.product_id), -1)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    """
+    Drop the cached detail and lists of a product; creating or deleting one
+    also changes the category product counts.
+    """
+    scopes = [catalog_cache.product_scope(instance.pk), "product-lists"]
+    if kwargs.get("created") or kwargs.get("signal") is post_delete:
+        scopes.append("categories")
+    catalog_cache.bump_versions(*scopes)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductSeo)
+@receiver(post_delete, sender=ProductSeo)
+def invalidate_product_part_cache(sender, instance, **kwargs):
+    catalog_cache.bump_versions(
+        catalog_cache.product_scope(instance.product_id), "product-lists"
+    )
+
+
+@receiver(post_save, sender=Inventory)
+@receiver(post_delete, sender=Inventory)
+def invalidate_inventory_cache(sender, instance, **kwargs):
+    product_id = get_variant_product_id(instance.product_variant_id)
+    scopes = ["product-lists"]
+    if product_id is not None:
+        scopes.append(catalog_cache.product_scope(product_id))
+    catalog_cache.bump_versions(*scopes)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """
+    Category names are embedded in every product payload, so a category
+    change retires the whole catalog generation.
+    """
+    catalog_cache.bump_versions("catalog", "categories")
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+@receiver(m2m_changed, sender=Product.sub_category.through)
+def invalidate_cache_on_category_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        product_ids = [instance.pk]
+    elif pk_set:
+        product_ids = pk_set
+    else:
+        catalog_cache.bump_versions("catalog", "categories")
+        return
+    catalog_cache.bump_versions(
+        "categories",
+        "product-lists",
+        *[catalog_cache.product_scope(product_id) for product_id in product_ids],
+    )
@@ -0,0 +1,100 @@
+"""
+Maintenance of ``ProductSummary`` rows.
+
+Price, stock and first-variant timestamps are recomputed for just the touched
+products whenever an inventory or variant changes; order counts are adjusted
+by one per ``OrderItem`` created or deleted so they never re-scan the order
+history.
+"""
+
+from django.db.models import Count, F, Min
+from django.db.models.functions import Greatest
+
+from product.models import Inventory, Product, ProductSummary
+
+INVENTORY_FIELDS = [
+    "min_regular_price",
+    "min_total_quantity",
+    "first_variant_created_at",
+]
+
+
+def refresh_product_summaries(product_ids, include_order_count=False, create=True):
+    """
+    Recompute the inventory aggregates of the given products in one query.
+
+    ``include_order_count`` also recounts order items, which is only needed
+    when (re)building summaries; the signals adjust the count incrementally.
+    With ``create=False`` only existing summaries are updated, which is what
+    delete handlers want: while a product is being deleted its summary may
+    already be gone and must not be inserted again.
+    """
+    if create:
+        existing = Product.objects.filter(pk__in=product_ids).values_list("pk")
+    else:
+        existing = ProductSummary.objects.filter(
+            product_id__in=product_ids
+        ).values_list("product_id")
+    product_ids = {pk for (pk,) in existing}
+    if not product_ids:
+        return
+
+    aggregates = {
+        row["product_variant__product_id"]: row
+        for row in Inventory.objects.filter(product_variant__product_id__in=product_ids)
+        .values("product_variant__product_id")
+        .annotate(
+            min_regular_price=Min("regular_price"),
+            min_total_quantity=Min("total_quantity"),
+            first_variant_created_at=Min("created_at"),
+        )
+    }
+    order_counts = {}
+    if include_order_count:
+        order_counts = dict(
+            Product.objects.filter(pk__in=product_ids)
+            .annotate(order_count=Count("variants__order_items"))
+            .values_list("pk", "order_count")
+        )
+
+    summaries = []
+    for product_id in product_ids:
+        row = aggregates.get(product_id, {})
+        summaries.append(
+            ProductSummary(
+                product_id=product_id,
+                min_regular_price=row.get("min_regular_price"),
+                min_total_quantity=row.get("min_total_quantity"),
+                first_variant_created_at=row.get("first_variant_created_at"),
+                order_count=order_counts.get(product_id, 0),
+            )
+        )
+
+    update_fields = INVENTORY_FIELDS + (["order_count"] if include_order_count else [])
+    if create:
+        ProductSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=update_fields,
+        )
+    else:
+        ProductSummary.objects.bulk_update(summaries, update_fields)
+
+
+def adjust_order_count(product_id, delta):
+    """Add ``delta`` to a product's order count without reading it first."""
+    if product_id is None:
+        return
+    updated = ProductSummary.objects.filter(product_id=product_id).update(
+        order_count=Greatest(F("order_count") + delta, 0)
+    )
+    if not updated and delta > 0:
+        refresh_product_summaries([product_id], include_order_count=True)
+
+
+def rebuild_product_summaries(batch_size=500):
+    """Recompute every product summary, ``batch_size`` products at a time."""
+    pks = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(pks), batch_size):
+        refresh_product_summaries(pks[start : start + batch_size], True)
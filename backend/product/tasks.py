@@ -0,0 +1,39 @@
+from celery import shared_task
+from django.utils.timezone import now
+
+from product.barcodes import prerender_missing_barcodes
+from product.importer import run_import
+from product.models import ProductImportJob
+
+
+@shared_task
+def import_products(job_id):
+    """
+    Run a catalog import (see ``product.importer``), recording progress and
+    the outcome on the ``ProductImportJob``.
+    """
+    job = ProductImportJob.objects.filter(pk=job_id).first()
+    if not job:
+        return f"Product import {job_id} does not exist."
+    try:
+        run_import(job)
+    except Exception as e:
+        job.status = ProductImportJob.Status.FAILED
+        job.errors = job.errors + [{"errors": {"file": [str(e)]}}]
+        job.finished_at = now()
+        job.save(update_fields=["status", "errors", "finished_at", "updated_at"])
+        return f"Product import {job_id} failed: {e}"
+    return (
+        f"Product import {job_id} completed: {job.created_count} created, "
+        f"{job.updated_count} updated, {job.error_count} errors."
+    )
+
+
+@shared_task
+def prerender_barcodes():
+    """
+    Render and store every missing barcode (see ``product.barcodes``) in the
+    worker process: Celery workers cannot start a process pool.
+    """
+    rendered = prerender_missing_barcodes(workers=1)
+    return f"Barcodes pre-rendered: {rendered}"
@@ -1,26 +1,47 @@
 from io import BytesIO
+import csv
+import io
 import json
+from datetime import timedelta
 from decimal import Decimal
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 # from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.cache import caches
+from django.db import connection
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+import openpyxl
 from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from account.models import CustomUser as User
+from notification.models import Notification
+from orders.models import Order, OrderItem
 from product.models import (
     Category,
     SubCategory,
     Product,
     ProductImage,
+    ProductImportJob,
     Inventory,
     ProductMaterial,
     ProductSeo,
+    ProductSummary,
     ProductVariant,
 )
+from product import barcodes, importer, labels, price_tiers
+from product import cache as catalog_cache
+from product.search import search_queryset
+from product.stock import InsufficientStock, reserve_stock
+from product.tasks import import_products, prerender_barcodes
+from product.utils import KeysetPagination
 from product.serializers import (
     CategorySerializer,
     ProductMaterialSerializer,
@@ -643,3 +664,734 @@ class UpdateQuantityAPIViewTests(APITestCase):
         response = self.client.put(url, invalid_data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("Quantity must be a positive number.", response.data["error"])
+
+
+class ProductListingQueryBudgetTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="adminpassword", role="admin"
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+        self.url = reverse("products")
+
+    def create_product(self, index):
+        product = Product.objects.create(name=f"budget product {index}")
+        product.category.add(Category.objects.get(pk=1))
+        product.sub_category.add(SubCategory.objects.get(pk=1))
+        ProductSeo.objects.create(product=product, seo_title=f"budget seo {index}")
+        for variant_index in range(2):
+            variant = ProductVariant.objects.create(product=product)
+            Inventory.objects.create(
+                product_variant=variant,
+                sku=f"BUDGET-{index}-{variant_index}",
+                regular_price=Decimal("10.00"),
+                weight=Decimal("1.00"),
+                unit="kg",
+                total_quantity=5,
+            )
+        return product
+
+    def test_product_listing_query_count_is_constant(self):
+        # user lookup, count, page (with seo), categories, sub categories,
+        # images and variants with inventory.
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for index in range(8):
+            self.create_product(index)
+
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_product_listing_serves_variant_inventory(self):
+        self.create_product(1)
+        response = self.client.get(self.url, {"search": "budget product 1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        product = response.data["results"][0]
+        variant_skus = sorted(
+            variant["sku"] for variant in product["product_detail"]["variants"]
+        )
+        self.assertEqual(variant_skus, ["budget-1-0", "budget-1-1"])
+        self.assertEqual(
+            product["product_detail"]["variants"][0]["inventory"]["total_quantity"], 5
+        )
+
+
+class ProductSearchTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="adminpassword", role="admin"
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+
+    def search(self, url_name, term):
+        response = self.client.get(reverse(url_name), {"search": term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["results"]
+
+    def test_product_search_matches_word_prefixes(self):
+        names = {product["name"] for product in self.search("products", "chee")}
+        self.assertEqual(names, {"cheese cake", "cheese bread"})
+
+        results = self.search("products", "cheese cak")
+        self.assertEqual([product["name"] for product in results], ["cheese cake"])
+
+    def test_product_search_matches_sku_parts(self):
+        results = self.search("products", "var-10")
+        self.assertEqual([product["id"] for product in results], [1])
+
+    def test_product_search_ranks_name_matches_first(self):
+        category = Category.objects.create(name="Cheese Specials")
+        product = Product.objects.create(name="Plain Bun")
+        product.category.add(category)
+
+        results = self.search("products", "cheese")
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[-1]["name"], "plain bun")
+
+    def test_search_documents_follow_renames(self):
+        product = Product.objects.get(pk=1)
+        product.name = "Blueberry Muffin"
+        product.save()
+
+        self.assertEqual(
+            [product["id"] for product in self.search("products", "blueb")], [1]
+        )
+        self.assertEqual(self.search("products", "cheese cak"), [])
+        self.assertEqual(len(self.search("inventory-list", "muffin")), 1)
+
+    def test_category_and_inventory_search(self):
+        self.assertEqual(len(self.search("categories", "categ")), 1)
+        results = self.search("subcategory-list", "subcategory 2")
+        self.assertEqual([sub_category["id"] for sub_category in results], [2])
+        self.assertEqual(len(self.search("inventory-list", "prod 1 var")), 1)
+        self.assertEqual(self.search("inventory-list", "croissant"), [])
+
+    def test_search_with_cursor_mode_uses_page_numbers(self):
+        queryset = search_queryset(Product.objects.all(), "cheese", "-created_at")
+        self.assertTrue(KeysetPagination.orders_by_float_annotation(queryset))
+
+        response = self.client.get(
+            reverse("products"), {"search": "chee", "cursor": "stale-cursor"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_products"], 2)
+
+
+class ProductSummaryTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="adminpassword", role="admin"
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+        self.variant = ProductVariant.objects.create(product_id=2)
+        self.inventory = Inventory.objects.create(
+            product_variant=self.variant,
+            sku="BREAD-1",
+            regular_price=Decimal("25.00"),
+            weight=Decimal("1.00"),
+            unit="kg",
+            total_quantity=40,
+        )
+
+    def sorted_ids(self, sort_by, sort="desc"):
+        response = self.client.get(
+            reverse("products"), {"sort_by": sort_by, "sort": sort}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product["id"] for product in response.data["results"]]
+
+    def test_summary_follows_inventory_changes(self):
+        summary = ProductSummary.objects.get(product_id=2)
+        self.assertEqual(summary.min_regular_price, Decimal("25.00"))
+        self.assertEqual(summary.min_total_quantity, 40)
+
+        self.inventory.regular_price = Decimal("700.00")
+        self.inventory.total_quantity = 3
+        self.inventory.save()
+        summary.refresh_from_db()
+        self.assertEqual(summary.min_regular_price, Decimal("700.00"))
+        self.assertEqual(summary.min_total_quantity, 3)
+
+        self.variant.delete()
+        summary.refresh_from_db()
+        self.assertIsNone(summary.min_regular_price)
+        self.assertIsNone(summary.first_variant_created_at)
+
+    def test_sort_modes_use_summary(self):
+        fixture_inventory = Inventory.objects.get(pk=1)
+        fixture_inventory.created_at = self.inventory.created_at - timedelta(days=1)
+        fixture_inventory.save()
+
+        self.assertEqual(self.sorted_ids("price_asc"), [2, 1])
+        self.assertEqual(self.sorted_ids("price_desc"), [1, 2])
+        self.assertEqual(self.sorted_ids("total_quantity", "asc"), [1, 2])
+        self.assertEqual(self.sorted_ids("created_at", "asc"), [1, 2])
+        self.assertEqual(self.sorted_ids("created_at"), [2, 1])
+
+    def test_order_count_is_incremental(self):
+        order = Order.objects.bulk_create(
+            [Order(contact_number="123", total_amount=Decimal("25.00"))]
+        )[0]
+        reserve_stock([(self.variant.pk, 1), (self.variant.pk, 1)])
+        items = [
+            OrderItem.objects.create(
+                order=order, product=self.variant, quantity=1, price=Decimal("25.00")
+            )
+            for _ in range(2)
+        ]
+        summary = ProductSummary.objects.get(product_id=2)
+        self.assertEqual(summary.order_count, 2)
+        self.assertEqual(summary.min_total_quantity, 38)
+        self.assertEqual(self.sorted_ids("popularity"), [2, 1])
+
+        items[0].delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.order_count, 1)
+
+
+class CatalogCacheTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        caches["catalog"].clear()
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="adminpassword", role="admin"
+        )
+        self.user.is_superuser = True
+        self.user.save()
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+        self.url = reverse("product-detail", args=[1])
+        shared = mock.patch.object(catalog_cache, "is_shared", return_value=True)
+        self.is_shared = shared.start()
+        self.addCleanup(shared.stop)
+
+    def test_product_detail_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        # Only the JWT user lookup hits the database.
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+
+    def test_inventory_change_invalidates_product(self):
+        self.client.get(self.url)
+        inventory = Inventory.objects.get(pk=1)
+        inventory.regular_price = Decimal("12.50")
+        inventory.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.data["product_detail"]["inventory"]["regular_price"],
+            Decimal("12.50"),
+        )
+
+    def test_category_change_invalidates_products_and_categories(self):
+        self.client.get(self.url)
+        self.client.get(reverse("categories"))
+        category = Category.objects.get(pk=1)
+        category.name = "Cakes"
+        category.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["category"][0]["name"], "cakes")
+        response = self.client.get(reverse("categories"))
+        self.assertEqual(response.data["results"][0]["name"], "cakes")
+
+    def test_per_process_cache_is_bypassed(self):
+        self.is_shared.return_value = False
+        self.client.get(self.url)
+        # Another process (a Celery task) writes without bumping our versions.
+        Inventory.objects.filter(pk=1).update(regular_price=Decimal("12.50"))
+
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response.data["product_detail"]["inventory"]["regular_price"],
+            Decimal("12.50"),
+        )
+
+    def test_missing_product_is_not_cached(self):
+        url = reverse("product-detail", args=[999])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cache_stats(self):
+        url = reverse("catalog-cache-stats")
+        self.client.delete(url)
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["hits"], 1)
+        self.assertEqual(response.data["misses"], 1)
+        self.assertEqual(response.data["hit_ratio"], 0.5)
+
+
+class CatalogConditionalRequestTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        caches["catalog"].clear()
+        self.url = reverse("product-detail", args=[1])
+        # ETags are only sent with a catalog cache shared between processes.
+        shared = mock.patch.object(catalog_cache, "is_shared", return_value=True)
+        self.is_shared = shared.start()
+        self.addCleanup(shared.stop)
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response.headers["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers["ETag"], etag)
+
+    def test_inventory_change_changes_etag(self):
+        etag = self.client.get(self.url).headers["ETag"]
+        inventory = Inventory.objects.get(pk=1)
+        inventory.regular_price = Decimal("12.50")
+        inventory.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_category_etag(self):
+        url = reverse("categories")
+        etag = self.client.get(url).headers["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Category.objects.filter(pk=1).first().save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_per_process_cache_sends_no_etag(self):
+        etag = self.client.get(self.url).headers["ETag"]
+        self.is_shared.return_value = False
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response.headers)
+
+
+class BulkProductDuplicateTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="admin@example.com", password="adminpassword", role="admin"
+        )
+        self.user.is_superuser = True
+        self.user.save()
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+        self.url = reverse("product-update")
+
+    def duplicate(self, products):
+        return self.client.post(
+            self.url, {"products": products, "status": "duplicate"}, format="json"
+        )
+
+    def test_duplicates_unique_names_seo_and_skus(self):
+        response = self.duplicate([1, 1, 2])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        names = [product["name"] for product in response.data["duplicated_products"]]
+        self.assertEqual(
+            [name.lower() for name in names],
+            ["cheese cake (copy 1)", "cheese cake (copy 2)", "cheese bread (copy 1)"],
+        )
+        self.assertEqual(
+            response.data["created"],
+            {
+                "products": 3,
+                "categories": 3,
+                "sub_categories": 0,
+                "seo": 2,
+                "images": 2,
+                "variants": 2,
+                "inventories": 2,
+            },
+        )
+
+        copies = [product["id"] for product in response.data["duplicated_products"]]
+        self.assertEqual(
+            sorted(
+                ProductSeo.objects.filter(product__in=copies).values_list(
+                    "seo_title", flat=True
+                )
+            ),
+            ["seo_title-1", "seo_title-2"],
+        )
+        self.assertEqual(
+            sorted(
+                Inventory.objects.filter(
+                    product_variant__product__in=copies
+                ).values_list("sku", flat=True)
+            ),
+            ["1-sku-prod-1-var-10", "2-sku-prod-1-var-10"],
+        )
+        self.assertTrue(
+            ProductSummary.objects.filter(
+                product_id=copies[0], min_regular_price=Decimal("599.99")
+            ).exists()
+        )
+        self.assertEqual(
+            search_queryset(Product.objects.filter(pk__in=copies), "copy").count(), 3
+        )
+
+        response = self.duplicate([1])
+        self.assertEqual(
+            response.data["duplicated_products"][0]["name"].lower(),
+            "cheese cake (copy 3)",
+        )
+
+    def test_copies_notify_superusers(self):
+        response = self.duplicate([1, 2])
+        copies = [product["id"] for product in response.data["duplicated_products"]]
+        notices = Notification.objects.filter(
+            recipient=self.user, title="New Product Added"
+        )
+        self.assertEqual(
+            sorted(notice.meta_data["product_id"] for notice in notices),
+            sorted(copies),
+        )
+
+    def test_query_count_does_not_grow_with_products(self):
+        def count_queries(products):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(
+                    self.duplicate(products).status_code, status.HTTP_201_CREATED
+                )
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries([1]), count_queries([1, 1, 1, 1, 2, 2]))
+
+    def test_missing_product(self):
+        response = self.duplicate([1, 999])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            Product.objects.filter(name__startswith="cheese cake (copy").exists()
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProductImportExportTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="stock@example.com", password="stockpassword", role="stock_manager"
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+
+    def upload(self, name, content):
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post(
+                reverse("product-import"),
+                {"file": SimpleUploadedFile(name, content)},
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        import_products(response.data["id"])
+        return self.client.get(
+            reverse("product-import-detail", args=[response.data["id"]])
+        ).data
+
+    def test_csv_import_creates_and_updates_by_sku(self):
+        content = (
+            "sku,name,categories,sub_categories,regular_price,weight,unit,"
+            "total_quantity,bulking_price_rules\n"
+            "PROD-1-VAR-10,,,,,,,42,\n"
+            "TART-1,Lemon Tart,Category,SubCategory 1|SubCategory 2,9.50,1,pieces,"
+            '5,"[{""quantity_from"": 1, ""quantity_to"": 5, ""price"": ""9""}]"\n'
+            "TART-2,Lemon Tart,,,10.50,2,pieces,3,\n"
+            "TART-3,Plum Tart,,,,1,pieces,3,\n"
+            "TART-4,Fig Tart,Unknown,,4,1,pieces,3,\n"
+        ).encode()
+        job = self.upload("products.csv", content)
+
+        self.assertEqual(job["status"], ProductImportJob.Status.COMPLETED)
+        self.assertEqual(job["total_rows"], 5)
+        self.assertEqual(job["processed_rows"], 5)
+        self.assertEqual((job["created_count"], job["updated_count"]), (2, 1))
+        self.assertEqual([error["row"] for error in job["errors"]], [5, 6])
+
+        updated = Inventory.objects.get(sku="prod-1-var-10")
+        self.assertEqual(updated.total_quantity, 42)
+        self.assertEqual(updated.regular_price, Decimal("599.99"))
+        self.assertEqual(updated.product_variant.product.name, "cheese cake")
+
+        tart = Product.objects.get(name="lemon tart")
+        self.assertEqual(tart.variants.count(), 2)
+        self.assertEqual(list(tart.category.values_list("pk", flat=True)), [1])
+        self.assertEqual(tart.sub_category.count(), 2)
+        self.assertEqual(tart.summary.min_regular_price, Decimal("9.50"))
+        self.assertEqual(
+            Inventory.objects.get(sku="tart-1").bulking_price_rules[0]["quantity_to"], 5
+        )
+        self.assertFalse(Product.objects.filter(name="plum tart").exists())
+
+    def test_import_notifies_created_products_only(self):
+        content = (
+            "sku,name,regular_price,weight,unit,total_quantity\n"
+            "PROD-1-VAR-10,,,,,42\n"
+            "TART-1,Lemon Tart,9.50,1,pieces,5\n"
+        ).encode()
+        with mock.patch("product.importer.notify_new_products") as notify:
+            self.upload("products.csv", content)
+
+        (created,), _ = notify.call_args
+        self.assertEqual([product.name.lower() for product in created], ["lemon tart"])
+
+    def test_export_round_trips_through_import(self):
+        response = self.client.get(reverse("product-export"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b"".join(response.streaming_content)
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0], importer.COLUMNS)
+        self.assertEqual(rows[1][:2], ["PROD-1-VAR-10", "cheese cake"])
+
+        job = self.upload("products.csv", content)
+        self.assertEqual((job["created_count"], job["updated_count"]), (0, 1))
+        self.assertEqual(job["errors"], [])
+        inventory = Inventory.objects.get(sku="prod-1-var-10")
+        self.assertEqual(inventory.sale_price, Decimal("499.99"))
+        self.assertEqual(inventory.sale_price_dates_to.isoformat(), "2024-11-30")
+
+    def test_xlsx_export_and_import(self):
+        response = self.client.get(reverse("product-export"), {"file_format": "xlsx"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b"".join(response.streaming_content)
+        workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), importer.COLUMNS)
+
+        job = self.upload("products.xlsx", content)
+        self.assertEqual(job["status"], ProductImportJob.Status.COMPLETED)
+        self.assertEqual((job["updated_count"], job["error_count"]), (1, 0))
+
+    def test_rejects_other_files(self):
+        response = self.client.post(
+            reverse("product-import"),
+            {"file": SimpleUploadedFile("products.txt", b"sku\n")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BarcodeTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="stock@example.com", password="stockpassword", role="stock_manager"
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+        self.url = reverse("get-barcode")
+
+    def test_str_does_not_render(self):
+        inventory = Inventory.objects.get(pk=1)
+        material = ProductMaterial.objects.first()
+        str(inventory), str(material)
+        inventory.refresh_from_db()
+        self.assertFalse(inventory.barcode)
+        self.assertIsNone(inventory.unique_code)
+
+    def test_barcode_is_rendered_once(self):
+        with mock.patch(
+            "product.barcodes.render_barcode", wraps=barcodes.render_barcode
+        ) as render:
+            response = self.client.get(self.url, {"sku": "PROD-1-VAR-10"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            inventory = Inventory.objects.get(pk=1)
+            self.assertTrue(
+                response.data["barcode_url"].endswith(f"{inventory.unique_code}.png")
+            )
+
+            response = self.client.get(
+                self.url, {"sku": "PROD-1-VAR-10", "output": "image"}
+            )
+            self.assertEqual(response["Content-Type"], "image/png")
+            self.assertTrue(response.content.startswith(b"\x89PNG"))
+        render.assert_called_once_with(inventory.unique_code)
+
+    def test_prerender_missing_barcodes(self):
+        rendered = barcodes.prerender_missing_barcodes(workers=1)
+        self.assertEqual(
+            rendered, {"product.Inventory": 1, "product.ProductMaterial": 1}
+        )
+        inventory = Inventory.objects.get(pk=1)
+        self.assertEqual(inventory.barcode.name, barcodes.barcode_path(inventory))
+        self.assertEqual(len(inventory.unique_code), 13)
+        self.assertEqual(
+            barcodes.prerender_missing_barcodes(workers=1),
+            {"product.Inventory": 0, "product.ProductMaterial": 0},
+        )
+
+    def test_prerender_task_renders_in_the_worker_process(self):
+        with mock.patch("product.barcodes.ProcessPoolExecutor") as pool:
+            result = prerender_barcodes.apply().get()
+        pool.assert_not_called()
+        self.assertIn("'product.Inventory': 1", result)
+        inventory = Inventory.objects.get(pk=1)
+        self.assertEqual(inventory.barcode.name, barcodes.barcode_path(inventory))
+
+
+class BarcodeSheetTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="stock@example.com", password="stockpassword", role="stock_manager"
+        )
+        self.token = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}")
+        self.url = reverse("barcode-sheet")
+
+    def test_series_range_sheet_is_a_multi_page_pdf(self):
+        response = self.client.post(
+            self.url,
+            {"sku": "PROD-1-VAR-10", "start_series": 1, "end_series": 60},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertEqual(response.content.count(b"/Type /Page\n"), 3)
+        self.assertIsNotNone(Inventory.objects.get(sku="prod-1-var-10").unique_code)
+
+    def test_series_labels_share_one_barcode_render(self):
+        inventory = Inventory.objects.get(sku="prod-1-var-10")
+        barcodes.assign_unique_codes(Inventory, [inventory])
+        labels.barcode_image.cache_clear()
+        labels.fitted_barcode.cache_clear()
+        sheet = labels.series_labels(inventory, 1, 48)
+        content, content_type, _ = labels.render_sheet(sheet, "png", workers=1)
+        self.assertEqual(content_type, "application/zip")
+        self.assertEqual(labels.barcode_image.cache_info().misses, 1)
+
+    def test_sku_list_png_sheet(self):
+        response = self.client.post(
+            self.url,
+            {"skus": ["PROD-1-VAR-10"], "copies": 4, "output": "png"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "image/png")
+
+    def test_unknown_sku_and_limits(self):
+        response = self.client.post(self.url, {"skus": ["nope"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(
+            self.url,
+            {"sku": "PROD-1-VAR-10", "start_series": 1, "end_series": 10**6},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PriceTierTests(APITestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def test_rules_are_compiled_on_save(self):
+        inventory = Inventory.objects.get(pk=1)
+        inventory.bulking_price_rules = [
+            {"quantity_from": 50, "quantity_to": 99, "price": "3.50"},
+            {"quantity_from": 0, "quantity_to": 0, "price": 0},
+            {"quantity_from": "10", "quantity_to": "60", "price": "4"},
+            {"quantity_from": "x", "quantity_to": 5, "price": "1"},
+            {"quantity_to": 5},
+        ]
+        inventory.save(update_fields=["bulking_price_rules"])
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.price_tiers, [[10, 60, "4"], [50, 99, "3.50"]])
+
+    def test_resolve_tier_price(self):
+        tiers = price_tiers.compile_price_tiers(
+            [
+                {"quantity_from": 20, "quantity_to": 49, "price": "180"},
+                {"quantity_from": 1, "quantity_to": 10, "price": "550.00"},
+                {"quantity_from": 5, "quantity_to": 10, "price": "1"},
+            ]
+        )
+        self.assertEqual(tiers, [[1, 10, "550.00"], [20, 49, "180"]])
+        # A tier prices the whole line of exactly quantity_to units.
+        self.assertEqual(price_tiers.resolve_tier_price(tiers, 10), Decimal("550"))
+        self.assertEqual(price_tiers.resolve_tier_price(tiers, 49), Decimal("180"))
+        self.assertIsNone(price_tiers.resolve_tier_price(tiers, 1))
+        self.assertIsNone(price_tiers.resolve_tier_price(tiers, 20))
+        self.assertIsNone(price_tiers.resolve_tier_price(tiers, 50))
+        self.assertIsNone(price_tiers.resolve_tier_price([], 5))
+
+
+class StockReservationTests(TransactionTestCase):
+    fixtures = ["product/fixtures/product.json"]
+
+    def setUp(self):
+        Inventory.objects.filter(pk=1).update(total_quantity=10)
+        self.variant = ProductVariant.objects.create(product_id=2)
+        Inventory.objects.create(
+            product_variant=self.variant,
+            sku="BREAD-1",
+            regular_price=Decimal("25.00"),
+            weight=Decimal("1.00"),
+            unit="kg",
+            total_quantity=10,
+        )
+
+    def stock(self):
+        return dict(
+            Inventory.objects.values_list("product_variant_id", "total_quantity")
+        )
+
+    def test_reservation_is_all_or_nothing(self):
+        with self.assertRaisesMessage(InsufficientStock, "bread-1"):
+            reserve_stock([(1, 3), (self.variant.pk, 11)])
+        self.assertEqual(self.stock(), {1: 10, self.variant.pk: 10})
+
+        reserve_stock([(1, 3), (self.variant.pk, 4), (1, 2)])
+        self.assertEqual(self.stock(), {1: 5, self.variant.pk: 6})
+        self.assertEqual(ProductSummary.objects.get(product_id=2).min_total_quantity, 6)
+
+    def test_parallel_reservations_never_oversell(self):
+        checkouts = 40
+        barrier = threading.Barrier(checkouts)
+
+        def checkout(number):
+            # Half of the carts list the products the other way round.
+            lines = [(1, 1), (self.variant.pk, 1)]
+            if number % 2:
+                lines.reverse()
+            barrier.wait()
+            try:
+                reserve_stock(lines)
+                return True
+            except InsufficientStock:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=checkouts) as pool:
+            reserved = list(pool.map(checkout, range(checkouts)))
+
+        self.assertEqual(reserved.count(True), 10)
+        self.assertEqual(self.stock(), {1: 0, self.variant.pk: 0})
@@ -3,9 +3,11 @@ from rest_framework.routers import DefaultRouter
 
 from product.views import (
     AddToHotDealView,
+    BarcodeSheetAPIView,
     BulkCategoryUpdateDeleteAPIView,
     BulkMaterialUpdateDeleteAPIView,
     BulkProductUpdateDeleteAPIView,
+    CatalogCacheStatsView,
     CategoryAPIView,
     FavouriteItemAPIView,
     GenerateSKUAPIView,
@@ -13,7 +15,9 @@ from product.views import (
     HotDealProductsView,
     ProductAndMaterialListView,
     ProductAPIView,
+    ProductExportAPIView,
     ProductImageViewSet,
+    ProductImportAPIView,
     ProductMaterialViewset,
     ProductOrMaterialDetailView,
     ProductSeoViewSet,
@@ -75,6 +79,7 @@ urlpatterns = [
     path("hot-deals/", HotDealProductsView.as_view(), name="hot-deal-products"),
     path("add-hot-deal/<int:pk>/", AddToHotDealView.as_view(), name="add-hot-deal"),
     path("get-barcode/", GetBarcodeView.as_view(), name="get-barcode"),
+    path("barcode-sheet/", BarcodeSheetAPIView.as_view(), name="barcode-sheet"),
     path(
         "get-product-detail/<str:unique_code>/",
         ProductOrMaterialDetailView.as_view(),
@@ -85,4 +90,16 @@ urlpatterns = [
         GenerateSKUAPIView.as_view(),
         name="generate-sku",
     ),
+    path(
+        "catalog-cache/stats/",
+        CatalogCacheStatsView.as_view(),
+        name="catalog-cache-stats",
+    ),
+    path("products/import/", ProductImportAPIView.as_view(), name="product-import"),
+    path(
+        "products/import/<int:pk>/",
+        ProductImportAPIView.as_view(),
+        name="product-import-detail",
+    ),
+    path("products/export/", ProductExportAPIView.as_view(), name="product-export"),
 ]
@@ -1,8 +1,51 @@
-from django.db import transaction
+import base64
+import datetime
+import json
+from functools import wraps
+
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import FloatField, Prefetch, Q
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils.http import quote_etag
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from product.models import Product, ProductImage, ProductVariant
+
+
+def conditional_etag(etag_func):
+    """
+    Decorate an APIView ``get`` to honour ``If-None-Match``.
+
+    ``etag_func(view, request, *args, **kwargs)`` must be cheap: it runs
+    before the view, and a matching ETag is answered with 304 without the view
+    (and its serialization) running at all. Only 200 responses are tagged;
+    returning ``None`` disables the check for that request.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            etag = etag_func(view, request, *args, **kwargs)
+            if etag is not None:
+                etag = quote_etag(etag)
+                response = get_conditional_response(request, etag=etag)
+                if response is not None:
+                    response.headers["ETag"] = etag
+                    return response
+            response = method(view, request, *args, **kwargs)
+            if etag is not None and response.status_code == 200:
+                response.headers["ETag"] = etag
+            return response
+
+        return wrapper
 
-from product.models import Product, ProductImage
+    return decorator
 
 
 def update_feature_image(product_id, feature_image):
@@ -30,13 +73,270 @@ def update_feature_image(product_id, feature_image):
         return False
 
 
-class CustomPagination(PageNumberPagination):
+def prefetch_product_listing(queryset):
+    """
+    Attach everything ``ProductSerializer`` reads to a product queryset.
+
+    SEO is joined and categories, sub categories, images and variants (with
+    their inventory) are prefetched, so a page of products is serialized in a
+    fixed number of queries whatever its size.
+    """
+    return queryset.select_related("product_seo").prefetch_related(
+        "category",
+        "sub_category",
+        "images",
+        Prefetch(
+            "variants",
+            queryset=ProductVariant.objects.select_related("inventory_items"),
+        ),
+    )
+
+
+def get_product_listing_context(products):
+    """
+    Build the ``ProductSerializer`` context for prefetched products.
+
+    Inventories are keyed by lower-cased SKU so ``ProductVariantSerializer``
+    resolves the variant rows of ``product_detail`` without a query each.
+    """
+    inventory_lookup = {}
+    for product in products:
+        for inventory in product.get_variant_inventories():
+            if inventory.sku:
+                inventory_lookup[inventory.sku.lower()] = inventory
+    return {"inventory_lookup": inventory_lookup}
+
+
+def estimate_count(queryset, exact_below=1000):
+    """
+    Return the planner's row estimate for ``queryset`` instead of a COUNT(*).
+
+    Estimates are only trusted for large results; below ``exact_below`` rows
+    the exact count is cheap and the estimate too coarse, so it is used.
+    """
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    plan = json.loads(queryset.explain(format="json"))
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate < exact_below:
+        return queryset.count()
+    return estimate
+
+
+class ApproximateCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    Keep full microsecond precision; ``DjangoJSONEncoder`` truncates
+    datetimes to milliseconds, which would break equality on cursor keys.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset (cursor) mode.
+
+    By default it behaves exactly like ``PageNumberPagination``. Passing
+    ``?pagination=cursor`` (or following a link that carries ``cursor``)
+    switches to keyset paging: each page is fetched with a ``WHERE`` on the
+    queryset's ordering fields plus ``pk`` instead of an ``OFFSET``, so deep
+    pages cost the same as the first one. ``?count=approximate`` reports the
+    planner's row estimate instead of running ``COUNT(*)``; cursor mode uses
+    the estimate unless ``?count=exact`` is passed.
+
+    Responses keep the ``count``/``next``/``previous``/``results`` shape in
+    both modes, so clients only follow the links they are given. Querysets
+    ordered by a computed float annotation (such as ``search_rank``) always
+    use page numbers: those values do not round-trip through a cursor exactly,
+    so comparing them again could skip or repeat rows at page boundaries.
+    """
+
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == "cursor"
+        ) and not self.orders_by_float_annotation(queryset)
+        count_mode = request.query_params.get(
+            self.count_query_param, "approximate" if self.keyset else "exact"
+        )
+        self.approximate_count = count_mode == "approximate"
+
+        if not self.keyset:
+            if self.approximate_count:
+                self.django_paginator_class = ApproximateCountPaginator
+            return super().paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_keyset_ordering(queryset)
+        self.total_count = (
+            estimate_count(queryset) if self.approximate_count else queryset.count()
+        )
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor["direction"] == "previous"
+        if cursor is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(cursor["values"], reverse=reverse)
+            )
+        ordering = (
+            [self.invert(field) for field in self.ordering]
+            if reverse
+            else self.ordering
+        )
+
+        rows = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.rows = rows
+        return rows
+
+    def get_count(self):
+        if self.keyset:
+            return self.total_count
+        return self.page.paginator.count
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.get_count(),
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.rows:
+            return None
+        return self.build_cursor_link(self.rows[-1], "next")
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.rows:
+            return None
+        return self.build_cursor_link(self.rows[0], "previous")
+
+    def get_keyset_ordering(self, queryset):
+        """
+        The queryset's ordering as field names, ending with ``pk`` so every
+        row has a distinct key.
+        """
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if any(not isinstance(field, str) for field in ordering):
+            raise NotFound("Cursor pagination is not supported for this ordering.")
+        if not ordering:
+            field_names = {field.name for field in queryset.model._meta.fields}
+            ordering = ["-created_at"] if "created_at" in field_names else []
+        if not any(field.lstrip("-") in ("pk", "id") for field in ordering):
+            descending = bool(ordering) and ordering[0].startswith("-")
+            ordering.append("-pk" if descending else "pk")
+        return ordering
+
+    @staticmethod
+    def orders_by_float_annotation(queryset):
+        annotations = queryset.query.annotations
+        for field in queryset.query.order_by:
+            if not isinstance(field, str):
+                continue
+            annotation = annotations.get(field.lstrip("-"))
+            if annotation is not None and isinstance(
+                annotation.output_field, FloatField
+            ):
+                return True
+        return False
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def get_keyset_filter(self, values, reverse=False):
+        """
+        Rows strictly after ``values`` in the current ordering (before them
+        when ``reverse``), matching Postgres' NULLS LAST/NULLS FIRST defaults.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != reverse
+            if value is None:
+                after = Q(**{f"{name}__isnull": False}) if descending else Q(pk__in=[])
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                lookup = "lt" if descending else "gt"
+                after = Q(**{f"{name}__{lookup}": value})
+                if not descending:
+                    after |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            condition |= equal & after
+            equal &= same
+        return condition
+
+    def get_row_values(self, row):
+        values = []
+        for field in self.ordering:
+            value = row
+            for attribute in field.lstrip("-").split("__"):
+                value = getattr(value, attribute, None)
+                if value is None:
+                    break
+            values.append(value)
+        return values
+
+    def build_cursor_link(self, row, direction):
+        payload = {"direction": direction, "values": self.get_row_values(row)}
+        token = base64.urlsafe_b64encode(
+            json.dumps(payload, cls=CursorEncoder).encode()
+        ).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if cursor["direction"] not in ("next", "previous") or len(
+                cursor["values"]
+            ) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise NotFound("Invalid cursor.") from None
+        return cursor
+
+
+class CustomPagination(KeysetPagination):
     page_size = 10
 
     def get_paginated_response(self, data):
         return Response(
             {
-                "total_products": self.page.paginator.count,
+                "total_products": self.get_count(),
                 "count": len(data),
                 "next": self.get_next_link(),
                 "previous": self.get_previous_link(),
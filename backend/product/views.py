@@ -1,13 +1,14 @@
 import datetime
 import json
 import random
-import re
 from decimal import Decimal
+from functools import partial
 
 from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Count, DecimalField, Min, OuterRef, Q, Subquery
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.text import slugify
 from drf_yasg.utils import swagger_auto_schema
@@ -19,21 +20,34 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from account.permissions import AllowGetOnlyIsAdminStockManager, IsBakery
-from dashboard.models import AdminConfiguration
+from account.permissions import (
+    AllowGetOnlyIsAdminStockManager,
+    IsAdmin,
+    IsAdminStockManager,
+    IsBakery,
+)
+from dashboard import config as admin_config
+from product import cache as catalog_cache
+from product import importer
+from product import labels as barcode_labels
+from product.barcodes import assign_unique_codes, get_barcode, get_barcode_bytes
+from product.duplication import DuplicationError, duplicate_products
 from product.models import (
     Category,
     FavouriteItem,
     Inventory,
     Product,
     ProductImage,
+    ProductImportJob,
     ProductMaterial,
     ProductSeo,
     ProductStatus,
     ProductVariant,
     SubCategory,
 )
+from product.search import search_queryset
 from product.serializers import (
+    BarcodeSheetSerializer,
     BulkCategorySerializer,
     BulkDuplicateSerializer,
     BulkProductMaterialSerializer,
@@ -42,6 +56,8 @@ from product.serializers import (
     GetBarcodeSerializer,
     InventoryListSerializer,
     ProductImageSerializer,
+    ProductImportJobSerializer,
+    ProductImportSerializer,
     ProductMaterialSerializer,
     ProductSeoSerializer,
     ProductSerializer,
@@ -49,12 +65,20 @@ from product.serializers import (
     UpdateQuantitySerializer,
     VariantInventorySerializer,
 )
-from product.utils import CustomPagination, update_feature_image
+from product.tasks import import_products
+from product.utils import (
+    CustomPagination,
+    KeysetPagination,
+    conditional_etag,
+    get_product_listing_context,
+    prefetch_product_listing,
+    update_feature_image,
+)
 
 
 # Convert sync ORM query to async-compatible
 async def get_admin_configuration():
-    return await sync_to_async(AdminConfiguration.objects.all().last)()
+    return await sync_to_async(admin_config.get_admin_configuration)()
 
 
 class CategoryAPIView(APIView):
@@ -89,7 +113,16 @@ class CategoryAPIView(APIView):
         operation_summary="Retrieve all categories and subcategories",
         responses={200: CategorySerializer(many=True)},
     )
+    @conditional_etag(catalog_cache.scope_etag("categories"))
     def get(self, request, pk=None, *args, **kwargs):
+        return catalog_cache.cached_response(
+            "categories",
+            ["categories"],
+            partial(self.get_categories, request, pk),
+            request,
+        )
+
+    def get_categories(self, request, pk=None):
         search_query = request.query_params.get("search", None)
         status_filter = request.query_params.get("status", None)
         sort = request.query_params.get("sort", None)
@@ -99,12 +132,7 @@ class CategoryAPIView(APIView):
             categories = Category.objects.all().order_by("-created_at")
 
             if search_query:
-                sanitized_query = re.escape(search_query)
-                categories = categories.filter(
-                    Q(name__iregex=sanitized_query)
-                    | Q(slug__iregex=sanitized_query)
-                    | Q(description__iregex=sanitized_query)
-                )
+                categories = search_queryset(categories, search_query, "-created_at")
 
             valid_sort_fields = ["created_at", "name"]
             if sort_by in valid_sort_fields:
@@ -213,11 +241,12 @@ class ProductViewSet(APIView):
     Methods:
     - GET: List all products with filters:
         - status: publish/draft/trash/all
-        - search: Search by name, category, SKU, price
+        - search: Ranked prefix search by name, category, SKU, price
         - price_min/price_max: Filter by price range
         - order_quantity_min/max: Filter by order quantity
         - sort_by: price_asc/price_desc/total_quantity/created_at
-        /min_order_quantity/status/popularity
+        /min_order_quantity/status/popularity (defaults to relevance when
+        searching)
     - POST: Create a new product with variants, images, and SEO details
 
     Authentication:
@@ -251,14 +280,7 @@ class ProductViewSet(APIView):
 
         search_term = request.query_params.get("search", None)
         if search_term:
-            queryset = queryset.filter(
-                Q(name__icontains=search_term)
-                | Q(category__name__contains=search_term)
-                | Q(variants__inventory_items__sku__icontains=search_term)
-                | Q(variants__inventory_items__regular_price__iregex=search_term)
-                | Q(min_order_quantity__iregex=search_term)
-                | Q(status__icontains=search_term)
-            )
+            queryset = search_queryset(queryset, search_term, "-created_at")
 
         price_min = request.query_params.get("price_min", None)
         price_max = request.query_params.get("price_max", None)
@@ -277,7 +299,9 @@ class ProductViewSet(APIView):
                 min_order_quantity__gte=min_order_quantity_min,
                 min_order_quantity__lte=min_order_quantity_max,
             )
-        sort_by = request.query_params.get("sort_by", "created_at")
+        sort_by = request.query_params.get(
+            "sort_by", "relevance" if search_term else "created_at"
+        )
         sort_order = request.query_params.get("sort", "desc")
         if product_availablity:
             if product_availablity == "in_stock":
@@ -285,54 +309,25 @@ class ProductViewSet(APIView):
             else:
                 queryset = queryset.filter(status=ProductStatus.OUT_OF_STOCK.value)
 
+        # Price, stock, age and popularity come from the maintained
+        # ``ProductSummary`` columns rather than per-request aggregates.
         if sort_by == "price_asc":
-            lowest_price_subquery = (
-                ProductVariant.objects.filter(
-                    product=OuterRef("id"),
-                    inventory_items__regular_price__isnull=False,
-                )
-                .annotate(min_price=Min("inventory_items__regular_price"))
-                .values("min_price")[:1]
-            )
-
-            queryset = queryset.annotate(
-                first_variant_price=Subquery(
-                    lowest_price_subquery, output_field=DecimalField()
-                )
-            ).order_by("first_variant_price")
+            queryset = queryset.order_by("summary__min_regular_price")
 
         elif sort_by == "price_desc":
-            lowest_price_subquery = (
-                ProductVariant.objects.filter(
-                    product=OuterRef("id"), inventory_items__regular_price__isnull=False
-                )
-                .annotate(min_price=Min("inventory_items__regular_price"))
-                .values("min_price")[:1]
-            )
-
-            queryset = queryset.annotate(
-                first_variant_price=Subquery(
-                    lowest_price_subquery, output_field=DecimalField()
-                )
-            ).order_by("-first_variant_price")
+            queryset = queryset.order_by("-summary__min_regular_price")
 
         elif sort_by == "total_quantity":
-            queryset = queryset.annotate(
-                first_variant_quantity=Min("variants__inventory_items__total_quantity")
-            )
             if sort_order == "asc":
-                queryset = queryset.order_by("first_variant_quantity")
+                queryset = queryset.order_by("summary__min_total_quantity")
             else:
-                queryset = queryset.order_by("-first_variant_quantity")
+                queryset = queryset.order_by("-summary__min_total_quantity")
 
         elif sort_by == "created_at":
-            queryset = queryset.annotate(
-                first_variant_created=Min("variants__inventory_items__created_at")
-            )
             if sort_order == "asc":
-                queryset = queryset.order_by("first_variant_created")
+                queryset = queryset.order_by("summary__first_variant_created_at")
             else:
-                queryset = queryset.order_by("-first_variant_created")
+                queryset = queryset.order_by("-summary__first_variant_created_at")
 
         elif sort_by == "min_order_quantity":
             if sort_order == "asc":
@@ -347,18 +342,23 @@ class ProductViewSet(APIView):
                 queryset = queryset.order_by("-status")
 
         if sort_by == "popularity":
-            queryset = queryset.annotate(
-                order_count=Count("variants__order_items")
-            ).order_by("-order_count")
+            queryset = queryset.order_by("-summary__order_count")
 
+        queryset = prefetch_product_listing(queryset.distinct())
         paginator = self.pagination_class()
-        paginated_list = paginator.paginate_queryset(queryset.distinct(), request)
+        paginated_list = paginator.paginate_queryset(queryset, request)
 
         if paginated_list is not None:
-            serializer = self.serializer_class(paginated_list, many=True)
+            serializer = self.serializer_class(
+                paginated_list,
+                many=True,
+                context=get_product_listing_context(paginated_list),
+            )
             return paginator.get_paginated_response(serializer.data)
 
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.serializer_class(
+            queryset, many=True, context=get_product_listing_context(queryset)
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(auto_schema=None)
@@ -616,7 +616,15 @@ class ProductAPIView(APIView):
     pagination_class = PageNumberPagination
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
+    @conditional_etag(catalog_cache.product_etag)
     def get(self, request, pk=None):
+        return catalog_cache.cached_response(
+            f"product:{pk}",
+            ["catalog", catalog_cache.product_scope(pk)],
+            partial(self.get_product, pk),
+        )
+
+    def get_product(self, pk):
         try:
             product = Product.objects.get(pk=pk)
         except Product.DoesNotExist:
@@ -944,6 +952,24 @@ class SubCategoryViewSet(viewsets.ModelViewSet):
     parser_classes = [MultiPartParser, FormParser]
     pagination_class = PageNumberPagination
 
+    @conditional_etag(catalog_cache.scope_etag("categories"))
+    def list(self, request, *args, **kwargs):
+        return catalog_cache.cached_response(
+            "subcategories",
+            ["categories"],
+            partial(super().list, request, *args, **kwargs),
+            request,
+        )
+
+    @conditional_etag(catalog_cache.scope_etag("categories"))
+    def retrieve(self, request, *args, **kwargs):
+        return catalog_cache.cached_response(
+            "subcategories",
+            ["categories"],
+            partial(super().retrieve, request, *args, **kwargs),
+            request,
+        )
+
     def get_queryset(self):
         """
         Filter the queryset based on the status query parameter.
@@ -953,14 +979,12 @@ class SubCategoryViewSet(viewsets.ModelViewSet):
         # Status filter
         status_filter = self.request.query_params.get("status")
         search_query = self.request.query_params.get("search")
-        sort_by = self.request.query_params.get("sort_by", "asc")
+        sort_by = self.request.query_params.get(
+            "sort_by", "relevance" if search_query else "asc"
+        )
 
         if search_query:
-            queryset = queryset.filter(
-                Q(name__iregex=search_query)
-                | Q(slug__iregex=search_query)
-                | Q(description__iregex=search_query)
-            )
+            queryset = search_queryset(queryset, search_query)
 
         if status_filter:
             if status_filter == "publish":
@@ -974,7 +998,7 @@ class SubCategoryViewSet(viewsets.ModelViewSet):
         else:
             queryset = queryset.filter(is_deleted=False)
 
-        if sort_by:
+        if sort_by and sort_by != "relevance":
             if sort_by == "asc":
                 queryset = queryset.order_by("-created_at")
             else:
@@ -1138,6 +1162,7 @@ class ProductAndMaterialListView(APIView):
         - search: Search by product name, SKU, price, unit, weight, quantity
         - status: available/out_of_stock
         - sort_by: sku/regular_price/sale_price/weight/unit/total_quantity/barcode
+        - pagination=cursor: keyset pagination, count=approximate: estimated count
 
     Authentication:
     - Requires JWT authentication
@@ -1147,25 +1172,22 @@ class ProductAndMaterialListView(APIView):
 
     permission_classes = [AllowGetOnlyIsAdminStockManager]
     authentication_classes = [JWTAuthentication]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
 
     def get(self, request, *args, **kwargs):
         inventory_items = Inventory.objects.select_related("product_variant")
-        configuration = AdminConfiguration.objects.all().last()
+        configuration = admin_config.get_admin_configuration()
         # Apply filters based on query parameters
         search_query = request.query_params.get("search", None)
         status = request.query_params.get("status", None)
-        sort_by = request.query_params.get("sort_by", "asc")
+        sort_by = request.query_params.get(
+            "sort_by", "relevance" if search_query else "asc"
+        )
 
-        # Filter by variant name
+        # Filter by product name, SKU, price, unit, weight or quantity
         if search_query:
-            inventory_items = inventory_items.filter(
-                Q(product_variant__product__name__icontains=search_query)
-                | Q(sku__icontains=search_query)
-                | Q(regular_price__icontains=search_query)
-                | Q(unit__icontains=search_query)
-                | Q(weight__icontains=search_query)
-                | Q(total_quantity__icontains=search_query)
+            inventory_items = search_queryset(
+                inventory_items, search_query, "-created_at"
             )
 
         # Filter by status (enabled/disabled)
@@ -1325,6 +1347,8 @@ class BulkProductUpdateDeleteAPIView(APIView):
     - POST: Bulk duplicate products
         - Creates copies with unique names and SKUs
         - Duplicates all associated data (variants, images, SEO)
+        - Set-based: a fixed number of queries however many products
+        - Reports the created products and row counts
     - PATCH: Bulk update product statuses
         - Can set multiple products to draft/publish
     - DELETE: Bulk delete/trash products
@@ -1376,131 +1400,13 @@ class BulkProductUpdateDeleteAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        with transaction.atomic():
-            duplicates = []  # ✅ Collect all duplicated products here
-
-            for product_id in product_ids:
-                try:
-                    original_product = Product.objects.get(id=product_id)
-
-                    # Start the counter from 1
-                    duplicated_product_count = (
-                        Product.objects.filter(
-                            name__startswith=f"{original_product.name} (Copy)"
-                        ).count()
-                        + 1
-                    )
-
-                    duplicated_product_name = (
-                        f"{original_product.name} (Copy {duplicated_product_count})"
-                    )
-
-                    # Ensure unique name
-                    while Product.objects.filter(name=duplicated_product_name).exists():
-                        duplicated_product_count += 1
-                        duplicated_product_name = (
-                            f"{original_product.name} (Copy {duplicated_product_count})"
-                        )
-
-                    duplicated_product = Product.objects.create(
-                        name=duplicated_product_name,
-                        description=original_product.description,
-                        purchase_note=original_product.purchase_note,
-                        min_order_quantity=original_product.min_order_quantity,
-                    )
-
-                    duplicated_product.category.set(original_product.category.all())
-                    duplicated_product.sub_category.set(
-                        original_product.sub_category.all()
-                    )
-                    duplicated_product.product_tag = original_product.product_tag
-                    duplicated_product.save()
-
-                    # ✅ Duplicate SEO Information
-                    if hasattr(original_product, "product_seo"):
-                        original_seo = original_product.product_seo
-
-                        # Generate base SEO title
-                        base_seo_title = original_seo.seo_title
-                        seo_title = base_seo_title
-                        counter = 1
-
-                        # Ensure the new SEO title is unique
-                        while ProductSeo.objects.filter(seo_title=seo_title).exists():
-                            seo_title = f"{base_seo_title}-{counter}"
-                            counter += 1
-
-                        ProductSeo.objects.create(
-                            product=duplicated_product,
-                            focused_keyword=original_seo.focused_keyword,
-                            seo_title=seo_title,  # ✅ Unique SEO title
-                            slug=f"{duplicated_product.name.replace(' ', '-')}-seo",
-                            preview_as=original_seo.preview_as,
-                            meta_description=original_seo.meta_description,
-                        )
-
-                    # ✅ Duplicate Product Images
-                    for image in original_product.images.all():
-                        ProductImage.objects.create(
-                            product=duplicated_product,
-                            image=image.image,
-                            is_featured=image.is_featured,
-                        )
-
-                    # ✅ Duplicate Variants and Inventory
-                    for original_variant in original_product.variants.all():
-                        duplicated_variant = ProductVariant.objects.create(
-                            product=duplicated_product,
-                            description=original_variant.description,
-                            enabled=original_variant.enabled,
-                            managed_stock=original_variant.managed_stock,
-                            allow_backorders=original_variant.allow_backorders,
-                        )
-
-                        original_inventory = original_variant.inventory_items
-                        if original_inventory:
-                            Inventory.objects.create(
-                                product_variant=duplicated_variant,
-                                sku=(
-                                    f"{duplicated_product_count}-\
-                                        sku-{original_inventory.sku}"
-                                ),
-                                regular_price=original_inventory.regular_price,
-                                sale_price=original_inventory.sale_price,
-                                sale_price_dates_from=(
-                                    original_inventory.sale_price_dates_from
-                                ),
-                                sale_price_dates_to=(
-                                    original_inventory.sale_price_dates_to
-                                ),
-                                weight=original_inventory.weight,
-                                unit=original_inventory.unit,
-                                total_quantity=original_inventory.total_quantity,
-                                bulking_price_rules=(
-                                    original_inventory.bulking_price_rules
-                                ),
-                            )
-
-                    # ✅ Store duplicated product info
-                    duplicates.append(
-                        {
-                            "id": duplicated_product.id,
-                            "name": duplicated_product.name,
-                        }
-                    )
-
-                except Product.DoesNotExist:
-                    return Response(
-                        {"error": f"Product with ID {product_id} does not exist."},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
+        try:
+            report = duplicate_products(product_ids)
+        except DuplicationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # ✅ Response should be outside the loop
         return Response(
-            {
-                "message": "Products duplicated successfully!",
-                "duplicated_products": duplicates,
-            },
+            {"message": "Products duplicated successfully!", **report},
             status=status.HTTP_201_CREATED,
         )
 
@@ -2083,7 +1989,16 @@ class RelatedProductAPIView(APIView):
     pagination_class = PageNumberPagination
     parser_classes = [JSONParser, MultiPartParser, FormParser]
 
+    @conditional_etag(catalog_cache.scope_etag("catalog", "product-lists"))
     def get(self, request, *args, **kwargs):
+        return catalog_cache.cached_response(
+            "related-products",
+            ["catalog", "product-lists"],
+            partial(self.get_related_products, request),
+            request,
+        )
+
+    def get_related_products(self, request):
         queryset = Product.objects.filter(is_active=True, is_deleted=False)[:10]
         category = request.query_params.get("category", None)
         if category:
@@ -2109,7 +2024,13 @@ class HotDealProductsView(APIView):
     permission_classes = [AllowGetOnlyIsAdminStockManager]
     authentication_classes = [JWTAuthentication]
 
+    @conditional_etag(catalog_cache.scope_etag("catalog", "product-lists"))
     def get(self, request):
+        return catalog_cache.cached_response(
+            "hot-deals", ["catalog", "product-lists"], self.get_hot_deals
+        )
+
+    def get_hot_deals(self):
         hot_deals = Product.objects.filter(
             hot_deal=True, is_active=True, is_deleted=False
         )
@@ -2168,6 +2089,8 @@ class GetBarcodeView(APIView):
     - GET: Get barcode URL for a product
         Parameters:
         - sku: Product SKU
+        - output: "image" to receive the PNG itself instead of its URL
+        - The image is rendered once, on first request, and cached
 
     Authentication:
     - Requires JWT authentication
@@ -2181,9 +2104,15 @@ class GetBarcodeView(APIView):
         serializer = GetBarcodeSerializer(data=request.query_params)
         if serializer.is_valid():
             sku = serializer.validated_data["sku"]
-            inventory_item = Inventory.objects.get(sku=sku)
-            print(inventory_item)
-            barcode_url = inventory_item.barcode.url if inventory_item.barcode else None
+            inventory_item = Inventory.objects.only("pk", "unique_code", "barcode").get(
+                sku=sku
+            )
+            if request.query_params.get("output") == "image":
+                return HttpResponse(
+                    get_barcode_bytes(inventory_item), content_type="image/png"
+                )
+            get_barcode(inventory_item)
+            barcode_url = inventory_item.barcode.url
             return Response({"barcode_url": barcode_url}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -2273,3 +2202,192 @@ class GenerateSKUAPIView(APIView):
 
         unique_sku = self.generate_unique_sku(product_name)
         return Response({"sku": unique_sku}, status=status.HTTP_200_OK)
+
+
+class CatalogCacheStatsView(APIView):
+    """
+    API view for sizing the catalog read cache.
+
+    Methods:
+    - GET: Return the cache backend, TTL, entry limit and hit/miss counters
+    - DELETE: Reset the hit/miss counters
+
+    Authentication:
+    - Requires JWT authentication
+    - Admin access required
+    """
+
+    permission_classes = [IsAdmin]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request):
+        return Response(catalog_cache.get_stats(), status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        catalog_cache.reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProductImportAPIView(APIView):
+    """
+    API view for bulk catalog imports from CSV/XLSX files.
+
+    Methods:
+    - POST: Upload a file and queue its import
+        - One row per SKU, columns as in ``product.importer.COLUMNS``
+        - Returns 202 with the import job
+    - GET: Return an import job's status and progress
+        Parameters:
+        - pk: Import job ID
+
+    Authentication:
+    - Requires JWT authentication
+    - Admin and stock manager can access
+    """
+
+    permission_classes = [IsAdminStockManager]
+    authentication_classes = [JWTAuthentication]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get(self, request, pk):
+        job = get_object_or_404(ProductImportJob, pk=pk)
+        return Response(ProductImportJobSerializer(job).data, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        request_body=ProductImportSerializer,
+        responses={202: ProductImportJobSerializer},
+    )
+    def post(self, request):
+        serializer = ProductImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file = serializer.validated_data["file"]
+        job = ProductImportJob.objects.create(
+            file=file,
+            file_format=file.name.rsplit(".", 1)[-1].lower(),
+            created_by=request.user,
+        )
+        transaction.on_commit(lambda: import_products.delay(job.pk))
+        return Response(
+            ProductImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+        )
+
+
+class ProductExportAPIView(APIView):
+    """
+    API view for exporting the catalog in the import file layout.
+
+    Methods:
+    - GET: Stream every SKU as CSV (default) or XLSX
+        Parameters:
+        - file_format: "csv" or "xlsx"
+
+    Authentication:
+    - Requires JWT authentication
+    - Admin and stock manager can access
+    """
+
+    permission_classes = [IsAdminStockManager]
+    authentication_classes = [JWTAuthentication]
+
+    def get(self, request):
+        file_format = request.query_params.get(
+            "file_format", ProductImportJob.Format.CSV
+        )
+        file_name = f"products-{datetime.date.today().isoformat()}.{file_format}"
+        if file_format == ProductImportJob.Format.CSV:
+            response = StreamingHttpResponse(
+                importer.stream_csv(), content_type="text/csv"
+            )
+            response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+            return response
+        if file_format == ProductImportJob.Format.XLSX:
+            return FileResponse(
+                importer.write_xlsx(),
+                as_attachment=True,
+                filename=file_name,
+                content_type=(
+                    "application/vnd.openxmlformats-officedocument"
+                    ".spreadsheetml.sheet"
+                ),
+            )
+        return Response(
+            {"error": "file_format must be 'csv' or 'xlsx'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class BarcodeSheetAPIView(APIView):
+    """
+    API view for printing barcode labels in bulk.
+
+    Methods:
+    - POST: Render a printable label sheet
+        Fields:
+        - skus: List of SKUs, one label each (``copies`` times)
+        - sku, start_series, end_series: One label per series number of a
+          SKU; the range defaults to the one set by UpdateQuantityAPIView
+        - output: "pdf" (default, multi-page) or "png" (a ZIP of pages when
+          there is more than one)
+
+    Authentication:
+    - Requires JWT authentication
+    - Admin and stock manager can access
+    """
+
+    permission_classes = [IsAdminStockManager]
+    authentication_classes = [JWTAuthentication]
+
+    @swagger_auto_schema(request_body=BarcodeSheetSerializer)
+    def post(self, request):
+        serializer = BarcodeSheetSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        skus = data.get("skus") or [data["sku"]]
+
+        inventories = {
+            inventory.sku.lower(): inventory
+            for inventory in Inventory.objects.filter(
+                sku__in=[sku.lower() for sku in skus]
+            ).select_related("product_variant__product")
+        }
+        missing = [sku for sku in skus if sku.lower() not in inventories]
+        if missing:
+            return Response(
+                {"error": f"No inventory found with SKU: {', '.join(missing)}"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        assign_unique_codes(Inventory, list(inventories.values()))
+
+        if "skus" in data:
+            count = len(skus) * data["copies"]
+        else:
+            inventory = inventories[data["sku"].lower()]
+            start = data.get("start_series", inventory.start_series)
+            end = data.get("end_series", inventory.end_series)
+            if start is None or end is None or start > end:
+                return Response(
+                    {"error": "No series range given or set for this SKU."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            count = end - start + 1
+        if count > barcode_labels.MAX_LABELS:
+            return Response(
+                {"error": f"At most {barcode_labels.MAX_LABELS} labels per sheet."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if "skus" in data:
+            labels = barcode_labels.inventory_labels(
+                [inventories[sku.lower()] for sku in skus], data["copies"]
+            )
+        else:
+            labels = barcode_labels.series_labels(inventory, start, end)
+
+        content, content_type, extension = barcode_labels.render_sheet(
+            labels, data["output"]
+        )
+        response = HttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = (
+            f'attachment; filename="barcode-labels.{extension}"'
+        )
+        return response
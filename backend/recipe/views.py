@@ -8,7 +8,6 @@ from django.db.models import Q, Value
 from django.db.models.functions import Concat
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
-from django.template.loader import render_to_string
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
@@ -17,9 +16,9 @@ from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from xhtml2pdf import pisa
 
 from account.permissions import AllowGetOnlyIsAdminStockManager, IsAdmin
+from orders.documents import XHTML2PDF, DocumentRenderError, render_pdf
 from product.utils import CustomPagination
 from recipe.filters import RecipeFilter
 from recipe.models import (
@@ -1203,15 +1202,12 @@ def generate_recipe_pdf(recipe, new_serving_size):
         "categories": recipe.category.all(),
     }
 
-    html_string = render_to_string("recipe.html", context)
-    pdf_file = BytesIO()
-    pisa_status = pisa.CreatePDF(html_string, dest=pdf_file)
-
-    if pisa_status.err:
+    try:
+        pdf = render_pdf("recipe.html", context, engine=XHTML2PDF)
+    except DocumentRenderError:
         raise Exception("PDF generation failed.")
 
-    pdf_file.seek(0)
-    return pdf_file
+    return BytesIO(pdf)
 
 
 class ScaleRecipeAPIView(APIView):
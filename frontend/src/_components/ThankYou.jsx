@@ -16,12 +16,19 @@ const ThankYou = ({ checkoutResponse }) => {
       <div className="w-6/12 text-center">
         Your order has been placed successfully.
       </div>
-      <div
-        className="cursor-pointer text-blue-700"
-        onClick={() => handlePrintPdf(checkoutResponse?.invoice_file)}
-      >
-        Download Invoice
-      </div>
+      {checkoutResponse?.invoice_file ? (
+        <div
+          className="cursor-pointer text-blue-700"
+          onClick={() => handlePrintPdf(checkoutResponse?.invoice_file)}
+        >
+          Download Invoice
+        </div>
+      ) : (
+        <div className="w-6/12 text-center">
+          Your invoice is being prepared and will be available under payments
+          in your profile.
+        </div>
+      )}
       <div className="border p-4 rounded-full bg-[#FFDC83] cursor-pointer" onClick={()=> router.push("/products")}>Continue Shopping</div>
     </div>
   );